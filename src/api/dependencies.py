@@ -0,0 +1,169 @@
+"""
+Lazily constructed, lifespan-managed service singletons for the API
+
+Services are created on first use (heavy modules are imported inside the
+factories), shared by every router, and injected with FastAPI's Depends.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from fastapi import Depends
+from starlette.requests import HTTPConnection
+
+from src.utils.config import settings
+from src.utils.json_store import flush_all
+
+logger = logging.getLogger(__name__)
+
+
+def _create_pill_identifier():
+    from src.models.pill_identifier import PillIdentifier
+    return PillIdentifier()
+
+
+def _create_image_processor():
+    from src.vision.image_processor_simple import ImageProcessor
+    return ImageProcessor()
+
+
+def _create_pill_data_service():
+    from src.services.pill_data_service import PillDataService
+    return PillDataService()
+
+
+def _create_ocr_service():
+    from src.services.pill_ocr_service import PillOCRService
+    return PillOCRService()
+
+
+def _create_medication_verifier():
+    from src.models.medication_verifier import MedicationVerifier
+    return MedicationVerifier()
+
+
+def _create_ingestion_detector():
+    from src.models.ingestion_detector import IngestionDetector
+    return IngestionDetector()
+
+
+def _create_adherence_tracker():
+    from src.models.adherence_tracker import AdherenceTracker
+    return AdherenceTracker()
+
+
+def _create_caregiver_directory():
+    from src.services.caregiver_directory import CaregiverDirectory
+    return CaregiverDirectory()
+
+
+def _create_search_orchestrator():
+    from src.services.search_orchestrator import SearchOrchestrator
+    return SearchOrchestrator()
+
+
+class ServiceContainer:
+    """
+    Holds one instance of each service, built on first access
+
+    Construction is guarded by a lock so concurrent first requests (or the
+    warm-up thread) never build a service twice.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "pill_identifier": _create_pill_identifier,
+            "image_processor": _create_image_processor,
+            "pill_data_service": _create_pill_data_service,
+            "ocr_service": _create_ocr_service,
+            "medication_verifier": _create_medication_verifier,
+            "ingestion_detector": _create_ingestion_detector,
+            "ingestion_batcher": self._create_ingestion_batcher,
+            "adherence_tracker": _create_adherence_tracker,
+            "search_orchestrator": _create_search_orchestrator,
+            "caregiver_directory": _create_caregiver_directory,
+            "alert_dispatcher": self._create_alert_dispatcher,
+        }
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._warmup_task: asyncio.Task = None
+
+    def get(self, name: str) -> Any:
+        """Return a service, constructing it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                logger.info(f"Initialized {name} in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return self._instances[name]
+
+    def is_initialized(self, name: str) -> bool:
+        return name in self._instances
+
+    def _create_ingestion_batcher(self):
+        from src.models.micro_batcher import MicroBatcher
+        return MicroBatcher(
+            self.get("ingestion_detector").analyze_batch,
+            max_batch_size=settings.ingestion_batch_max_size,
+            max_wait_ms=settings.ingestion_batch_max_wait_ms,
+            max_in_flight=settings.ingestion_batch_max_in_flight,
+            name="ingestion"
+        )
+
+    def _create_alert_dispatcher(self):
+        from src.services.alert_dispatcher import AlertDispatcher
+        return AlertDispatcher(directory=self.get("caregiver_directory"))
+
+    def _warm_up_models(self):
+        """Build the vision models and run their warm-up inferences"""
+        self.get("pill_identifier").warmup()
+        self.get("ingestion_detector").warmup()
+
+    async def startup(self):
+        """Start background model warm-up without delaying readiness"""
+        if settings.warmup_models_on_startup:
+            self._warmup_task = asyncio.create_task(asyncio.to_thread(self._warm_up_models))
+
+    async def shutdown(self):
+        """Release resources held by services that were created"""
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+        if self.is_initialized("alert_dispatcher"):
+            await self._instances["alert_dispatcher"].close()
+        if self.is_initialized("ingestion_batcher"):
+            await self._instances["ingestion_batcher"].close()
+        if self.is_initialized("pill_data_service"):
+            await self._instances["pill_data_service"].shutdown()
+        # Group-committed JSON writes still inside their window
+        flush_all()
+
+
+def get_services(connection: HTTPConnection) -> ServiceContainer:
+    """The application's service container (works for HTTP and WebSocket routes)"""
+    return connection.app.state.services
+
+
+def _provider(name: str) -> Callable[..., Any]:
+    def provide(services: ServiceContainer = Depends(get_services)) -> Any:
+        return services.get(name)
+    provide.__name__ = f"get_{name}"
+    return provide
+
+
+get_pill_identifier = _provider("pill_identifier")
+get_image_processor = _provider("image_processor")
+get_pill_data_service = _provider("pill_data_service")
+get_ocr_service = _provider("ocr_service")
+get_medication_verifier = _provider("medication_verifier")
+get_ingestion_detector = _provider("ingestion_detector")
+get_ingestion_batcher = _provider("ingestion_batcher")
+get_adherence_tracker = _provider("adherence_tracker")
+get_search_orchestrator = _provider("search_orchestrator")
+get_caregiver_directory = _provider("caregiver_directory")
+get_alert_dispatcher = _provider("alert_dispatcher")
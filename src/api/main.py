@@ -1,13 +1,20 @@
 """
 FastAPI main application setup
 """
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from contextlib import asynccontextmanager
 import logging
 
 from .routers import pill_identification, medication_verification, adherence
 from .routers import admin as admin_router
+from .dependencies import ServiceContainer
+from src.utils.config import settings
 from src.database.database import engine
 from src.database.models import Base
 
@@ -15,15 +22,43 @@ from src.database.models import Base
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# orjson is optional; without it responses use the standard JSON encoder
+try:
+    import orjson  # noqa: F401
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if settings.orjson_responses_enabled and not ORJSON_AVAILABLE:
+    logger.warning("orjson_responses_enabled is set but orjson is not installed; using JSONResponse")
+default_response_class = (
+    ORJSONResponse if settings.orjson_responses_enabled and ORJSON_AVAILABLE else JSONResponse
+)
+
 # Create database tables - commented out for initial testing
 # Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the service container on startup and release its resources on shutdown"""
+    # Services are built on first use; models warm up in the background
+    services = ServiceContainer()
+    app.state.services = services
+    await services.startup()
+    logger.info(f"Application ready in {(time.perf_counter() - _IMPORT_STARTED) * 1000:.0f} ms")
+    try:
+        yield
+    finally:
+        await services.shutdown()
+
 app = FastAPI(
     title="MedAdhere API",
     description="AI-Powered Medication Adherence System API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=default_response_class,
+    lifespan=lifespan
 )
 
 # Configure CORS
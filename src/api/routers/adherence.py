@@ -1,27 +1,33 @@
 """
 Adherence tracking API endpoints
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
+import asyncio
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 from ...api.schemas.adherence_schemas import (
     AdherenceReport,
     AdherenceStats,
     MissedDose,
-    CaregiverAlert
+    CaregiverAlert,
+    CaregiverContactCreate
 )
-from ...models.adherence_tracker import AdherenceTracker
+from ...api.dependencies import get_adherence_tracker, get_alert_dispatcher, get_caregiver_directory
 
-router = APIRouter()
+# Service classes are only needed for annotations (see the services' factories)
+if TYPE_CHECKING:
+    from ...models.adherence_tracker import AdherenceTracker
+    from ...services.alert_dispatcher import AlertDispatcher
+    from ...services.caregiver_directory import CaregiverDirectory
 
-# Initialize service
-adherence_tracker = AdherenceTracker()
+router = APIRouter()
 
 @router.get("/report/{patient_id}", response_model=AdherenceReport)
 async def get_adherence_report(
     patient_id: str,
-    days: int = Query(default=30, description="Number of days to include in report")
+    days: int = Query(default=30, description="Number of days to include in report"),
+    adherence_tracker: "AdherenceTracker" = Depends(get_adherence_tracker)
 ):
     """
     Get adherence report for a patient
@@ -52,7 +58,10 @@ async def get_adherence_report(
         )
 
 @router.get("/stats/{patient_id}", response_model=AdherenceStats)
-async def get_adherence_stats(patient_id: str):
+async def get_adherence_stats(
+    patient_id: str,
+    adherence_tracker: "AdherenceTracker" = Depends(get_adherence_tracker)
+):
     """
     Get current adherence statistics for a patient
     
@@ -75,7 +84,8 @@ async def get_adherence_stats(patient_id: str):
 @router.get("/missed-doses/{patient_id}", response_model=List[MissedDose])
 async def get_missed_doses(
     patient_id: str,
-    days: int = Query(default=7, description="Number of days to check")
+    days: int = Query(default=7, description="Number of days to check"),
+    adherence_tracker: "AdherenceTracker" = Depends(get_adherence_tracker)
 ):
     """
     Get missed doses for a patient
@@ -108,7 +118,8 @@ async def get_missed_doses(
 @router.get("/recent-doses/{patient_id}")
 async def get_recent_doses(
     patient_id: str,
-    limit: int = Query(default=10, description="Number of recent doses to return")
+    limit: int = Query(default=10, description="Number of recent doses to return"),
+    adherence_tracker: "AdherenceTracker" = Depends(get_adherence_tracker)
 ):
     """
     Get recent dose logs for a patient
@@ -141,19 +152,26 @@ async def get_recent_doses(
         )
 
 @router.post("/alert", response_model=dict)
-async def send_caregiver_alert(alert: CaregiverAlert):
+async def send_caregiver_alert(
+    alert: CaregiverAlert,
+    alert_dispatcher: "AlertDispatcher" = Depends(get_alert_dispatcher)
+):
     """
     Send alert to caregiver about missed medication
     
+    The alert is queued and delivered in the background; repeats of the
+    same patient, caregiver, alert type and severity within the dedup
+    window are collapsed into the earlier alert.
+    
     Args:
         alert: Caregiver alert information
         
     Returns:
-        Success confirmation
+        Success confirmation with the (possibly collapsed-into) alert id
     """
     try:
-        result = adherence_tracker.send_caregiver_alert(alert)
-        return {"success": True, "alert_id": result["alert_id"]}
+        result = alert_dispatcher.enqueue(alert)
+        return {"success": True, "queued": True, **result}
         
     except Exception as e:
         raise HTTPException(
@@ -161,10 +179,71 @@ async def send_caregiver_alert(alert: CaregiverAlert):
             detail=f"Error sending caregiver alert: {str(e)}"
         )
 
+@router.post("/caregivers", response_model=dict)
+async def add_caregiver(
+    contact: CaregiverContactCreate,
+    caregiver_directory: "CaregiverDirectory" = Depends(get_caregiver_directory)
+):
+    """
+    Register a caregiver who receives a patient's alerts
+    
+    Args:
+        contact: Caregiver details and alert preferences
+        
+    Returns:
+        Success confirmation with the new contact id
+    """
+    if not contact.phone and not contact.email:
+        raise HTTPException(status_code=400, detail="A phone number or email address is required")
+    
+    try:
+        contact_id = await asyncio.to_thread(
+            caregiver_directory.add_contact,
+            patient_id=contact.patient_id,
+            name=contact.name,
+            phone=contact.phone,
+            email=contact.email,
+            relationship=contact.relationship,
+            is_primary=contact.is_primary,
+            alert_preferences=contact.alert_preferences
+        )
+        return {"success": True, "contact_id": contact_id}
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error adding caregiver: {str(e)}"
+        )
+
+@router.get("/caregivers/{patient_id}", response_model=dict)
+async def get_caregivers(
+    patient_id: str,
+    caregiver_directory: "CaregiverDirectory" = Depends(get_caregiver_directory)
+):
+    """
+    List the caregivers who receive a patient's alerts (primary first)
+    
+    Args:
+        patient_id: Patient identifier
+        
+    Returns:
+        The patient's caregiver contacts
+    """
+    try:
+        contacts = await asyncio.to_thread(caregiver_directory.contacts_for, patient_id)
+        return {"patient_id": patient_id, "contacts": contacts}
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving caregivers: {str(e)}"
+        )
+
 @router.get("/trends/{patient_id}")
 async def get_adherence_trends(
     patient_id: str,
-    days: int = Query(default=90, description="Number of days for trend analysis")
+    days: int = Query(default=90, description="Number of days for trend analysis"),
+    adherence_tracker: "AdherenceTracker" = Depends(get_adherence_tracker)
 ):
     """
     Get adherence trends and patterns for a patient
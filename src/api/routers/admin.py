@@ -1,18 +1,21 @@
 """
 Administrative endpoints for development: clear persisted demo data
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+import asyncio
 from pathlib import Path
 from fastapi import Query
 
-from src.api.routers.pill_identification import pill_identifier
-from src.api.routers.medication_verification import medication_verifier
+from src.api.dependencies import ServiceContainer, get_services
 
 router = APIRouter()
 
 
 @router.post('/clear-demo-data')
-async def clear_demo_data(confirm: bool = Query(False)):
+async def clear_demo_data(
+    confirm: bool = Query(False),
+    services: ServiceContainer = Depends(get_services)
+):
     """Clear demo data files: pill_database.json, medication_schedules.json, medications.json
 
     Requires confirm=true to actually delete files to avoid accidents.
@@ -39,13 +42,55 @@ async def clear_demo_data(confirm: bool = Query(False)):
             pass
 
     # Also clear in-memory singletons so the running server reflects the empty state
+    # (services not built yet will load the empty state on first use)
     try:
-        pill_identifier.clear_database()
+        if services.is_initialized("pill_identifier"):
+            await asyncio.to_thread(services.get("pill_identifier").clear_database)
     except Exception:
         pass
     try:
-        medication_verifier.clear_all_data()
+        if services.is_initialized("medication_verifier"):
+            await asyncio.to_thread(services.get("medication_verifier").clear_all_data)
     except Exception:
         pass
 
     return {"removed": removed}
+
+
+@router.get('/http-pool')
+async def http_pool_stats(services: ServiceContainer = Depends(get_services)):
+    """Connection pool and request metrics for the external drug API client"""
+    return services.get("pill_data_service").pool_stats()
+
+
+@router.get('/lookup-cache')
+async def lookup_cache_stats(services: ServiceContainer = Depends(get_services)):
+    """Hit/miss counters for the external drug lookup cache"""
+    return services.get("pill_data_service").cache_stats()
+
+
+@router.get('/models')
+async def model_runtimes(services: ServiceContainer = Depends(get_services)):
+    """Runtime and model file behind each vision model"""
+    return {
+        "pill_identifier": services.get("pill_identifier").model.describe(),
+        "ingestion_detector": services.get("ingestion_detector").model.describe()
+    }
+
+
+@router.get('/ingestion-batching')
+async def ingestion_batching_stats(services: ServiceContainer = Depends(get_services)):
+    """Batch counts and sizes for the ingestion inference queue"""
+    return services.get("ingestion_batcher").stats()
+
+
+@router.get('/upstreams')
+async def upstream_circuit_stats(services: ServiceContainer = Depends(get_services)):
+    """Circuit breaker state and rolling error/latency stats per external API"""
+    return services.get("pill_data_service").circuit_stats()
+
+
+@router.get('/alerts')
+async def alert_dispatch_stats(services: ServiceContainer = Depends(get_services)):
+    """Queued, collapsed and delivered counts for the caregiver alert dispatcher"""
+    return services.get("alert_dispatcher").stats()
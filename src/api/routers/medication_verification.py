@@ -1,41 +1,53 @@
 """
 Medication verification API endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from datetime import datetime, time
-from typing import List, Optional
+import asyncio
+import logging
+from typing import TYPE_CHECKING, List, Optional
 
 from ...api.schemas.medication_schemas import (
     MedicationSchedule,
     VerificationRequest,
     VerificationResponse,
     IngestionConfirmation,
-    IngestionResponse
+    IngestionResponse,
+    IngestionStreamUpdate
 )
-from ...models.medication_verifier import MedicationVerifier
-from ...models.ingestion_detector import IngestionDetector
+from ...api.dependencies import get_medication_verifier, get_ingestion_detector, get_ingestion_batcher
+from ...utils.config import settings
 
-router = APIRouter()
+# Service classes are only needed for annotations (see the services' factories)
+if TYPE_CHECKING:
+    from ...models.ingestion_detector import IngestionDetector
+    from ...models.medication_verifier import MedicationVerifier
+    from ...models.micro_batcher import MicroBatcher
 
-# Initialize services
-medication_verifier = MedicationVerifier()
-ingestion_detector = IngestionDetector()
+router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 @router.post("/", status_code=200)
-async def create_medication(med: dict):
+async def create_medication(
+    med: dict,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier)
+):
     """Create or register a medication in the medications store
 
     The frontend uses this to create a medication record before adding a schedule.
     """
     try:
-        created = medication_verifier.add_medication(med)
+        created = await asyncio.to_thread(medication_verifier.add_medication, med)
         return created
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating medication: {e}")
 
 @router.post("/verify", response_model=VerificationResponse)
-async def verify_medication(request: VerificationRequest):
+async def verify_medication(
+    request: VerificationRequest,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier)
+):
     """
     Verify if the identified pill matches the scheduled medication
     
@@ -66,7 +78,12 @@ async def verify_medication(request: VerificationRequest):
         )
 
 @router.post("/confirm-ingestion", response_model=IngestionResponse)
-async def confirm_ingestion(confirmation: IngestionConfirmation):
+async def confirm_ingestion(
+    confirmation: IngestionConfirmation,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier),
+    ingestion_detector: "IngestionDetector" = Depends(get_ingestion_detector),
+    ingestion_batcher: "MicroBatcher" = Depends(get_ingestion_batcher)
+):
     """
     Confirm that medication has been ingested using action recognition
     
@@ -77,15 +94,12 @@ async def confirm_ingestion(confirmation: IngestionConfirmation):
         IngestionResponse indicating if ingestion was detected
     """
     try:
-        ingestion_result = ingestion_detector.detect_ingestion(
-            image_data=confirmation.image_data,
-            patient_id=confirmation.patient_id,
-            medication_id=confirmation.medication_id
-        )
+        ingestion_result = await _detect_ingestion(confirmation, ingestion_detector, ingestion_batcher)
         
         if ingestion_result["ingested"]:
-            # Log successful dose
-            medication_verifier.log_dose_taken(
+            # Log successful dose (waits for the store's commit, off the loop)
+            await asyncio.to_thread(
+                medication_verifier.log_dose_taken,
                 patient_id=confirmation.patient_id,
                 medication_id=confirmation.medication_id,
                 timestamp=datetime.now(),
@@ -104,8 +118,112 @@ async def confirm_ingestion(confirmation: IngestionConfirmation):
             detail=f"Error confirming ingestion: {str(e)}"
         )
 
+async def _detect_ingestion(
+    confirmation: IngestionConfirmation,
+    ingestion_detector: "IngestionDetector",
+    ingestion_batcher: "MicroBatcher"
+) -> dict:
+    """Run ingestion detection off the event loop, batched with concurrent requests when enabled"""
+    try:
+        if not settings.ingestion_batching_enabled:
+            return await asyncio.to_thread(
+                ingestion_detector.detect_ingestion,
+                image_data=confirmation.image_data,
+                patient_id=confirmation.patient_id,
+                medication_id=confirmation.medication_id
+            )
+        
+        # Decode per request, analyze together with other waiting frames
+        frame = await asyncio.to_thread(ingestion_detector.prepare_frame, confirmation.image_data)
+        result = await ingestion_batcher.submit(frame)
+        return ingestion_detector.format_result(result)
+    except Exception as e:
+        logger.error(f"Error detecting ingestion: {e}")
+        return {
+            "ingested": False,
+            "confidence": 0.0,
+            "message": "Error processing image for ingestion detection"
+        }
+
+@router.websocket("/ingestion-stream")
+async def stream_ingestion(
+    websocket: WebSocket,
+    patient_id: str,
+    medication_id: str,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier),
+    ingestion_detector: "IngestionDetector" = Depends(get_ingestion_detector)
+):
+    """
+    Detect ingestion from a stream of video frames
+    
+    The client sends each frame as a binary message (encoded JPEG/PNG) and
+    receives an IngestionStreamUpdate after every frame. Once `ingested` is
+    true the dose is logged and the client can stop streaming; sending the
+    text message "end" closes the session.
+    
+    Query params:
+        patient_id: Patient identifier
+        medication_id: Medication identifier
+    """
+    from ...models.ingestion_stream import IngestionStreamSession
+    
+    await websocket.accept()
+    session = IngestionStreamSession(
+        ingestion_detector,
+        window=settings.ingestion_stream_window,
+        motion_threshold=settings.ingestion_motion_threshold
+    )
+    dose_logged = False
+    
+    try:
+        while session.frame_count < settings.ingestion_stream_max_frames:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            frame_data = message.get("bytes")
+            if frame_data is None:
+                if (message.get("text") or "").strip().lower() == "end":
+                    break
+                await websocket.send_json({"error": "Frames must be sent as binary messages"})
+                continue
+            
+            if len(frame_data) > settings.max_image_size:
+                await websocket.send_json({"error": f"Frame exceeds {settings.max_image_size} bytes"})
+                continue
+            
+            try:
+                result = await asyncio.to_thread(session.add_frame, frame_data)
+            except Exception as e:
+                logger.warning(f"Could not analyse ingestion frame: {e}")
+                await websocket.send_json({"error": "Could not decode frame"})
+                continue
+            
+            if result["ingested"] and not dose_logged:
+                # Log successful dose once per session (the store write can
+                # wait on another worker's file lock, so keep it off the loop)
+                await asyncio.to_thread(
+                    medication_verifier.log_dose_taken,
+                    patient_id=patient_id,
+                    medication_id=medication_id,
+                    timestamp=datetime.now(),
+                    confidence=result["confidence"]
+                )
+                dose_logged = True
+            
+            update = IngestionStreamUpdate(**result, dose_logged=dose_logged)
+            await websocket.send_json(update.dict())
+        
+        await websocket.close()
+        
+    except WebSocketDisconnect:
+        logger.info(f"Ingestion stream closed by client after {session.frame_count} frames")
+
 @router.get("/schedule/{patient_id}")
-async def get_medication_schedule(patient_id: str):
+async def get_medication_schedule(
+    patient_id: str,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier)
+):
     """
     Get medication schedule for a patient
     
@@ -138,12 +256,16 @@ async def get_medication_schedule(patient_id: str):
 
 
 @router.delete("/schedule/{patient_id}/{schedule_id}")
-async def delete_medication_schedule(patient_id: str, schedule_id: int):
+async def delete_medication_schedule(
+    patient_id: str,
+    schedule_id: int,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier)
+):
     """
     Delete a scheduled medication by patient and schedule index
     """
     try:
-        result = medication_verifier.delete_from_schedule(patient_id, schedule_id)
+        result = await asyncio.to_thread(medication_verifier.delete_from_schedule, patient_id, schedule_id)
         if result:
             return {"success": True}
         else:
@@ -154,7 +276,10 @@ async def delete_medication_schedule(patient_id: str, schedule_id: int):
         raise HTTPException(status_code=500, detail=f"Error deleting schedule: {e}")
 
 @router.post("/schedule", response_model=dict)
-async def add_medication_to_schedule(payload: dict):
+async def add_medication_to_schedule(
+    payload: dict,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier)
+):
     """
     Add a medication to patient's schedule.
 
@@ -194,13 +319,13 @@ async def add_medication_to_schedule(payload: dict):
                 prescriber=payload.get('prescriber')
             )
 
-            result = medication_verifier.add_to_schedule(med_schedule)
+            result = await asyncio.to_thread(medication_verifier.add_to_schedule, med_schedule)
             return {"success": True, "schedule_id": result["schedule_id"]}
 
         # Otherwise, try to validate as full MedicationSchedule (fallback)
         else:
             med_schedule = MedicationSchedule(**payload)
-            result = medication_verifier.add_to_schedule(med_schedule)
+            result = await asyncio.to_thread(medication_verifier.add_to_schedule, med_schedule)
             return {"success": True, "schedule_id": result["schedule_id"]}
 
     except HTTPException:
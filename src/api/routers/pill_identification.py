@@ -2,7 +2,8 @@
 Pill identification API endpoints
 """
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-from typing import List, Optional
+import asyncio
+from typing import TYPE_CHECKING, List, Optional
 import numpy as np
 from PIL import Image
 import io
@@ -11,22 +12,34 @@ from datetime import datetime
 from pydantic import BaseModel
 
 from ...api.schemas.pill_schemas import PillIdentificationResponse, PillInfo
-from ...models.pill_identifier import PillIdentifier
-from ...vision.image_processor_simple import ImageProcessor
-from ...services.pill_data_service import PillDataService
-from ...services.pill_ocr_service import PillOCRService
-from ...models.medication_verifier import MedicationVerifier
+from ...vision.image_loader import ImageTooLargeError, read_upload
+from ...vision.image_context import ImageContext
+from ...services.deadline import Deadline
+from ...api.dependencies import (
+    get_pill_identifier,
+    get_image_processor,
+    get_pill_data_service,
+    get_ocr_service,
+    get_medication_verifier,
+    get_search_orchestrator
+)
+from ...utils.config import settings
+from ...utils.fuzzy import normalize
+from ...utils.result_merge import merge_results
+
+# Service classes are only needed for annotations; importing them here would
+# load their heavy dependencies (OCR, model runtimes) at application startup
+if TYPE_CHECKING:
+    from ...models.medication_verifier import MedicationVerifier
+    from ...models.pill_identifier import PillIdentifier
+    from ...services.pill_data_service import PillDataService
+    from ...services.pill_ocr_service import PillOCRService
+    from ...services.search_orchestrator import SearchOrchestrator
+    from ...vision.image_processor_simple import ImageProcessor
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Initialize services
-pill_identifier = PillIdentifier()
-image_processor = ImageProcessor()
-pill_data_service = PillDataService()
-ocr_service = PillOCRService()
-medication_verifier = MedicationVerifier()
-
 # Request model for logging dose
 class LogDoseRequest(BaseModel):
     medication_name: str
@@ -36,7 +49,12 @@ class LogDoseRequest(BaseModel):
 @router.post("/identify", response_model=PillIdentificationResponse)
 async def identify_pill(
     image: UploadFile = File(...),
-    confidence_threshold: float = 0.3
+    confidence_threshold: float = 0.3,
+    pill_identifier: "PillIdentifier" = Depends(get_pill_identifier),
+    image_processor: "ImageProcessor" = Depends(get_image_processor),
+    pill_data_service: "PillDataService" = Depends(get_pill_data_service),
+    ocr_service: "PillOCRService" = Depends(get_ocr_service),
+    search_orchestrator: "SearchOrchestrator" = Depends(get_search_orchestrator)
 ):
     """
     Identify a pill from an uploaded image using OCR and external medical databases
@@ -56,46 +74,63 @@ async def identify_pill(
                 detail="File must be an image"
             )
         
-        # Read and process image
-        image_data = await image.read()
-        pil_image = Image.open(io.BytesIO(image_data))
+        # Stream the upload into a bounded buffer and decode it once;
+        # each stage pulls the views it needs
+        try:
+            image_data = await read_upload(image)
+            image_context = ImageContext.from_bytes(image_data)
+        except ImageTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        # Step 1: Visual identification with the local model starts right away
+        def identify_visually():
+            processed_image = image_processor.preprocess_for_identification(image_context)
+            return pill_identifier.identify(
+                processed_image,
+                confidence_threshold=confidence_threshold
+            )
+        
+        visual_task = asyncio.ensure_future(asyncio.to_thread(identify_visually))
+        sources = {"visual": lambda: visual_task}
         
-        # Step 1: Try OCR to extract imprint text
-        imprint_text = ocr_service.extract_text(pil_image)
+        # Step 2: Try OCR to extract imprint text (runs while the model works)
+        imprint_text = await asyncio.to_thread(ocr_service.extract_text, image_context)
         logger.info(f"Extracted imprint: '{imprint_text}'")
         
-        # Step 2: Search external databases
-        search_results = []
+        # External lookups share one budget, started once the text is known
+        # so upload, decoding and OCR time never eat into it
+        deadline = Deadline(settings.identify_deadline_seconds)
         
-        # Try searching by any text found in the image
+        # Step 3: Search by any text found in the image, as an imprint and as a
+        # name (might be medication name on packaging), concurrently
         if imprint_text and len(imprint_text.strip()) >= 2:
             logger.info(f"Attempting to search with extracted text: '{imprint_text}'")
-            
-            # First try imprint search
-            imprint_results = await pill_data_service.search_by_imprint(imprint_text)
-            if imprint_results:
-                search_results.extend(imprint_results)
-                logger.info(f"Found {len(imprint_results)} results from imprint search")
-            
-            # Also try name search with the extracted text (might be medication name on packaging)
-            if not search_results or len(search_results) < 5:
-                name_results = await pill_data_service.search_by_name(imprint_text)
-                if name_results:
-                    logger.info(f"Found {len(name_results)} results from name search")
-                    # Add name results that aren't duplicates
-                    for result in name_results:
-                        if not any(r.get('name', '').lower() == result.get('name', '').lower() for r in search_results):
-                            search_results.append(result)
+            sources["imprint"] = lambda: pill_data_service.search_by_imprint(imprint_text, deadline=deadline)
+            sources["name"] = lambda: pill_data_service.search_by_name(imprint_text, deadline=deadline)
         
-        # Step 3: Also do visual identification with local model as fallback
-        processed_image = image_processor.preprocess_for_identification(pil_image)
-        local_result = pill_identifier.identify(
-            processed_image,
-            confidence_threshold=confidence_threshold
+        results = await search_orchestrator.run(
+            sources,
+            stop_when=lambda source, result: _is_conclusive_match(source, result, imprint_text)
         )
+        local_result = results.get("visual")
+        
+        for source in ("imprint", "name"):
+            if results.get(source):
+                logger.info(f"Found {len(results[source])} results from {source} search")
+        
+        # Imprint matches rank ahead of name matches; duplicates keep the better score
+        search_results = merge_results(results.get("imprint") or [], results.get("name") or [])
         
         # Step 4: Combine results
-        if search_results:
+        if local_result and _is_conclusive_match("visual", local_result, imprint_text):
+            # A high-confidence local identification needs no database match
+            return PillIdentificationResponse(
+                success=True,
+                pill_info=local_result["pill_info"],
+                confidence=local_result["confidence"],
+                message="Pill identified from local database"
+            )
+        elif search_results:
             # Use external API results (more reliable)
             best_match = search_results[0]
             
@@ -132,6 +167,8 @@ async def identify_pill(
                 confidence=0.0
             )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error identifying pill: {e}", exc_info=True)
         raise HTTPException(
@@ -140,18 +177,43 @@ async def identify_pill(
         )
 
 
+def _is_conclusive_match(source: str, result, query: Optional[str]) -> bool:
+    """
+    Whether a local result is confident enough to stop waiting on other sources
+    
+    Visual matches count at settings.local_match_confidence; name/imprint
+    results count when the top hit came from the offline catalog or local
+    pill database with at least that relevance.
+    """
+    if not result:
+        return False
+    if source == "visual":
+        return result.get("confidence", 0.0) >= settings.local_match_confidence
+    
+    best = result[0]
+    if source == "local":
+        return bool(query) and normalize(best.get("name")) == normalize(query)
+    return (
+        str(best.get("source", "")).startswith("Local")
+        and best.get("relevance", 0.0) >= settings.local_match_confidence
+    )
+
+
 @router.post("/", response_model=dict)
-async def create_pill(pill: PillInfo):
+async def create_pill(
+    pill: PillInfo,
+    pill_identifier: "PillIdentifier" = Depends(get_pill_identifier)
+):
     """Create a new pill entry in the pill database"""
     try:
-        stored = pill_identifier.add_pill(pill.dict())
+        stored = await asyncio.to_thread(pill_identifier.add_pill, pill.dict())
         return {"success": True, "pill": stored}
     except Exception as e:
         logger.error(f"Error creating pill: {e}")
         raise HTTPException(status_code=500, detail="Error creating pill entry")
 
 @router.get("/database", response_model=List[PillInfo])
-async def get_pill_database():
+async def get_pill_database(pill_identifier: "PillIdentifier" = Depends(get_pill_identifier)):
     """
     Get all pills in the identification database
     
@@ -159,8 +221,8 @@ async def get_pill_database():
         List of PillInfo objects
     """
     try:
-        pills = pill_identifier.get_all_pills()
-        return pills
+        # Validated once per database version; invalid entries are skipped
+        return pill_identifier.get_pill_infos()
     except Exception as e:
         logger.error(f"Error retrieving pill database: {e}")
         raise HTTPException(
@@ -173,7 +235,10 @@ async def search_pills(
     name: Optional[str] = None,
     imprint: Optional[str] = None,
     color: Optional[str] = None,
-    shape: Optional[str] = None
+    shape: Optional[str] = None,
+    pill_identifier: "PillIdentifier" = Depends(get_pill_identifier),
+    pill_data_service: "PillDataService" = Depends(get_pill_data_service),
+    search_orchestrator: "SearchOrchestrator" = Depends(get_search_orchestrator)
 ):
     """
     Search pills by various attributes using local database and external medical APIs
@@ -191,42 +256,7 @@ async def search_pills(
         logger.info(f"Search request - name: {name}, imprint: {imprint}, color: {color}, shape: {shape}")
         all_results = []
         
-        # Step 1: Search external APIs
-        if name:
-            logger.info(f"Searching external APIs for: {name}")
-            external_results = await pill_data_service.search_by_name(name)
-            logger.info(f"Found {len(external_results)} results from external APIs")
-            
-            # Convert external results to PillInfo format
-            for result in external_results[:10]:  # Limit to top 10
-                pill_info = PillInfo(
-                    name=result.get("name", "Unknown"),
-                    dosage=result.get("dosage", "Unknown"),
-                    shape=result.get("shape", "unknown"),
-                    color=result.get("color", "unknown"),
-                    imprint=result.get("imprint"),
-                    manufacturer=result.get("manufacturer", "Unknown"),
-                    ndc_number=result.get("ndc_number")
-                )
-                all_results.append(pill_info)
-        
-        if imprint and not name:
-            external_results = await pill_data_service.search_by_imprint(imprint)
-            
-            # Convert external results to PillInfo format
-            for result in external_results[:10]:
-                pill_info = PillInfo(
-                    name=result.get("name", "Unknown"),
-                    dosage=result.get("dosage", "Unknown"),
-                    shape=result.get("shape", "unknown"),
-                    color=result.get("color", "unknown"),
-                    imprint=result.get("imprint"),
-                    manufacturer=result.get("manufacturer", "Unknown"),
-                    ndc_number=result.get("ndc_number")
-                )
-                all_results.append(pill_info)
-        
-        # Step 2: Also search local database
+        # Local database, name and imprint searches all start together
         search_criteria = {}
         if name:
             search_criteria["name"] = name
@@ -236,20 +266,45 @@ async def search_pills(
             search_criteria["color"] = color
         if shape:
             search_criteria["shape"] = shape
-            
+        
+        sources = {}
         if search_criteria:
-            local_results = pill_identifier.search_pills(search_criteria)
-            
-            # Add local results if not duplicates
-            for local_pill in local_results:
-                # Check if already in results (by name+dosage)
-                is_duplicate = any(
-                    r.name.lower() == local_pill.name.lower() and 
-                    r.dosage == local_pill.dosage 
-                    for r in all_results
-                )
-                if not is_duplicate:
-                    all_results.append(local_pill)
+            sources["local"] = lambda: asyncio.to_thread(pill_identifier.search_pills, search_criteria)
+        if name:
+            logger.info(f"Searching external APIs for: {name}")
+            sources["name"] = lambda: pill_data_service.search_by_name(name)
+        if imprint and not name:
+            sources["imprint"] = lambda: pill_data_service.search_by_imprint(imprint)
+        
+        results = await search_orchestrator.run(
+            sources,
+            stop_when=lambda source, result: source == "local" and _is_conclusive_match(source, result, name)
+        )
+        
+        for source in ("name", "imprint"):
+            if source in results:
+                logger.info(f"Found {len(results[source] or [])} results from external {source} search")
+        
+        # External results first (top 10 per source), then local results that aren't duplicates
+        merged = merge_results(
+            (results.get("name") or [])[:10],
+            (results.get("imprint") or [])[:10],
+            results.get("local") or []
+        )
+        
+        # Convert to PillInfo format
+        for result in merged:
+            pill_info = PillInfo(
+                name=result.get("name", "Unknown"),
+                dosage=result.get("dosage", "Unknown"),
+                shape=result.get("shape", "unknown"),
+                color=result.get("color", "unknown"),
+                imprint=result.get("imprint"),
+                size=result.get("size"),
+                manufacturer=result.get("manufacturer", "Unknown"),
+                ndc_number=result.get("ndc_number")
+            )
+            all_results.append(pill_info)
         
         return all_results
         
@@ -262,7 +317,10 @@ async def search_pills(
 
 
 @router.post("/log-dose", response_model=dict)
-async def log_identified_dose(request: LogDoseRequest):
+async def log_identified_dose(
+    request: LogDoseRequest,
+    medication_verifier: "MedicationVerifier" = Depends(get_medication_verifier)
+):
     """
     Log a dose after pill identification
     
@@ -287,11 +345,12 @@ async def log_identified_dose(request: LogDoseRequest):
                 "dosage": request.dosage,
                 "type": "tablet"
             }
-            medication_verifier.add_medication(medication_data)
+            await asyncio.to_thread(medication_verifier.add_medication, medication_data)
             logger.info(f"Added new medication: {medication_id}")
         
-        # Log the dose
-        medication_verifier.log_dose_taken(
+        # Log the dose (store writes wait for their commit, so keep them off the loop)
+        await asyncio.to_thread(
+            medication_verifier.log_dose_taken,
             patient_id=request.patient_id,
             medication_id=medication_id,
             timestamp=datetime.now(),
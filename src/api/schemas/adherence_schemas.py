@@ -42,6 +42,18 @@ class CaregiverAlert(BaseModel):
     severity: str = Field(..., description="Alert severity level")
     timestamp: Optional[datetime] = Field(None, description="Alert timestamp")
     
+class CaregiverContactCreate(BaseModel):
+    """Caregiver to notify about a patient's alerts"""
+    patient_id: str = Field(..., description="Patient identifier")
+    name: str = Field(..., description="Caregiver name")
+    phone: Optional[str] = Field(None, description="Phone number (SMS alerts)")
+    email: Optional[str] = Field(None, description="Email address")
+    relationship: Optional[str] = Field(None, description="Relationship to the patient")
+    is_primary: bool = Field(False, description="Primary caregiver")
+    alert_preferences: Optional[Dict[str, Any]] = Field(
+        None, description="alert_types, min_severity and method ('email' or 'sms')"
+    )
+    
 class TrendAnalysis(BaseModel):
     """Adherence trend analysis"""
     patient_id: str = Field(..., description="Patient identifier")
@@ -45,4 +45,15 @@ class IngestionResponse(BaseModel):
     ingested: bool = Field(..., description="Whether ingestion was detected")
     confidence: float = Field(..., description="Confidence in detection (0.0-1.0)")
     message: str = Field(..., description="Confirmation message")
-    dose_logged: Optional[bool] = Field(None, description="Whether dose was logged")
\ No newline at end of file
+    dose_logged: Optional[bool] = Field(None, description="Whether dose was logged")
+
+class IngestionStreamUpdate(BaseModel):
+    """Running result sent after each frame of an ingestion stream"""
+    frame_index: int = Field(..., description="Index of the frame just analysed")
+    ingested: bool = Field(..., description="Whether ingestion has been detected so far")
+    confidence: float = Field(..., description="Running confidence over the frame window (0.0-1.0)")
+    frame_confidence: float = Field(..., description="Confidence from this frame alone")
+    motion: float = Field(0.0, description="Mean difference from the previous frame (0.0-1.0)")
+    actions: List[str] = Field(default_factory=list, description="Actions detected in the window")
+    message: str = Field(..., description="Status message")
+    dose_logged: bool = Field(False, description="Whether the dose has been logged")
\ No newline at end of file
@@ -142,7 +142,7 @@ class CaregiverContact(Base):
     __tablename__ = "caregiver_contacts"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    patient_id = Column(String, ForeignKey("patients.id"), nullable=False)
+    patient_id = Column(String, ForeignKey("patients.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     relationship_type = Column(String)  # son, daughter, spouse, etc.
     phone = Column(String)
@@ -1,17 +1,16 @@
 """
 Adherence tracking and analytics
 """
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta, date
-import json
+from typing import Dict, List, Mapping, Any, Sequence
+from datetime import datetime, timedelta
 import logging
-from pathlib import Path
 import statistics
 
 from src.api.schemas.adherence_schemas import (
     AdherenceReport, AdherenceStats, MissedDose, 
-    CaregiverAlert, TrendAnalysis
+    TrendAnalysis
 )
+from src.utils.json_store import JsonStore
 
 logger = logging.getLogger(__name__)
 
@@ -22,55 +21,13 @@ class AdherenceTracker:
     
     def __init__(self, logs_path: str = "data/dose_logs.json"):
         self.logs_path = logs_path
-        self.dose_logs = {}
-        # self.caregiver_contacts = {}
-        
-        self._load_dose_logs()
-        self._load_caregiver_contacts()
-    
-    def _load_dose_logs(self):
-        """Load dose taking logs"""
-        try:
-            logs_file = Path(self.logs_path)
-            if logs_file.exists():
-                with open(logs_file, 'r') as f:
-                    self.dose_logs = json.load(f)
-            else:
-                self.dose_logs = {}
-                
-        except Exception as e:
-            logger.error(f"Error loading dose logs: {e}")
-            self.dose_logs = {}
+        # Written by MedicationVerifier (possibly in another worker); reloaded
+        # only when the file changes
+        self._dose_logs = JsonStore(logs_path)
     
-    def _load_caregiver_contacts(self):
-        """Load caregiver contact information"""
-        try:
-            contacts_file = Path("data/caregiver_contacts.json")
-            if contacts_file.exists():
-                with open(contacts_file, 'r') as f:
-                    self.caregiver_contacts = json.load(f)
-            else:
-                self._create_sample_contacts()
-                
-        except Exception as e:
-            logger.error(f"Error loading caregiver contacts: {e}")
-            self._create_sample_contacts()
-    
-    def _create_sample_contacts(self):
-        """Create sample caregiver contacts"""
-        self.caregiver_contacts = {
-            "patient_001": {
-                "name": "John Caregiver",
-                "phone": "+1-555-0123",
-                "email": "john.caregiver@email.com",
-                "relationship": "son"
-            }
-        }
-        
-        contacts_path = Path("data/caregiver_contacts.json")
-        contacts_path.parent.mkdir(exist_ok=True)
-        with open(contacts_path, 'w') as f:
-            json.dump(self.caregiver_contacts, f, indent=2)
+    @property
+    def dose_logs(self) -> Mapping[str, Sequence[Mapping[str, Any]]]:
+        return self._dose_logs.data
     
     def generate_report(
         self, 
@@ -80,9 +37,6 @@ class AdherenceTracker:
     ) -> AdherenceReport:
         """Generate comprehensive adherence report"""
         try:
-            # Reload dose logs to get the latest data from file
-            self._load_dose_logs()
-            
             # Get patient's dose logs
             patient_logs = self.dose_logs.get(patient_id, [])
             
@@ -108,7 +62,9 @@ class AdherenceTracker:
             # Generate recommendations
             recommendations = self._generate_recommendations(stats, missed_doses)
             
-            return AdherenceReport(
+            # Built from validated parts; model_construct skips re-validating
+            # every daily entry (FastAPI then only type-checks the instance)
+            return AdherenceReport.model_construct(
                 patient_id=patient_id,
                 report_period={
                     "start_date": start_date,
@@ -128,9 +84,6 @@ class AdherenceTracker:
     def get_current_stats(self, patient_id: str) -> AdherenceStats:
         """Get current adherence statistics"""
         try:
-            # Reload dose logs to get the latest data from file
-            self._load_dose_logs()
-            
             today = datetime.now().date()
             week_start = today - timedelta(days=7)
             
@@ -394,42 +347,6 @@ class AdherenceTracker:
 
         return recommendations
     
-    def send_caregiver_alert(self, alert: CaregiverAlert) -> Dict[str, Any]:
-        """Send alert to caregiver"""
-        try:
-            # In production, this would integrate with SMS/email services
-            logger.info(f"Sending caregiver alert: {alert.message}")
-            
-            # Mock alert sending
-            alert_id = f"alert_{datetime.now().timestamp()}"
-            
-            # Log the alert
-            alerts_path = Path("data/caregiver_alerts.json")
-            alerts_path.parent.mkdir(exist_ok=True)
-            
-            alerts_log = []
-            if alerts_path.exists():
-                with open(alerts_path, 'r') as f:
-                    alerts_log = json.load(f)
-            
-            alerts_log.append({
-                "alert_id": alert_id,
-                "patient_id": alert.patient_id,
-                "message": alert.message,
-                "severity": alert.severity,
-                "timestamp": (alert.timestamp or datetime.now()).isoformat(),
-                "sent": True
-            })
-            
-            with open(alerts_path, 'w') as f:
-                json.dump(alerts_log, f, indent=2)
-            
-            return {"alert_id": alert_id}
-            
-        except Exception as e:
-            logger.error(f"Error sending caregiver alert: {e}")
-            raise
-    
     def analyze_trends(
         self, 
         patient_id: str, 
@@ -496,9 +413,6 @@ class AdherenceTracker:
     def get_recent_doses(self, patient_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent dose logs for a patient"""
         try:
-            # Reload dose logs to get latest data
-            self._load_dose_logs()
-            
             patient_logs = self.dose_logs.get(patient_id, [])
             
             # Sort by timestamp (most recent first)
@@ -5,11 +5,17 @@ import numpy as np
 # import cv2  # Commented out for compatibility
 from PIL import Image
 # import tensorflow as tf  # Commented out for compatibility
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Sequence, Tuple, Union
 import logging
 import base64
 import io
 
+from src.vision.image_context import ImageContext
+from src.vision.normalization import batch_to_model_input, to_uint8
+from src.models.runtime import ModelRuntime, load_runtime
+from src.utils.config import settings
+from src.vision.image_stats import compute_moments, compute_batch_moments
+
 logger = logging.getLogger(__name__)
 
 class IngestionDetector:
@@ -17,32 +23,52 @@ class IngestionDetector:
     Detects medication ingestion using computer vision and action recognition
     """
     
-    def __init__(self, model_path: str = "data/models/ingestion_detector.h5"):
-        self.model_path = model_path
-        self.model = None
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path or settings.ingestion_model_path
+        self.model: Optional[ModelRuntime] = None
         self.confidence_threshold = 0.75
         
+        # Feature detectors: action name -> (confidence weight, predicate over frame features)
+        self.detectors: Dict[str, Tuple[float, Callable[[Dict[str, float]], bool]]] = {}
+        self.register_detector("face_detected", 0.3, self._detect_face)
+        self.register_detector("mouth_activity", 0.4, self._detect_mouth_activity)
+        self.register_detector("hand_motion", 0.3, self._detect_hand_motion)
+        
         self._load_model()
     
+    def register_detector(
+        self,
+        name: str,
+        weight: float,
+        predicate: Callable[[Dict[str, float]], bool]
+    ):
+        """
+        Add (or replace) a detector that votes on shared frame features
+        
+        Args:
+            name: Action reported when the detector fires
+            weight: Confidence added when it fires
+            predicate: Function of the frame features (see _extract_features)
+        """
+        self.detectors[name] = (weight, predicate)
+    
     def _load_model(self):
-        """Load the trained ingestion detection model"""
-        try:
-            # For now, create a simple mock model
-            # In production, this would load a trained action recognition model
-            self.model = self._create_mock_model()
-            logger.info("Loaded ingestion detection model")
-            
-        except Exception as e:
-            logger.error(f"Error loading ingestion model: {e}")
-            self.model = self._create_mock_model()
+        """
+        Load the exported ingestion detection model
+        
+        Without one, the mock runtime is used and the registered feature
+        detectors decide instead.
+        """
+        self.model = load_runtime(
+            self.model_path,
+            intra_op_threads=settings.model_intra_op_threads,
+            inter_op_threads=settings.model_inter_op_threads
+        )
+        logger.info(f"Loaded ingestion detection model ({self.model.name} runtime)")
     
-    def _create_mock_model(self):
-        """Create a mock model for demonstration"""
-        # Simple model that analyzes basic image features
-        return {
-            "type": "mock",
-            "version": "1.0"
-        }
+    def warmup(self):
+        """Run warm-up inferences so the first request is not slowed by lazy initialization"""
+        self.model.warmup(runs=settings.model_warmup_runs)
     
     def detect_ingestion(
         self, 
@@ -62,23 +88,9 @@ class IngestionDetector:
             Dictionary with ingestion detection results
         """
         try:
-            # Decode base64 image
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
-            image_array = np.array(image)
-            
-            # Process image for ingestion detection
-            processed_image = self._preprocess_image(image_array)
-            
             # Detect ingestion action
-            result = self._analyze_ingestion(processed_image)
-            
-            return {
-                "ingested": result["ingested"],
-                "confidence": result["confidence"],
-                "message": result["message"],
-                "detected_actions": result.get("actions", [])
-            }
+            result = self._analyze_ingestion(self.prepare_frame(image_data))
+            return self.format_result(result)
             
         except Exception as e:
             logger.error(f"Error detecting ingestion: {e}")
@@ -88,33 +100,110 @@ class IngestionDetector:
                 "message": "Error processing image for ingestion detection"
             }
     
-    def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
-        """Preprocess image for ingestion detection"""
+    def prepare_frame(self, image_data: str) -> np.ndarray:
+        """
+        Decode a base64 image and preprocess it for analysis
+        
+        Args:
+            image_data: Base64 encoded image data
+            
+        Returns:
+            uint8 array of shape (224, 224, 3)
+        """
+        # Decode base64 image once into a shared context
+        image_bytes = base64.b64decode(image_data)
+        context = ImageContext.from_bytes(image_bytes)
+        
+        # Process image for ingestion detection (statistics run on uint8)
+        return self._preprocess_image(context)
+    
+    def format_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape an analysis result for API responses"""
+        return {
+            "ingested": result["ingested"],
+            "confidence": result["confidence"],
+            "message": result["message"],
+            "detected_actions": result.get("actions", [])
+        }
+    
+    def analyze_batch(self, frames: Union[np.ndarray, Sequence[np.ndarray]]) -> List[Dict[str, Any]]:
+        """
+        Analyze several frames with one vectorized feature pass
+        
+        Args:
+            frames: uint8 array of shape (N, 224, 224, 3), or a sequence of frames
+            
+        Returns:
+            One analysis result per frame, in order
+        """
+        batch = frames if isinstance(frames, np.ndarray) else np.stack(frames)
+        if not self.model.is_mock:
+            return self._predict_batch(batch)
+        return [self._score_features(features) for features in compute_batch_moments(batch)]
+    
+    def _predict_batch(self, batch: np.ndarray) -> List[Dict[str, Any]]:
+        """Score frames with the exported model (last output column = P(ingested))"""
+        if batch.dtype == np.uint8:
+            batch = batch_to_model_input(batch)
+        scores = self.model.predict(batch)
+        
+        results = []
+        for row in scores.reshape(len(batch), -1):
+            confidence = float(row[-1])
+            ingested = confidence >= self.confidence_threshold
+            results.append({
+                "ingested": ingested,
+                "confidence": confidence,
+                "message": "Medication ingestion detected" if ingested else "Ingestion not clearly detected",
+                "actions": ["model_ingestion"] if ingested else []
+            })
+        return results
+    
+    def _preprocess_image(self, image: Union[np.ndarray, Image.Image, ImageContext]) -> np.ndarray:
+        """
+        Preprocess image for ingestion detection
+        
+        Pixels stay uint8; normalization happens once at model input.
+        
+        Returns:
+            uint8 array of shape (224, 224, 3)
+        """
         try:
-            # Resize image
-            if len(image.shape) == 3:
-                height, width = image.shape[:2]
-            else:
-                height, width = image.shape
-                
             target_size = (224, 224)
             
-            # Convert PIL format if needed
+            if isinstance(image, ImageContext):
+                if image.target_size == target_size:
+                    return image.resized_uint8
+                image = image.rgb_image
+            
+            # Convert numpy input to PIL (float input is rescaled to uint8 first)
             if isinstance(image, np.ndarray):
-                pil_image = Image.fromarray(image)
+                pil_image = Image.fromarray(to_uint8(image))
             else:
                 pil_image = image
+            
+            if pil_image.mode != 'RGB':
+                pil_image = pil_image.convert('RGB')
                 
             resized_image = pil_image.resize(target_size)
             
-            # Convert back to numpy array and normalize
-            processed = np.array(resized_image, dtype=np.float32) / 255.0
-            
-            return processed
+            return np.asarray(resized_image)
             
         except Exception as e:
             logger.error(f"Error preprocessing image: {e}")
-            return np.zeros((224, 224, 3), dtype=np.float32)
+            return np.zeros((224, 224, 3), dtype=np.uint8)
+    
+    def _extract_features(self, image: np.ndarray) -> Dict[str, float]:
+        """
+        Compute the frame features shared by all detectors in one pass
+        
+        Args:
+            image: uint8 pixels, or float pixels in [0, 1]
+            
+        Returns:
+            Dictionary with 'mean', 'var' and 'std' in normalized [0, 1] units
+        """
+        return compute_moments(image)
     
     def _analyze_ingestion(self, image: np.ndarray) -> Dict[str, Any]:
         """
@@ -127,29 +216,32 @@ class IngestionDetector:
         - Hand/pill tracking to confirm pill-to-mouth movement
         """
         try:
-            # Mock analysis based on image properties
-            mean_brightness = np.mean(image)
-            std_brightness = np.std(image)
+            if not self.model.is_mock:
+                return self._predict_batch(image[np.newaxis])[0]
+            
+            # Mock analysis based on image statistics, computed once per frame
+            return self._score_features(self._extract_features(image))
             
+        except Exception as e:
+            logger.error(f"Error analyzing ingestion: {e}")
+            return {
+                "ingested": False,
+                "confidence": 0.0,
+                "message": "Error during analysis"
+            }
+    
+    def _score_features(self, features: Dict[str, float]) -> Dict[str, Any]:
+        """Run the registered detectors on one frame's features"""
+        try:
             # Simple heuristics for demo (replace with actual ML model)
             confidence = 0.0
             ingested = False
             actions = []
             
-            # Check for face-like features (simplified)
-            if mean_brightness > 0.3 and std_brightness > 0.1:
-                confidence += 0.3
-                actions.append("face_detected")
-            
-            # Check for mouth region activity (simplified)
-            if self._detect_mouth_activity(image):
-                confidence += 0.4
-                actions.append("mouth_activity")
-            
-            # Check for hand-to-mouth motion (simplified)
-            if self._detect_hand_motion(image):
-                confidence += 0.3
-                actions.append("hand_motion")
+            for name, (weight, predicate) in self.detectors.items():
+                if predicate(features):
+                    confidence += weight
+                    actions.append(name)
             
             # Determine if ingestion occurred
             if confidence >= self.confidence_threshold:
@@ -173,39 +265,28 @@ class IngestionDetector:
                 "message": "Error during analysis"
             }
     
-    def _detect_mouth_activity(self, image: np.ndarray) -> bool:
+    def _detect_face(self, features: Dict[str, float]) -> bool:
+        """
+        Check for face-like features
+        Simplified version - in production would use a face detector
+        """
+        return features["mean"] > 0.3 and features["std"] > 0.1
+    
+    def _detect_mouth_activity(self, features: Dict[str, float]) -> bool:
         """
         Detect mouth activity in image
         Simplified version - in production would use facial landmarks
         """
-        try:
-            # Mock mouth activity detection
-            # In production, this would use facial landmarks and OpenCV
-            
-            # Simple heuristic based on image variance
-            image_variance = np.var(image)
-            return image_variance > 0.01  # Mock threshold
-            
-        except Exception as e:
-            logger.error(f"Error detecting mouth activity: {e}")
-            return False
+        # Simple heuristic based on image variance
+        return features["var"] > 0.01  # Mock threshold
     
-    def _detect_hand_motion(self, image: np.ndarray) -> bool:
+    def _detect_hand_motion(self, features: Dict[str, float]) -> bool:
         """
         Detect hand motion in image
         Simplified version - in production would track hand movement over time
         """
-        try:
-            # Mock hand motion detection
-            # In production, this would track hand movement over time
-            
-            # Simple heuristic based on image brightness distribution
-            brightness_std = np.std(image)
-            return brightness_std > 0.1  # Mock threshold
-            
-        except Exception as e:
-            logger.error(f"Error detecting hand motion: {e}")
-            return False
+        # Simple heuristic based on image brightness distribution
+        return features["std"] > 0.1  # Mock threshold
     
     def train_model(self, training_data_path: str, epochs: int = 30):
         """
@@ -222,7 +303,7 @@ class IngestionDetector:
             # 1. Load video sequences of medication taking
             # 2. Extract frames and label ingestion events
             # 3. Train CNN or RNN model for action recognition
-            # 4. Save trained model
+            # 4. Export the trained model (e.g. to ONNX) at model_path
             
             # For now, this is a placeholder
             logger.info("Model training completed (placeholder)")
@@ -1,14 +1,13 @@
 """
 Medication verification and schedule management
 """
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Mapping, Optional, Any, Sequence
 from datetime import datetime, time, timedelta
 import logging
-import json
-from pathlib import Path
 
 from src.api.schemas.medication_schemas import MedicationSchedule
 from src.api.schemas.pill_schemas import PillInfo
+from src.utils.json_store import JsonStore
 
 logger = logging.getLogger(__name__)
 
@@ -17,81 +16,51 @@ class MedicationVerifier:
     Handles medication verification against patient schedules
     """
     
-    def __init__(self, schedules_path: str = "data/medication_schedules.json"):
+    def __init__(
+        self,
+        schedules_path: str = "data/medication_schedules.json",
+        medications_path: str = "data/medications.json",
+        logs_path: str = "data/dose_logs.json"
+    ):
         self.schedules_path = schedules_path
-        self.patient_schedules = {}
-        self.dose_logs = {}
-        self.medications_path = "data/medications.json"
-        self.medications = {}
+        self.medications_path = medications_path
+        self.logs_path = logs_path
+        
+        # File-backed stores shared with other worker processes
+        self._schedules = JsonStore(schedules_path)
+        self._medications = JsonStore(medications_path)
+        self._dose_logs = JsonStore(logs_path)
         
-        self._load_schedules()
-        self._load_dose_logs()
-        # Load medications store after schedules/logs
-        self._load_medications()
+        # Start with empty files for a clean user experience
+        for store in (self._schedules, self._medications):
+            if not store.exists:
+                store.reset()
+        logger.info(f"Loaded schedules for {len(self.patient_schedules)} patients")
+        logger.info(f"Loaded {len(self.medications)} medications")
     
-    def _load_schedules(self):
-        """Load patient medication schedules"""
-        try:
-            schedules_file = Path(self.schedules_path)
-            if schedules_file.exists():
-                with open(schedules_file, 'r') as f:
-                    data = json.load(f)
-                    self.patient_schedules = data
-                logger.info(f"Loaded schedules for {len(self.patient_schedules)} patients")
-            else:
-                self._create_sample_schedules()
-                
-        except Exception as e:
-            logger.error(f"Error loading schedules: {e}")
-            self._create_sample_schedules()
+    @property
+    def patient_schedules(self) -> Mapping[str, Sequence[Mapping[str, Any]]]:
+        return self._schedules.data
     
-    def _create_sample_schedules(self):
-        """Create sample medication schedules for demonstration"""
-        # Start with an empty schedules file for a clean user experience
-        self.patient_schedules = {}
-        schedules_dir = Path(self.schedules_path).parent
-        schedules_dir.mkdir(parents=True, exist_ok=True)
-        # Save empty schedules file
-        with open(self.schedules_path, 'w') as f:
-            json.dump(self.patient_schedules, f, indent=2)
-
-    def _load_medications(self):
-        """Load medications catalog (user-added medications)"""
-        try:
-            meds_path = Path(self.medications_path)
-            if meds_path.exists():
-                with open(meds_path, 'r') as f:
-                    self.medications = json.load(f)
-                logger.info(f"Loaded {len(self.medications)} medications")
-            else:
-                # Start with empty medications store
-                self.medications = {}
-                meds_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(meds_path, 'w') as f:
-                    json.dump(self.medications, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error loading medications: {e}")
-            self.medications = {}
+    @property
+    def medications(self) -> Mapping[str, Mapping[str, Any]]:
+        return self._medications.data
+    
+    @property
+    def dose_logs(self) -> Mapping[str, Sequence[Mapping[str, Any]]]:
+        return self._dose_logs.data
 
     def add_medication(self, med_data: Dict[str, Any]) -> Dict[str, Any]:
         """Add a medication to the medications store and return its id"""
+        def insert(medications):
+            # Generate a simple integer id as string (from the latest on-disk state)
+            existing_ids = [int(k) for k in medications.keys() if k.isdigit()]
+            med_id = str(max(existing_ids) + 1 if existing_ids else 0)
+            medications[med_id] = med_data
+            return med_id
+        
         try:
-            # Generate a simple integer id as string
-            next_id = 0
-            if self.medications:
-                existing_ids = [int(k) for k in self.medications.keys() if k.isdigit()]
-                next_id = max(existing_ids) + 1 if existing_ids else 0
-
-            med_id = str(next_id)
-            # Store medication record
-            self.medications[med_id] = med_data
-
-            # Persist
-            meds_path = Path(self.medications_path)
-            meds_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(meds_path, 'w') as f:
-                json.dump(self.medications, f, indent=2)
-
+            med_id = self._medications.update(insert)
             return {"id": med_id, **med_data}
         except Exception as e:
             logger.error(f"Error adding medication: {e}")
@@ -101,30 +70,10 @@ class MedicationVerifier:
         return self.medications.get(str(med_id))
 
     def clear_all_data(self):
-        """Clear in-memory stores and delete persisted files for a clean slate."""
+        """Clear schedules, dose logs and medications (in-memory and on-disk) for a clean slate."""
         try:
-            # Clear in-memory
-            self.patient_schedules = {}
-            self.dose_logs = {}
-            self.medications = {}
-
-            # Remove files if exist
-            for p in [self.schedules_path, 'data/dose_logs.json', self.medications_path]:
-                fp = Path(p)
-                try:
-                    if fp.exists():
-                        fp.unlink()
-                except Exception:
-                    pass
-
-            # Recreate empty files
-            Path(self.schedules_path).parent.mkdir(parents=True, exist_ok=True)
-            with open(self.schedules_path, 'w') as f:
-                json.dump(self.patient_schedules, f, indent=2)
-            with open('data/dose_logs.json', 'w') as f:
-                json.dump(self.dose_logs, f, indent=2)
-            with open(self.medications_path, 'w') as f:
-                json.dump(self.medications, f, indent=2)
+            for store in (self._schedules, self._dose_logs, self._medications):
+                store.reset()
 
             logger.info('Cleared schedules, dose logs, and medications (in-memory and on-disk)')
             return True
@@ -132,20 +81,6 @@ class MedicationVerifier:
             logger.error(f'Error clearing all data: {e}')
             return False
     
-    def _load_dose_logs(self):
-        """Load dose taking logs"""
-        try:
-            logs_path = Path("data/dose_logs.json")
-            if logs_path.exists():
-                with open(logs_path, 'r') as f:
-                    self.dose_logs = json.load(f)
-            else:
-                self.dose_logs = {}
-                
-        except Exception as e:
-            logger.error(f"Error loading dose logs: {e}")
-            self.dose_logs = {}
-    
     def verify_medication(
         self, 
         patient_id: str, 
@@ -268,9 +203,6 @@ class MedicationVerifier:
     ):
         """Log that a dose was successfully taken"""
         try:
-            if patient_id not in self.dose_logs:
-                self.dose_logs[patient_id] = []
-            
             dose_entry = {
                 "medication_id": medication_id,
                 "timestamp": timestamp.isoformat(),
@@ -278,18 +210,13 @@ class MedicationVerifier:
                 "status": "taken"
             }
             
-            self.dose_logs[patient_id].append(dose_entry)
-            
-            # Save updated logs
-            logs_path = Path("data/dose_logs.json")
-            logs_path.parent.mkdir(exist_ok=True)
-            with open(logs_path, 'w') as f:
-                json.dump(self.dose_logs, f, indent=2)
+            self._dose_logs.update(lambda logs: logs.setdefault(patient_id, []).append(dose_entry))
             
             logger.info(f"Logged dose for patient {patient_id}")
             
         except Exception as e:
             logger.error(f"Error logging dose: {e}")
+            raise
     
     def get_patient_schedule(self, patient_id: str) -> List[MedicationSchedule]:
         """Get medication schedule for a patient"""
@@ -319,9 +246,6 @@ class MedicationVerifier:
     def add_to_schedule(self, schedule: MedicationSchedule) -> Dict[str, Any]:
         """Add medication to patient's schedule"""
         try:
-            if schedule.patient_id not in self.patient_schedules:
-                self.patient_schedules[schedule.patient_id] = []
-            
             med_data = {
                 "medication_name": schedule.medication_name,
                 "dosage": schedule.dosage,
@@ -333,15 +257,12 @@ class MedicationVerifier:
                 "prescriber": schedule.prescriber
             }
             
-            self.patient_schedules[schedule.patient_id].append(med_data)
+            def append(schedules):
+                patient_schedule = schedules.setdefault(schedule.patient_id, [])
+                patient_schedule.append(med_data)
+                return len(patient_schedule) - 1
             
-            # Save updated schedules
-            schedules_dir = Path(self.schedules_path).parent
-            schedules_dir.mkdir(exist_ok=True)
-            with open(self.schedules_path, 'w') as f:
-                json.dump(self.patient_schedules, f, indent=2)
-            
-            return {"schedule_id": len(self.patient_schedules[schedule.patient_id]) - 1}
+            return {"schedule_id": self._schedules.update(append)}
             
         except Exception as e:
             logger.error(f"Error adding to schedule: {e}")
@@ -352,24 +273,15 @@ class MedicationVerifier:
 
         Returns True if deleted, False if not found
         """
-        try:
-            if patient_id not in self.patient_schedules:
-                return False
-
-            schedules = self.patient_schedules[patient_id]
-            if schedule_index < 0 or schedule_index >= len(schedules):
+        def remove(schedules):
+            patient_schedule = schedules.get(patient_id, [])
+            if schedule_index < 0 or schedule_index >= len(patient_schedule):
                 return False
-
-            # Remove the schedule entry
-            schedules.pop(schedule_index)
-
-            # Save updated schedules
-            schedules_dir = Path(self.schedules_path).parent
-            schedules_dir.mkdir(exist_ok=True)
-            with open(self.schedules_path, 'w') as f:
-                json.dump(self.patient_schedules, f, indent=2)
-
+            patient_schedule.pop(schedule_index)
             return True
+
+        try:
+            return self._schedules.update(remove)
         except Exception as e:
             logger.error(f"Error deleting schedule: {e}")
-            return False
\ No newline at end of file
+            raise
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Micro-batching queue that groups concurrent inference requests
+"""
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects items from concurrent callers into small batches
+
+    The first queued item opens a batch; it closes after max_wait_ms or
+    once max_batch_size items have arrived. The batch is processed by one
+    call to process_batch in a worker thread and each caller receives the
+    result at its own position. While a batch is processing, the next one
+    is already being collected; at most max_in_flight batches process at
+    once, after which items wait in the queue and form the next batch.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[Sequence[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_in_flight: int = 2,
+        name: str = "batch"
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_in_flight = max(1, max_in_flight)
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        # Items taken off the queue for the batch being collected
+        self._collecting: List[Tuple[Any, asyncio.Future]] = []
+        self._stats = {"batches": 0, "items": 0, "largest_batch": 0, "errors": 0}
+
+    def _ensure_worker(self):
+        """Start the collector task on the running loop (restarting it if needed)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and semaphores are bound to the loop they were used on
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            # A restarted collector picks up whatever is still queued
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item and wait for its result
+
+        Args:
+            item: Input for process_batch
+
+        Returns:
+            The result process_batch produced for this item
+
+        Raises:
+            Exception: Whatever process_batch raised for the batch
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Wait for one item, then gather more until the batch is full or the window closes"""
+        batch = self._collecting = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        self._collecting = []
+        # Callers that gave up (e.g. disconnected) are skipped
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        while True:
+            # Wait for a free processing slot, then collect the next batch
+            # while earlier batches are still running
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = self._loop.create_task(self._process(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _process(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """Run one batch in a worker thread and resolve its callers' futures"""
+        items = [item for item, _ in batch]
+        try:
+            results = await asyncio.to_thread(self.process_batch, items)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"{self.name} batch of {len(items)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        self._stats["batches"] += 1
+        self._stats["items"] += len(items)
+        self._stats["largest_batch"] = max(self._stats["largest_batch"], len(items))
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """
+        Stop the collector task and finish every submitted item
+
+        Batches already processing complete; items still queued or in a
+        half-collected batch are processed as final batches, so no caller
+        is left waiting.
+        """
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+        pending, self._collecting = self._collecting, []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        pending = [(item, future) for item, future in pending if not future.done()]
+        for start in range(0, len(pending), self.max_batch_size):
+            await self._slots.acquire()
+            await self._process(pending[start:start + self.max_batch_size])
+
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def stats(self) -> dict:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "average_batch": round(self._stats["items"] / batches, 2) if batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._in_flight)
+        }
@@ -5,11 +5,18 @@ import numpy as np
 # import cv2  # Commented out for compatibility
 from PIL import Image
 # import tensorflow as tf  # Commented out for compatibility
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Mapping, Optional, Any, Tuple
 import json
 import logging
 from pathlib import Path
 
+from src.api.schemas.pill_schemas import PillInfo
+from src.utils.config import settings
+from src.utils.fuzzy import relevance_scores
+from src.utils.json_store import JsonStore
+from src.models.runtime import ModelRuntime, load_runtime
+from src.vision.normalization import to_model_input
+
 logger = logging.getLogger(__name__)
 
 class PillIdentifier:
@@ -18,58 +25,58 @@ class PillIdentifier:
     Uses CNN for image classification and feature extraction
     """
     
-    def __init__(self, model_path: str = "data/models/pill_identifier.h5"):
-        self.model_path = model_path
-        self.model = None
+    def __init__(self, model_path: Optional[str] = None, database_path: str = "data/pill_database.json"):
+        self.model_path = model_path or settings.pill_model_path
+        self.model: Optional[ModelRuntime] = None
         self.class_names = []
-        self.pill_database = {}
+        # Shared with other worker processes
+        self._database = JsonStore(database_path)
+        # (database view, its entries validated as PillInfo)
+        self._pill_infos: Optional[Tuple[Mapping[str, Any], List[PillInfo]]] = None
         self.confidence_threshold = 0.7
         
         self._load_model()
         self._load_pill_database()
     
     def _load_model(self):
-        """Load the trained pill identification model"""
-        try:
-            # For demo purposes, use mock model
+        """Load the exported pill identification model (mock runtime if none is available)"""
+        self.model = load_runtime(
+            self.model_path,
+            intra_op_threads=settings.model_intra_op_threads,
+            inter_op_threads=settings.model_inter_op_threads
+        )
+        if self.model.is_mock:
             logger.info("Using mock model for demonstration")
-            self.model = self._create_base_model()
-                
-        except Exception as e:
-            logger.error(f"Error loading model: {e}")
-            self.model = self._create_base_model()
+        
+        # Class labels exported next to the model (e.g. pill_identifier.labels.json)
+        labels_path = Path(self.model_path).with_suffix(".labels.json")
+        if labels_path.exists():
+            with open(labels_path, 'r') as f:
+                self.class_names = json.load(f)
+    
+    def warmup(self):
+        """Run warm-up inferences so the first request is not slowed by lazy initialization"""
+        self.model.warmup(runs=settings.model_warmup_runs)
     
-    def _create_base_model(self):
-        """Create a base CNN model for pill identification"""
-        # Mock model for demonstration without TensorFlow
-        return {"type": "mock_cnn", "version": "1.0"}
+    @property
+    def pill_database(self) -> Mapping[str, Mapping[str, Any]]:
+        return self._database.data
     
     def _load_pill_database(self):
-        """Load pill information database"""
+        """Load pill information database, seeding sample data when it is empty"""
         try:
-            db_path = Path("data/pill_database.json")
-            if db_path.exists():
-                with open(db_path, 'r') as f:
-                    self.pill_database = json.load(f)
-                # If empty, create sample data
-                if not self.pill_database:
-                    logger.info("Pill database empty - creating sample data")
-                    self._create_sample_database()
-                else:
-                    logger.info(f"Loaded pill database with {len(self.pill_database)} entries")
+            if self.pill_database:
+                logger.info(f"Loaded pill database with {len(self.pill_database)} entries")
             else:
-                # Create sample database for demo
-                logger.info("Pill database missing - creating sample database")
+                logger.info("Pill database empty or missing - creating sample database")
                 self._create_sample_database()
                 
         except Exception as e:
             logger.error(f"Error loading pill database: {e}")
-            # Create sample data as fallback
-            self._create_sample_database()
     
     def _create_sample_database(self):
         """Create a sample pill database for demonstration"""
-        self.pill_database = {
+        sample = {
             "aspirin_325mg": {
                 "name": "Aspirin",
                 "dosage": "325mg",
@@ -102,11 +109,12 @@ class PillIdentifier:
             }
         }
         
-        # Save sample database
-        db_path = Path("data")
-        db_path.mkdir(exist_ok=True)
-        with open(db_path / "pill_database.json", 'w') as f:
-            json.dump(self.pill_database, f, indent=2)
+        # Seed only if no other worker did so first
+        def seed(database):
+            if not database:
+                database.update(sample)
+        
+        self._database.update(seed)
     
     def identify(self, image: np.ndarray, confidence_threshold: float = None) -> Optional[Dict[str, Any]]:
         """
@@ -123,6 +131,9 @@ class PillIdentifier:
             confidence_threshold = 0.3  # Lower threshold for demo
             
         try:
+            if not self.model.is_mock:
+                return self.identify_batch([image], confidence_threshold)[0]
+            
             # For demo purposes, return mock result with database pills
             if not self.pill_database:
                 return None
@@ -143,6 +154,47 @@ class PillIdentifier:
             logger.error(f"Error during pill identification: {e}")
             return None
     
+    def identify_batch(
+        self,
+        images: List[np.ndarray],
+        confidence_threshold: float = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Identify several preprocessed images with one batched model call
+        
+        Args:
+            images: Preprocessed images (224, 224, 3), uint8 or normalized float
+            confidence_threshold: Minimum confidence for identification
+            
+        Returns:
+            One result (or None) per image, as returned by identify
+        """
+        if confidence_threshold is None:
+            confidence_threshold = 0.3
+        if self.model.is_mock:
+            return [self.identify(image, confidence_threshold) for image in images]
+        
+        batch = np.stack([
+            to_model_input(image) if image.dtype == np.uint8 else image.astype(np.float32, copy=False)
+            for image in images
+        ])
+        scores = self.model.predict(batch)
+        
+        results = []
+        for row in scores:
+            index = int(np.argmax(row))
+            confidence = float(row[index])
+            pill_id = self.class_names[index] if index < len(self.class_names) else None
+            if pill_id in self.pill_database and confidence >= confidence_threshold:
+                results.append({
+                    "pill_info": self.pill_database[pill_id],
+                    "confidence": confidence,
+                    "pill_id": pill_id
+                })
+            else:
+                results.append(None)
+        return results
+    
     def _mock_identification(self, image: np.ndarray) -> Dict[str, Any]:
         """Mock identification for demonstration purposes"""
         # Simple mock based on image properties
@@ -176,10 +228,30 @@ class PillIdentifier:
             "pill_id": pill_id
         }
     
-    def get_all_pills(self) -> List[Dict[str, Any]]:
+    def get_all_pills(self) -> List[Mapping[str, Any]]:
         """Get all pills in the database"""
         return list(self.pill_database.values())
 
+    def get_pill_infos(self) -> List[PillInfo]:
+        """
+        All pills as validated PillInfo models
+
+        The file is shared with other workers and may be edited by hand, so
+        entries are validated once per version of the database; invalid ones
+        are logged and left out.
+        """
+        database = self.pill_database
+        cached = self._pill_infos
+        if cached is None or cached[0] is not database:
+            pills = []
+            for key, entry in database.items():
+                try:
+                    pills.append(PillInfo.model_validate(dict(entry)))
+                except (TypeError, ValueError) as e:
+                    logger.warning(f"Skipping invalid pill database entry '{key}': {e}")
+            cached = self._pill_infos = (database, pills)
+        return list(cached[1])
+
     def add_pill(self, pill_data: Dict[str, Any]) -> Dict[str, Any]:
         """Add a pill entry to the in-memory database and persist it to disk.
 
@@ -188,22 +260,17 @@ class PillIdentifier:
         try:
             # Generate a stable key from name and dosage
             base_key = f"{pill_data.get('name','pill').strip().lower().replace(' ', '_')}_{pill_data.get('dosage','').strip().lower().replace(' ', '_')}"
-            key = base_key
-            counter = 1
-            while key in self.pill_database:
-                key = f"{base_key}_{counter}"
-                counter += 1
 
-            # Ensure directory exists
-            db_dir = Path('data')
-            db_dir.mkdir(parents=True, exist_ok=True)
-
-            self.pill_database[key] = pill_data
-
-            # Persist to disk
-            with open(db_dir / 'pill_database.json', 'w') as f:
-                json.dump(self.pill_database, f, indent=2)
+            def insert(database):
+                key = base_key
+                counter = 1
+                while key in database:
+                    key = f"{base_key}_{counter}"
+                    counter += 1
+                database[key] = pill_data
+                return key
 
+            key = self._database.update(insert)
             return {"id": key, **pill_data}
         except Exception as e:
             logger.error(f"Error adding pill: {e}")
@@ -220,10 +287,14 @@ class PillIdentifier:
             List of matching pills
         """
         results = []
+        name_query = criteria.get("name")
         
         for pill_info in self.pill_database.values():
             match = True
             for key, value in criteria.items():
+                # Names are matched fuzzily below
+                if key == "name" and "name" in pill_info:
+                    continue
                 if key in pill_info:
                     if value.lower() not in pill_info[key].lower():
                         match = False
@@ -235,6 +306,18 @@ class PillIdentifier:
             if match:
                 results.append(pill_info)
         
+        if name_query and results:
+            # Keep substring matches plus close misspellings, best match first
+            scores = relevance_scores(name_query, results, fields=("name",))
+            query_lower = name_query.lower()
+            ranked = [
+                (pill_info, score)
+                for pill_info, score in zip(results, scores)
+                if query_lower in pill_info["name"].lower() or score >= settings.fuzzy_score_cutoff
+            ]
+            ranked.sort(key=lambda item: item[1], reverse=True)
+            results = [pill_info for pill_info, _ in ranked]
+        
         return results
     
     def train_model(self, training_data_path: str, epochs: int = 50):
@@ -250,10 +333,11 @@ class PillIdentifier:
             # This is a placeholder for the actual training implementation
             logger.info(f"Training model with data from {training_data_path}")
             
-            # Save trained model
+            # Trained models are exported (e.g. to ONNX) at model_path;
+            # reload so the new export is served
             model_dir = Path(self.model_path).parent
             model_dir.mkdir(parents=True, exist_ok=True)
-            self.model.save(self.model_path)
+            self._load_model()
             
         except Exception as e:
             logger.error(f"Error training model: {e}")
@@ -262,15 +346,8 @@ class PillIdentifier:
     def clear_database(self):
         """Clear the in-memory pill database and remove persisted file."""
         try:
-            self.pill_database = {}
-            db_path = Path('data')
-            db_path.mkdir(parents=True, exist_ok=True)
-            file_path = db_path / 'pill_database.json'
-            if file_path.exists():
-                file_path.unlink()
-            # Ensure an empty file exists
-            with open(file_path, 'w') as f:
-                json.dump(self.pill_database, f, indent=2)
+            # Leaves an empty file in place
+            self._database.reset()
             logger.info('Cleared pill database (in-memory and on-disk)')
         except Exception as e:
             logger.error(f'Error clearing pill database: {e}')
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+Pluggable CPU inference runtimes for exported models
+"""
+import importlib.util
+import logging
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ONNX Runtime is optional; without it (or without an exported model) the mock runtime is used.
+# It is only imported when a session is created, so importing this module stays cheap.
+ONNX_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+
+
+class ModelRuntime(ABC):
+    """
+    Common interface for model runtimes
+
+    predict always takes a batch: float32 array of shape (N, H, W, C) with
+    values in [0, 1], and returns one output row per input.
+    """
+
+    name = "base"
+    is_mock = False
+
+    def __init__(self, input_shape: Tuple[int, int, int] = (224, 224, 3)):
+        self.input_shape = input_shape
+
+    @abstractmethod
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Score a batch of shape (N, H, W, C); returns an array with N rows"""
+
+    def warmup(self, batch_size: int = 1, runs: int = 1) -> float:
+        """
+        Run dummy batches so first real requests don't pay one-time setup costs
+
+        Returns:
+            Duration of the last warm-up run in milliseconds
+        """
+        dummy = np.zeros((batch_size, *self.input_shape), dtype=np.float32)
+        elapsed = 0.0
+        for _ in range(max(1, runs)):
+            start = time.perf_counter()
+            self.predict(dummy)
+            elapsed = (time.perf_counter() - start) * 1000
+        logger.info(f"Warmed up {self.name} runtime ({elapsed:.1f} ms per batch of {batch_size})")
+        return elapsed
+
+    def describe(self) -> Dict[str, object]:
+        return {"runtime": self.name, "mock": self.is_mock, "input_shape": list(self.input_shape)}
+
+
+class MockRuntime(ModelRuntime):
+    """Stand-in used when no exported model is available"""
+
+    name = "mock"
+    is_mock = True
+
+    def __init__(self, output_size: int = 1, input_shape: Tuple[int, int, int] = (224, 224, 3)):
+        super().__init__(input_shape)
+        self.output_size = output_size
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Uniform scores: the callers' heuristics decide in mock mode
+        return np.full((len(batch), self.output_size), 1.0 / self.output_size, dtype=np.float32)
+
+
+class OnnxRuntime(ModelRuntime):
+    """ONNX Runtime session on the CPU execution provider"""
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 1,
+        input_shape: Tuple[int, int, int] = (224, 224, 3)
+    ):
+        super().__init__(input_shape)
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed")
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # 0 lets ONNX Runtime pick the thread count (one per physical core)
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Exported models may be NCHW; transpose batches to match
+        shape = model_input.shape
+        self.channels_first = len(shape) == 4 and shape[1] in (1, 3) and shape[-1] not in (1, 3)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self.channels_first:
+            batch = batch.transpose(0, 3, 1, 2)
+        inputs = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self.input_name: inputs})[0]
+
+    def describe(self) -> Dict[str, object]:
+        return {**super().describe(), "model_path": self.model_path, "channels_first": self.channels_first}
+
+
+# Runtime factories by model file extension
+RUNTIME_LOADERS: Dict[str, Callable[..., ModelRuntime]] = {}
+
+
+def register_runtime(extension: str, factory: Callable[..., ModelRuntime]):
+    """
+    Register a runtime for a model file extension
+
+    Args:
+        extension: File suffix including the dot (e.g. ".onnx")
+        factory: Called as factory(model_path, intra_op_threads=..., inter_op_threads=...)
+    """
+    RUNTIME_LOADERS[extension.lower()] = factory
+
+
+if ONNX_AVAILABLE:
+    register_runtime(".onnx", OnnxRuntime)
+
+
+def load_runtime(
+    model_path: Optional[str],
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 1,
+    mock_output_size: int = 1
+) -> ModelRuntime:
+    """
+    Load the runtime for an exported model, falling back to the mock runtime
+
+    Args:
+        model_path: Path to the exported model file
+        intra_op_threads: Threads used inside one operator (0 = runtime default)
+        inter_op_threads: Threads used across independent operators
+        mock_output_size: Output width of the mock runtime fallback
+
+    Returns:
+        Loaded ModelRuntime
+    """
+    path = Path(model_path) if model_path else None
+    if path is None or not path.exists():
+        logger.info(f"No exported model at {model_path}; using mock runtime")
+        return MockRuntime(output_size=mock_output_size)
+
+    factory = RUNTIME_LOADERS.get(path.suffix.lower())
+    if factory is None:
+        logger.warning(f"No runtime registered for '{path.suffix}' models ({model_path}); using mock runtime")
+        return MockRuntime(output_size=mock_output_size)
+
+    try:
+        runtime = factory(str(path), intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+        logger.info(f"Loaded {runtime.name} model from {model_path}")
+        return runtime
+    except Exception as e:
+        logger.error(f"Error loading model {model_path}: {e}; using mock runtime")
+        return MockRuntime(output_size=mock_output_size)
@@ -0,0 +1,384 @@
+"""
+Asynchronous caregiver alert queue with batched, de-duplicated delivery
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.api.schemas.adherence_schemas import CaregiverAlert
+from src.services.caregiver_directory import CaregiverDirectory
+from src.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AlertChannel(ABC):
+    """
+    Delivery channel for caregiver alerts (SMS, email, push, ...)
+
+    send receives every alert queued for one caregiver in a batch, so a
+    channel can deliver them as a single message. Raising marks the
+    delivery to that caregiver as failed (it is retried).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def send(self, caregiver_contact: str, alerts: Sequence[Dict[str, Any]]):
+        """Deliver a batch of alerts to one caregiver"""
+
+
+class LogChannel(AlertChannel):
+    """Local stub sink: logs deliveries and keeps them in memory for inspection"""
+
+    name = "log"
+
+    def __init__(self, max_kept: int = 1000):
+        self.max_kept = max_kept
+        self.delivered: List[Tuple[str, List[Dict[str, Any]]]] = []
+
+    async def send(self, caregiver_contact: str, alerts: Sequence[Dict[str, Any]]):
+        logger.info(f"Alert delivery to {caregiver_contact}: {len(alerts)} alert(s)")
+        self.delivered.append((caregiver_contact, list(alerts)))
+        del self.delivered[:-self.max_kept]
+
+
+# Channel factories by name (see settings.alert_channels)
+ALERT_CHANNELS: Dict[str, Callable[[], AlertChannel]] = {}
+
+
+def register_alert_channel(name: str, factory: Callable[[], AlertChannel]):
+    """
+    Register a delivery channel
+
+    Args:
+        name: Name used in settings.alert_channels
+        factory: Called with no arguments to create the channel
+    """
+    ALERT_CHANNELS[name] = factory
+
+
+register_alert_channel("log", LogChannel)
+
+
+def load_channels(names: Sequence[str]) -> List[AlertChannel]:
+    """Create the named channels, skipping unknown names"""
+    channels = []
+    for name in names:
+        factory = ALERT_CHANNELS.get(name)
+        if factory is None:
+            logger.warning(f"No alert channel registered as '{name}'")
+            continue
+        channels.append(factory())
+    return channels
+
+
+class AlertDispatcher:
+    """
+    Queues caregiver alerts and delivers them from a background task
+
+    - enqueue() returns immediately with the alert id
+    - An alert repeating the (patient, caregiver, type, severity) of one
+      queued within dedup_window_seconds is collapsed into it instead of
+      being sent again
+    - The first queued alert opens a batch that closes after batch_window_ms;
+      each alert goes to its caregiver_contact plus, with a directory, every
+      caregiver of the patient whose preferences accept it; alerts are grouped
+      per caregiver and each group is handed to every channel in one call
+    - Deliveries are tracked per caregiver and channel; failed ones are
+      retried after retry_backoff_seconds, doubling with each attempt, up
+      to max_retries times, without repeating the ones that succeeded; an
+      alert that still misses a caregiver is logged as failed and stops
+      suppressing repeats, so the next one goes out
+    - Every alert (delivered, failed or collapsed) is appended to a JSON
+      lines log with one fsync per batch, once its delivery is final
+    """
+
+    def __init__(
+        self,
+        channels: Optional[Sequence[AlertChannel]] = None,
+        batch_window_ms: Optional[float] = None,
+        dedup_window_seconds: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff_seconds: Optional[float] = None,
+        log_path: Optional[str] = None,
+        directory: Optional[CaregiverDirectory] = None
+    ):
+        self.directory = directory
+        self.channels = list(channels) if channels is not None else load_channels(settings.alert_channels)
+        self.batch_window = (
+            settings.alert_batch_window_ms if batch_window_ms is None else batch_window_ms
+        ) / 1000.0
+        self.dedup_window = (
+            settings.alert_dedup_window_seconds if dedup_window_seconds is None else dedup_window_seconds
+        )
+        self.max_retries = settings.alert_max_retries if max_retries is None else max_retries
+        self.retry_backoff = (
+            settings.alert_retry_backoff_seconds if retry_backoff_seconds is None else retry_backoff_seconds
+        )
+        self.log_path = Path(log_path or settings.alert_log_path)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Records taken off the queue for the batch being collected or dispatched
+        self._collecting: List[Dict[str, Any]] = []
+        # id(record) -> (timer, record) for alerts waiting to be retried
+        self._retrying: Dict[int, Tuple[asyncio.TimerHandle, Dict[str, Any]]] = {}
+        # (patient_id, caregiver_contact, alert_type, severity) -> (alert_id, monotonic time queued)
+        self._recent: Dict[Tuple[str, str, str, str], Tuple[str, float]] = {}
+        self._stats = {"queued": 0, "collapsed": 0, "delivered": 0, "retried": 0, "failed": 0, "batches": 0}
+
+    def _ensure_worker(self):
+        """Start the dispatch task on the running loop (restarting it if needed)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Carry queued alerts and pending retries over to the new loop
+            carried = self._take_pending()
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+            for record in carried:
+                self._queue.put_nowait(record)
+        if self._worker is None or self._worker.done():
+            # A restarted task picks up whatever is still queued
+            self._worker = loop.create_task(self._run())
+
+    def enqueue(self, alert: CaregiverAlert) -> Dict[str, Any]:
+        """
+        Queue an alert for delivery
+
+        Args:
+            alert: Caregiver alert from the API
+
+        Returns:
+            Dictionary with 'alert_id' and 'duplicate' (collapsed into an earlier alert)
+        """
+        self._ensure_worker()
+        now = time.monotonic()
+        key = (alert.patient_id, alert.caregiver_contact, alert.alert_type, alert.severity)
+
+        recent = self._recent.get(key)
+        if recent is not None and now - recent[1] < self.dedup_window:
+            self._stats["collapsed"] += 1
+            self._queue.put_nowait(self._record(alert, f"alert_{time.time()}", duplicate_of=recent[0]))
+            return {"alert_id": recent[0], "duplicate": True}
+
+        alert_id = f"alert_{time.time()}"
+        self._recent[key] = (alert_id, now)
+        self._stats["queued"] += 1
+        self._queue.put_nowait(self._record(alert, alert_id))
+        return {"alert_id": alert_id, "duplicate": False}
+
+    @staticmethod
+    def _dedup_key(record: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        return (record["patient_id"], record["caregiver_contact"], record["alert_type"], record["severity"])
+
+    @staticmethod
+    def _record(alert: CaregiverAlert, alert_id: str, duplicate_of: Optional[str] = None) -> Dict[str, Any]:
+        record = {
+            "alert_id": alert_id,
+            "patient_id": alert.patient_id,
+            "caregiver_contact": alert.caregiver_contact,
+            "alert_type": alert.alert_type,
+            "message": alert.message,
+            "severity": alert.severity,
+            "timestamp": (alert.timestamp or datetime.now()).isoformat(),
+            "sent": False,
+            "attempts": 0
+        }
+        if duplicate_of:
+            record["duplicate_of"] = duplicate_of
+        return record
+
+    async def _collect(self) -> List[Dict[str, Any]]:
+        """Wait for one alert, then gather more until the batch window closes"""
+        batch = self._collecting = [await self._queue.get()]
+        deadline = self._loop.time() + self.batch_window
+        while True:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._dispatch(batch)
+            except Exception as e:
+                # Keep serving later alerts; this batch's outcome is unknown
+                alert_ids = [record["alert_id"] for record in batch]
+                logger.error(f"Error dispatching alerts {alert_ids}: {e}")
+            # Not reached on cancellation: close() then finishes the batch
+            self._collecting = []
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _dispatch(self, batch: List[Dict[str, Any]], retry: bool = True):
+        """
+        Deliver one batch per caregiver and append its finished alerts to the log
+
+        Args:
+            batch: Queued records (new, collapsed, or requeued for a retry)
+            retry: Requeue alerts whose delivery failed for some caregiver
+        """
+        records = [record for record in batch if "duplicate_of" not in record]
+        new_records = [record for record in records if "recipients" not in record]
+        recipients = await asyncio.to_thread(self._resolve_recipients, new_records)
+        for record, contacts in zip(new_records, recipients):
+            record["recipients"] = contacts
+
+        # Retries only repeat the (caregiver, channel) deliveries that failed
+        per_caregiver = defaultdict(list)
+        for record in records:
+            record["attempts"] += 1
+            delivered_to = record.setdefault("delivered_to", [])
+            record.setdefault("channels_sent", {})
+            for contact in record["recipients"]:
+                if contact not in delivered_to:
+                    per_caregiver[contact].append(record)
+
+        for contact, alerts in per_caregiver.items():
+            for channel in self.channels:
+                pending = [
+                    record for record in alerts
+                    if channel.name not in record["channels_sent"].get(contact, ())
+                ]
+                if not pending:
+                    continue
+                try:
+                    await channel.send(contact, pending)
+                except Exception as e:
+                    logger.error(f"Error delivering {len(pending)} alert(s) to {contact} via {channel.name}: {e}")
+                    continue
+                for record in pending:
+                    record["channels_sent"].setdefault(contact, []).append(channel.name)
+            for record in alerts:
+                sent_on = record["channels_sent"].get(contact, ())
+                if all(channel.name in sent_on for channel in self.channels):
+                    record["delivered_to"].append(contact)
+
+        finished = [record for record in batch if "duplicate_of" in record]
+        sent_at = datetime.now().isoformat()
+        for record in records:
+            missed = [contact for contact in record["recipients"] if contact not in record["delivered_to"]]
+            if missed and retry and record["attempts"] <= self.max_retries:
+                self._stats["retried"] += 1
+                self._schedule_retry(record)
+                continue
+
+            if record["delivered_to"] and not record["sent"]:
+                record["sent"] = True
+                record["sent_at"] = sent_at
+                self._stats["delivered"] += 1
+            if missed:
+                record["failed_recipients"] = missed
+                self._stats["failed"] += 1
+                self._release_dedup(record)
+            finished.append(record)
+
+        self._stats["batches"] += 1
+        self._prune_recent()
+        if finished:
+            await asyncio.to_thread(self._append_log, finished)
+
+    def _resolve_recipients(self, records: List[Dict[str, Any]]) -> List[List[str]]:
+        """Caregiver addresses per alert (the alert's own contact first, no repeats)"""
+        resolved = []
+        for record in records:
+            contacts = [record["caregiver_contact"]]
+            if self.directory is not None:
+                try:
+                    contacts += self.directory.recipients(
+                        record["patient_id"], record["alert_type"], record["severity"]
+                    )
+                except Exception as e:
+                    logger.error(f"Error looking up caregivers for {record['patient_id']}: {e}")
+            resolved.append(list(dict.fromkeys(contacts)))
+        return resolved
+
+    def _append_log(self, records: List[Dict[str, Any]]):
+        """Append records to the alert log (never rewritten)"""
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"Error writing alert log {self.log_path}: {e}")
+
+    def _schedule_retry(self, record: Dict[str, Any]):
+        """Requeue an alert after a backoff that doubles with each attempt"""
+        delay = self.retry_backoff * 2 ** (record["attempts"] - 1)
+        timer = self._loop.call_later(delay, self._requeue, record)
+        self._retrying[id(record)] = (timer, record)
+
+    def _requeue(self, record: Dict[str, Any]):
+        if self._retrying.pop(id(record), None) is not None:
+            self._queue.put_nowait(record)
+
+    def _take_pending(self) -> List[Dict[str, Any]]:
+        """Remove and return every alert not yet dispatched (being collected, queued or awaiting a retry)"""
+        pending, self._collecting = self._collecting, []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for timer, record in self._retrying.values():
+            timer.cancel()
+            pending.append(record)
+        self._retrying.clear()
+        return pending
+
+    def _release_dedup(self, record: Dict[str, Any]):
+        """Stop collapsing repeats into an alert that was not delivered"""
+        key = self._dedup_key(record)
+        recent = self._recent.get(key)
+        if recent is not None and recent[0] == record["alert_id"]:
+            del self._recent[key]
+
+    def _prune_recent(self):
+        cutoff = time.monotonic() - self.dedup_window
+        self._recent = {key: value for key, value in self._recent.items() if value[1] >= cutoff}
+
+    async def close(self, timeout: float = 5.0):
+        """
+        Let queued alerts go out (up to timeout seconds), then stop the dispatch task
+
+        Alerts still pending afterwards, including those waiting for a retry,
+        get one final delivery attempt.
+        """
+        if self._worker is not None and not self._worker.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), self.batch_window + timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Alert queue not drained before shutdown")
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+        remaining = self._take_pending()
+        if remaining:
+            await self._dispatch(remaining, retry=False)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "awaiting_retry": len(self._retrying),
+            "channels": [channel.name for channel in self.channels]
+        }
@@ -0,0 +1,262 @@
+"""
+Per-patient caregiver lookup backed by the caregiver_contacts table
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base
+from src.database.models import CaregiverContact, Patient
+from src.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Alert severities in increasing order (see Alert.severity)
+SEVERITY_ORDER = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+
+def parse_preferences(raw: Optional[str]) -> Dict[str, Any]:
+    """
+    Parse the alert_preferences JSON column
+
+    Recognized keys (all optional):
+        alert_types: Alert types the caregiver wants (default: all)
+        min_severity: Lowest severity delivered (default: "low")
+        method: "email" or "sms" - which address alerts go to
+    """
+    if not raw:
+        return {}
+    try:
+        preferences = json.loads(raw)
+    except ValueError:
+        logger.warning(f"Ignoring malformed caregiver alert preferences: {raw!r}")
+        return {}
+    if not isinstance(preferences, dict):
+        return {}
+    if preferences.get("alert_types") is not None:
+        preferences["alert_types"] = frozenset(preferences["alert_types"])
+    return preferences
+
+
+class CaregiverDirectory:
+    """
+    Caregiver contacts per patient, served from an in-memory cache
+
+    Each patient's contacts are read with one indexed query on
+    caregiver_contacts.patient_id, their alert_preferences parsed once,
+    and the result cached for cache_ttl_seconds (so contacts added by
+    other workers show up within the TTL). Alert fan-out is then a walk
+    over that patient's caregivers only.
+    """
+
+    def __init__(self, engine=None, cache_ttl_seconds: Optional[float] = None, legacy_path: str = "data/caregiver_contacts.json"):
+        self.engine = engine or self._default_engine()
+        self.Session = sessionmaker(bind=self.engine)
+        self.cache_ttl = settings.caregiver_cache_ttl_seconds if cache_ttl_seconds is None else cache_ttl_seconds
+        self.legacy_path = Path(legacy_path)
+
+        # patient_id -> (monotonic load time, contacts)
+        self._cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+        self.ensure_schema()
+        self.import_legacy_contacts()
+
+    @staticmethod
+    def _default_engine():
+        """SQLite database at settings.caregiver_db_path (separate from the tracked medadhere.db)"""
+        path = Path(settings.caregiver_db_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    def ensure_schema(self):
+        """Create the contacts table and its patient_id index if they are missing"""
+        Base.metadata.create_all(bind=self.engine, tables=[Patient.__table__, CaregiverContact.__table__])
+        # create_all skips existing tables, including indexes added later
+        for index in CaregiverContact.__table__.indexes:
+            index.create(bind=self.engine, checkfirst=True)
+
+    def import_legacy_contacts(self) -> int:
+        """
+        Copy contacts from the old flat JSON file (patient_id -> contact) once
+
+        Only runs while the table is empty; the JSON file is never rewritten.
+        The emptiness check and the inserts share one write-locked
+        transaction, so workers starting together import the file once.
+
+        Returns:
+            Number of contacts imported
+        """
+        if not self.legacy_path.exists():
+            return 0
+        try:
+            with open(self.legacy_path, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading legacy caregiver contacts: {e}")
+            return 0
+
+        rows = [
+            {
+                "patient_id": patient_id,
+                "name": contact.get("name", "Caregiver"),
+                "relationship_type": contact.get("relationship"),
+                "phone": contact.get("phone"),
+                "email": contact.get("email"),
+                "is_primary": True
+            }
+            for patient_id, contact in legacy.items()
+        ]
+        table = CaregiverContact.__table__
+        with self._write_transaction() as connection:
+            if connection.execute(select(table.c.id).limit(1)).first() is not None:
+                return 0
+            if rows:
+                connection.execute(table.insert(), rows)
+
+        logger.info(f"Imported {len(rows)} caregiver contacts from {self.legacy_path}")
+        return len(rows)
+
+    @contextmanager
+    def _write_transaction(self):
+        """A transaction that holds the write lock on caregiver_contacts from its first statement"""
+        dialect = self.engine.dialect.name
+        if dialect != "sqlite":
+            with self.engine.begin() as connection:
+                if dialect == "postgresql":
+                    connection.exec_driver_sql("LOCK TABLE caregiver_contacts IN SHARE ROW EXCLUSIVE MODE")
+                yield connection
+            return
+
+        # pysqlite only sends BEGIN before the first write, which lets two
+        # workers both see an empty table; take the lock up front instead
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.exec_driver_sql("ROLLBACK")
+                raise
+            connection.exec_driver_sql("COMMIT")
+
+    def contacts_for(self, patient_id: str) -> List[Dict[str, Any]]:
+        """
+        All caregivers of a patient (primary first) with parsed preferences
+
+        The dictionaries are copies; changing them does not affect the cache.
+
+        Args:
+            patient_id: Patient identifier
+
+        Returns:
+            List of contact dictionaries
+        """
+        cached = self._cache.get(patient_id)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            return self._copy(cached[1])
+
+        with self.Session() as session:
+            rows = (
+                session.query(CaregiverContact)
+                .filter(CaregiverContact.patient_id == patient_id)
+                .order_by(CaregiverContact.is_primary.desc(), CaregiverContact.id)
+                .all()
+            )
+            contacts = [
+                {
+                    "id": row.id,
+                    "patient_id": row.patient_id,
+                    "name": row.name,
+                    "relationship": row.relationship_type,
+                    "phone": row.phone,
+                    "email": row.email,
+                    "is_primary": bool(row.is_primary),
+                    "preferences": parse_preferences(row.alert_preferences)
+                }
+                for row in rows
+            ]
+
+        with self._lock:
+            self._cache[patient_id] = (time.monotonic(), contacts)
+        return self._copy(contacts)
+
+    @staticmethod
+    def _copy(contacts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies of cached contacts, so callers cannot change the cache"""
+        return [{**contact, "preferences": dict(contact["preferences"])} for contact in contacts]
+
+    def add_contact(
+        self,
+        patient_id: str,
+        name: str,
+        phone: Optional[str] = None,
+        email: Optional[str] = None,
+        relationship: Optional[str] = None,
+        is_primary: bool = False,
+        alert_preferences: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """Store a caregiver contact and return its id"""
+        with self.Session() as session:
+            contact = CaregiverContact(
+                patient_id=patient_id,
+                name=name,
+                relationship_type=relationship,
+                phone=phone,
+                email=email,
+                is_primary=is_primary,
+                alert_preferences=json.dumps(alert_preferences) if alert_preferences else None
+            )
+            session.add(contact)
+            session.commit()
+            contact_id = contact.id
+
+        self.invalidate(patient_id)
+        return contact_id
+
+    def invalidate(self, patient_id: Optional[str] = None):
+        """Drop cached contacts for one patient (or all)"""
+        with self._lock:
+            if patient_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(patient_id, None)
+
+    @staticmethod
+    def _accepts(preferences: Dict[str, Any], alert_type: str, severity: str) -> bool:
+        alert_types = preferences.get("alert_types")
+        if alert_types is not None and alert_type not in alert_types:
+            return False
+        minimum = SEVERITY_ORDER.get(preferences.get("min_severity", "low"), 0)
+        return SEVERITY_ORDER.get(severity, len(SEVERITY_ORDER)) >= minimum
+
+    def recipients(self, patient_id: str, alert_type: str, severity: str) -> List[str]:
+        """
+        Addresses of the patient's caregivers whose preferences accept an alert
+
+        Args:
+            patient_id: Patient identifier
+            alert_type: e.g. missed_dose, low_adherence
+            severity: low, medium, high or critical
+
+        Returns:
+            Phone numbers or email addresses, one per accepting caregiver
+        """
+        addresses = []
+        for contact in self.contacts_for(patient_id):
+            preferences = contact["preferences"]
+            if not self._accepts(preferences, alert_type, severity):
+                continue
+            if preferences.get("method") == "sms":
+                address = contact["phone"] or contact["email"]
+            else:
+                address = contact["email"] or contact["phone"]
+            if address:
+                addresses.append(address)
+        return addresses
@@ -0,0 +1,155 @@
+"""
+Per-upstream circuit breaker with rolling error and latency statistics
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit for {name} is open (retry in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Fails fast when an upstream is erroring or slow
+
+    Outcomes of the last `window_size` calls are kept; a call counts as a
+    failure if it raised or took longer than `slow_call_seconds`. Once at
+    least `min_calls` are recorded and the failure rate reaches
+    `failure_rate`, the circuit opens and calls are rejected for
+    `open_seconds`. After that a single probe call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+
+        # (failed, latency) for recent calls
+        self._window: Deque[Tuple[bool, float]] = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the open period has passed"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def _before_call(self):
+        """Reject the call if the circuit is open or a half-open probe is already running"""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probe_in_flight):
+            self._stats["rejected"] += 1
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(self.name, retry_in)
+        if state == HALF_OPEN:
+            self._probe_in_flight = True
+
+    def _record(self, failed: bool, latency: float):
+        """Record a call outcome and update the circuit state"""
+        slow = latency > self.slow_call_seconds
+        failed = failed or slow
+        self._stats["calls"] += 1
+        self._stats["failures"] += failed
+        self._stats["slow_calls"] += slow
+
+        if self._state == HALF_OPEN:
+            self._probe_in_flight = False
+            if failed:
+                self._open()
+            else:
+                logger.info(f"Circuit for {self.name} closed after successful probe")
+                self._state = CLOSED
+                self._window.clear()
+            return
+
+        self._window.append((failed, latency))
+        if self._state == CLOSED and len(self._window) >= self.min_calls:
+            if self.error_rate() >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        logger.warning(f"Circuit for {self.name} opened (failure rate {self.error_rate():.0%})")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._stats["opened"] += 1
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn through the breaker
+
+        Args:
+            fn: Coroutine factory for the upstream call
+
+        Returns:
+            Result of fn
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        self._before_call()
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except BaseException as e:
+            # Cancellation says nothing about the upstream's health
+            if isinstance(e, Exception):
+                self._record(True, time.monotonic() - start)
+            elif self._state == HALF_OPEN:
+                self._probe_in_flight = False
+            raise
+        self._record(False, time.monotonic() - start)
+        return result
+
+    def error_rate(self) -> float:
+        """Failure rate over the rolling window"""
+        if not self._window:
+            return 0.0
+        return sum(failed for failed, _ in self._window) / len(self._window)
+
+    def stats(self) -> Dict[str, Any]:
+        """State, counters and rolling latency percentiles"""
+        latencies = sorted(latency for _, latency in self._window)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 3),
+            "window_calls": len(self._window),
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            **self._stats
+        }
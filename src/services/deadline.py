@@ -0,0 +1,54 @@
+"""
+Per-request time budget for work that may wait on external services
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    A fixed time budget started when the request begins
+
+    Stages await slow work through `run`, which gives up once the budget
+    is spent and returns a fallback instead.
+    """
+
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self._expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (never negative)"""
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    async def run(self, awaitable: Awaitable[Any], default: Any = None, label: Optional[str] = None) -> Any:
+        """
+        Await within the remaining budget
+
+        Args:
+            awaitable: Work to wait for (cancelled if the budget runs out)
+            default: Value returned when the budget runs out
+            label: Name used when logging a timeout
+
+        Returns:
+            Result of the awaitable, or default on timeout
+        """
+        if self.expired:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            logger.info(f"Skipped {label or 'call'}: request deadline already passed")
+            return default
+
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            logger.info(f"{label or 'call'} exceeded the {self.budget:.2f}s request deadline")
+            return default
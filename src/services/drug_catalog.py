@@ -0,0 +1,514 @@
+"""
+Offline drug catalog backed by SQLite (FTS5) for local-first lookups
+
+The catalog is built from bulk downloads:
+- FDA NDC directory "product.txt" (tab-delimited)
+- RxNorm "RXNCONSO.RRF" (pipe-delimited)
+
+Usage:
+    python -m src.services.drug_catalog import-ndc path/to/product.txt
+    python -m src.services.drug_catalog import-rxnorm path/to/RXNCONSO.RRF
+    python -m src.services.drug_catalog generate-sample
+"""
+import argparse
+import csv
+import logging
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from src.utils.fuzzy import rank
+from src.utils.helpers import extract_dosage
+
+logger = logging.getLogger(__name__)
+
+# RxNorm term types for clinical/branded drugs and their ingredients
+RXNORM_TERM_TYPES = {"IN", "PIN", "BN", "SCD", "SBD", "SCDF", "SBDF", "GPCK", "BPCK"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    generic_name TEXT,
+    dosage TEXT,
+    dosage_form TEXT,
+    ndc_number TEXT,
+    ndc_digits TEXT,
+    manufacturer TEXT,
+    rxcui TEXT,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_ndc_digits ON products(ndc_digits);
+CREATE INDEX IF NOT EXISTS idx_products_rxcui ON products(rxcui);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, generic_name, dosage, content='products', content_rowid='id'
+);
+"""
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _normalize_ndc(ndc: str) -> str:
+    """Strip an NDC down to its digits for indexed matching"""
+    return re.sub(r"\D", "", ndc or "")
+
+
+def _ndc_candidates(ndc: str) -> List[str]:
+    """
+    ndc_digits values an NDC query can match, longest first
+
+    Catalog rows hold the product NDC (labeler + product code, 8 or 9
+    digits). A query may be that code or a package NDC: 10 digits, or the
+    11-digit 5-4-2 billing form with one padding zero added.
+    """
+    parts = re.findall(r"\d+", ndc or "")
+    digits = "".join(parts)
+    if not digits:
+        return []
+
+    candidates = {digits}
+    if len(parts) >= 2:
+        candidates.add(parts[0] + parts[1])
+
+    ten_digit_forms = [digits] if len(digits) == 10 else []
+    if len(digits) == 11:
+        # Undo the padding of a 4-4-2, 5-3-2 or 5-4-1 code
+        for position in (0, 5, 9):
+            if digits[position] == "0":
+                ten_digit_forms.append(digits[:position] + digits[position + 1:])
+    for form in ten_digit_forms:
+        candidates.update((form, form[:8], form[:9]))
+
+    return sorted(candidates, key=len, reverse=True)
+
+
+def looks_like_ndc(query: str) -> bool:
+    """Check if a query is an NDC code (digits with optional dashes)"""
+    return bool(re.fullmatch(r"\d{4,5}-?\d{3,4}(-?\d{1,2})?", query.strip()))
+
+
+class DrugCatalog:
+    """
+    Local drug catalog with indexed name, generic name and NDC search
+    """
+
+    def __init__(self, db_path: str = "data/drug_catalog.db"):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self.fts_enabled = True
+
+    @property
+    def exists(self) -> bool:
+        """Whether the catalog database file is present"""
+        return Path(self.db_path).exists()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the catalog and create the schema on first use"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+            except sqlite3.OperationalError as e:
+                # SQLite built without FTS5: fall back to LIKE scans
+                logger.warning(f"FTS5 unavailable, catalog search will use LIKE: {e}")
+                self.fts_enabled = False
+            self._conn = conn
+        return self._conn
+
+    def count(self) -> int:
+        """Number of products in the catalog"""
+        return self._get_conn().execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def _insert_products(self, rows: Iterable[Dict[str, Any]], replace_source: str) -> int:
+        """Replace all products from one source with the given rows"""
+        conn = self._get_conn()
+        with conn:
+            conn.execute("DELETE FROM products WHERE source = ?", (replace_source,))
+            cursor = conn.executemany(
+                """
+                INSERT INTO products
+                    (name, generic_name, dosage, dosage_form, ndc_number, ndc_digits, manufacturer, rxcui, source)
+                VALUES
+                    (:name, :generic_name, :dosage, :dosage_form, :ndc_number, :ndc_digits, :manufacturer, :rxcui, :source)
+                """,
+                rows
+            )
+            inserted = cursor.rowcount
+            if self.fts_enabled:
+                conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+        return inserted
+
+    def import_ndc_products(self, path: str) -> int:
+        """
+        Import the FDA NDC directory product file
+
+        Args:
+            path: Path to product.txt (tab-delimited, with header row)
+
+        Returns:
+            Number of products imported
+        """
+        def rows() -> Iterator[Dict[str, Any]]:
+            with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+                for record in csv.DictReader(f, delimiter="\t"):
+                    name = (record.get("PROPRIETARYNAME") or record.get("NONPROPRIETARYNAME") or "").strip()
+                    if not name:
+                        continue
+                    strength = (record.get("ACTIVE_NUMERATOR_STRENGTH") or "").split(";")[0].strip()
+                    unit = (record.get("ACTIVE_INGRED_UNIT") or "").split(";")[0].strip()
+                    ndc = (record.get("PRODUCTNDC") or "").strip()
+                    yield {
+                        "name": name,
+                        "generic_name": (record.get("NONPROPRIETARYNAME") or "").strip(),
+                        "dosage": f"{strength} {unit}".strip(),
+                        "dosage_form": (record.get("DOSAGEFORMNAME") or "").strip(),
+                        "ndc_number": ndc,
+                        "ndc_digits": _normalize_ndc(ndc),
+                        "manufacturer": (record.get("LABELERNAME") or "Unknown").strip(),
+                        "rxcui": None,
+                        "source": "NDC"
+                    }
+
+        count = self._insert_products(rows(), replace_source="NDC")
+        logger.info(f"Imported {count} NDC products from {path}")
+        return count
+
+    def import_rxnorm_concepts(self, path: str) -> int:
+        """
+        Import drug concepts from RxNorm's RXNCONSO.RRF
+
+        Args:
+            path: Path to RXNCONSO.RRF (pipe-delimited, no header)
+
+        Returns:
+            Number of concepts imported
+        """
+        def rows() -> Iterator[Dict[str, Any]]:
+            seen = set()
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    fields = line.rstrip("\n").split("|")
+                    if len(fields) < 17:
+                        continue
+                    rxcui, language, source, term_type, text, suppress = (
+                        fields[0], fields[1], fields[11], fields[12], fields[14], fields[16]
+                    )
+                    if language != "ENG" or source != "RXNORM" or suppress not in ("N", ""):
+                        continue
+                    if term_type not in RXNORM_TERM_TYPES or (rxcui, text) in seen:
+                        continue
+                    seen.add((rxcui, text))
+                    yield {
+                        "name": text,
+                        "generic_name": text,
+                        "dosage": extract_dosage(text),
+                        "dosage_form": term_type,
+                        "ndc_number": None,
+                        "ndc_digits": None,
+                        "manufacturer": "Various",
+                        "rxcui": rxcui,
+                        "source": "RxNorm"
+                    }
+
+        count = self._insert_products(rows(), replace_source="RxNorm")
+        logger.info(f"Imported {count} RxNorm concepts from {path}")
+        return count
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _format(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a catalog row to the PillDataService result schema"""
+        result = {
+            "name": row["name"],
+            "generic_name": row["generic_name"] or "",
+            "dosage": row["dosage"] or "",
+            "shape": "unknown",
+            "color": "unknown",
+            "ndc_number": row["ndc_number"] or "",
+            "manufacturer": row["manufacturer"] or "Unknown",
+            "source": f"Local {row['source']}",
+            "description": row["dosage_form"] or ""
+        }
+        if row["rxcui"]:
+            result["rxcui"] = row["rxcui"]
+        return result
+
+    def _candidates(self, tokens: List[str], limit: int) -> List[sqlite3.Row]:
+        """Fetch rows whose name or generic name has every token as a word prefix"""
+        conn = self._get_conn()
+        if self.fts_enabled:
+            match = " ".join(f'"{token}"*' for token in tokens)
+            return conn.execute(
+                """
+                SELECT products.* FROM products_fts
+                JOIN products ON products.id = products_fts.rowid
+                WHERE products_fts MATCH ?
+                ORDER BY bm25(products_fts)
+                LIMIT ?
+                """,
+                (match, limit)
+            ).fetchall()
+
+        clauses = " AND ".join(
+            "(lower(name) LIKE ? OR lower(generic_name) LIKE ? OR lower(dosage) LIKE ?)" for _ in tokens
+        )
+        params: List[Any] = []
+        for token in tokens:
+            params.extend([f"%{token}%"] * 3)
+        return conn.execute(
+            f"SELECT * FROM products WHERE {clauses} LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+
+    def search_by_name(
+        self,
+        query: str,
+        limit: int = 10,
+        min_score: Optional[float] = None,
+        candidate_limit: int = 200,
+        typo_tolerant: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Search brand and generic names with prefix matching and fuzzy ranking
+
+        Prefix matches (on name, generic name or dosage) are tried first; if
+        none are found and typo_tolerant is set, candidates sharing a short
+        prefix with each token are ranked instead, so small typos still find
+        the drug. Products that
+        differ only by labeler or NDC are collapsed to the best match.
+
+        Args:
+            query: Medication name (brand or generic)
+            limit: Maximum results
+            min_score: Minimum fuzzy score for typo-tolerant matches
+                (defaults to settings.fuzzy_score_cutoff)
+            candidate_limit: Rows fetched from the index before ranking
+            typo_tolerant: Fall back to short-prefix candidates when nothing matches
+
+        Returns:
+            Ranked results in the PillDataService schema
+        """
+        normalized = " ".join(query.lower().split())
+        tokens = _TOKEN_PATTERN.findall(normalized)
+        if not tokens:
+            return []
+
+        rows = self._candidates(tokens, candidate_limit)
+        threshold = 0.0
+        if not rows and typo_tolerant:
+            if min_score is None:
+                from src.utils.config import settings
+                min_score = settings.fuzzy_score_cutoff
+            rows = self._candidates([token[:3] for token in tokens], candidate_limit)
+            threshold = min_score
+
+        # Score names with and without dosage so "lipitor 40" ranks the 40 mg product first
+        candidates = [
+            {
+                "row": row,
+                "name": row["name"],
+                "generic_name": row["generic_name"],
+                "name_dosage": f"{row['name']} {row['dosage'] or ''}",
+                "generic_dosage": f"{row['generic_name'] or ''} {row['dosage'] or ''}"
+            }
+            for row in rows
+        ]
+        scored = rank(
+            normalized,
+            candidates,
+            fields=("name", "generic_name", "name_dosage", "generic_dosage"),
+            score_cutoff=threshold
+        )
+
+        results = []
+        seen = set()
+        for candidate, score in scored:
+            row = candidate["row"]
+            key = ((row["name"] or "").lower(), (row["dosage"] or "").lower(), (row["generic_name"] or "").lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            result = self._format(row)
+            result["relevance"] = score
+            results.append(result)
+            if len(results) >= limit:
+                break
+        return results
+
+    def search_by_ndc(self, ndc: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Look up products by NDC (with or without dashes, product or package code)
+
+        Args:
+            ndc: NDC code
+            limit: Maximum results
+
+        Returns:
+            Matching products in the PillDataService schema (relevance 1.0)
+        """
+        candidates = _ndc_candidates(ndc)
+        if not candidates:
+            return []
+        placeholders = ", ".join("?" for _ in candidates)
+        rows = self._get_conn().execute(
+            f"SELECT * FROM products WHERE ndc_digits IN ({placeholders}) AND ndc_digits != '' "
+            "ORDER BY length(ndc_digits) DESC LIMIT ?",
+            (*candidates, limit)
+        ).fetchall()
+
+        results = []
+        for row in rows:
+            result = self._format(row)
+            result["relevance"] = 1.0
+            results.append(result)
+        return results
+
+
+# ----------------------------------------------------------------------
+# Sample data
+# ----------------------------------------------------------------------
+
+SAMPLE_DRUGS = [
+    ("Bayer Aspirin", "Aspirin", ["81", "325"], "TABLET", "Bayer HealthCare LLC"),
+    ("Advil", "Ibuprofen", ["200"], "TABLET, COATED", "Haleon US Holdings LLC"),
+    ("Motrin IB", "Ibuprofen", ["200"], "TABLET", "Kenvue Brands LLC"),
+    ("Tylenol", "Acetaminophen", ["325", "500"], "TABLET", "Kenvue Brands LLC"),
+    ("Lipitor", "Atorvastatin Calcium", ["10", "20", "40", "80"], "TABLET, FILM COATED", "Viatris Specialty LLC"),
+    ("Zocor", "Simvastatin", ["10", "20", "40"], "TABLET, FILM COATED", "Organon LLC"),
+    ("Glucophage", "Metformin Hydrochloride", ["500", "850", "1000"], "TABLET, FILM COATED", "EMD Serono"),
+    ("Prinivil", "Lisinopril", ["5", "10", "20"], "TABLET", "Merck Sharp & Dohme LLC"),
+    ("Norvasc", "Amlodipine Besylate", ["2.5", "5", "10"], "TABLET", "Viatris Specialty LLC"),
+    ("Synthroid", "Levothyroxine Sodium", ["25", "50", "100"], "TABLET", "AbbVie Inc."),
+    ("Prilosec", "Omeprazole", ["20", "40"], "CAPSULE, DELAYED RELEASE", "AstraZeneca"),
+    ("Zoloft", "Sertraline Hydrochloride", ["25", "50", "100"], "TABLET, FILM COATED", "Viatris Specialty LLC"),
+    ("Coumadin", "Warfarin Sodium", ["1", "2", "5"], "TABLET", "Bristol-Myers Squibb"),
+    ("Lasix", "Furosemide", ["20", "40"], "TABLET", "Validus Pharmaceuticals LLC"),
+    ("Neurontin", "Gabapentin", ["100", "300", "400"], "CAPSULE", "Viatris Specialty LLC"),
+    ("Amoxil", "Amoxicillin", ["250", "500"], "CAPSULE", "GlaxoSmithKline"),
+    ("Cozaar", "Losartan Potassium", ["25", "50", "100"], "TABLET, FILM COATED", "Organon LLC"),
+    ("Plavix", "Clopidogrel Bisulfate", ["75"], "TABLET, FILM COATED", "Bristol-Myers Squibb"),
+]
+
+NDC_PRODUCT_COLUMNS = [
+    "PRODUCTID", "PRODUCTNDC", "PRODUCTTYPENAME", "PROPRIETARYNAME", "PROPRIETARYNAMESUFFIX",
+    "NONPROPRIETARYNAME", "DOSAGEFORMNAME", "ROUTENAME", "STARTMARKETINGDATE", "ENDMARKETINGDATE",
+    "MARKETINGCATEGORYNAME", "APPLICATIONNUMBER", "LABELERNAME", "SUBSTANCENAME",
+    "ACTIVE_NUMERATOR_STRENGTH", "ACTIVE_INGRED_UNIT", "PHARM_CLASSES", "DEASCHEDULE",
+    "NDC_EXCLUDE_FLAG", "LISTING_RECORD_CERTIFIED_THROUGH"
+]
+
+
+def write_sample_ndc_file(path: str, generic_copies: int = 3) -> int:
+    """
+    Write a synthetic NDC product file in the FDA bulk format
+
+    Each sample drug is written as its brand product plus generic copies
+    from numbered labelers, with deterministic NDC codes.
+
+    Args:
+        path: Output path for the tab-delimited file
+        generic_copies: Generic labelers per brand product
+
+    Returns:
+        Number of product rows written
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=NDC_PRODUCT_COLUMNS, delimiter="\t")
+        writer.writeheader()
+        for drug_index, (brand, generic, strengths, form, labeler) in enumerate(SAMPLE_DRUGS):
+            for strength_index, strength in enumerate(strengths):
+                for copy in range(generic_copies + 1):
+                    labeler_code = 10000 + copy * 1000 + drug_index
+                    product_code = f"{strength_index + 1:02d}{copy:02d}"
+                    ndc = f"{labeler_code}-{product_code}"
+                    writer.writerow({
+                        "PRODUCTID": f"{ndc}_sample",
+                        "PRODUCTNDC": ndc,
+                        "PRODUCTTYPENAME": "HUMAN PRESCRIPTION DRUG",
+                        "PROPRIETARYNAME": brand if copy == 0 else generic,
+                        "NONPROPRIETARYNAME": generic,
+                        "DOSAGEFORMNAME": form,
+                        "ROUTENAME": "ORAL",
+                        "LABELERNAME": labeler if copy == 0 else f"Generic Labeler {copy}",
+                        "SUBSTANCENAME": generic.upper(),
+                        "ACTIVE_NUMERATOR_STRENGTH": strength,
+                        "ACTIVE_INGRED_UNIT": "mg/1",
+                    })
+                    written += 1
+    return written
+
+
+def generate_sample_catalog(
+    db_path: str = "data/drug_catalog.db",
+    ndc_path: Optional[str] = None,
+    generic_copies: int = 3
+) -> DrugCatalog:
+    """
+    Build a catalog from synthetic stand-in data (for development and tests)
+
+    Args:
+        db_path: Catalog database path
+        ndc_path: Where to write the synthetic product file (defaults next to db_path)
+        generic_copies: Generic labelers per brand product
+
+    Returns:
+        Populated DrugCatalog
+    """
+    if ndc_path is None:
+        ndc_path = str(Path(db_path).with_name("sample_ndc_product.txt"))
+    write_sample_ndc_file(ndc_path, generic_copies=generic_copies)
+
+    catalog = DrugCatalog(db_path)
+    catalog.import_ndc_products(ndc_path)
+    return catalog
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for building the offline catalog"""
+    from src.utils.config import settings
+
+    parser = argparse.ArgumentParser(description="Build the offline drug catalog")
+    parser.add_argument("--db", default=settings.drug_catalog_path, help="Catalog database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("import-ndc", help="Import FDA NDC product.txt").add_argument("path")
+    commands.add_parser("import-rxnorm", help="Import RxNorm RXNCONSO.RRF").add_argument("path")
+    sample = commands.add_parser("generate-sample", help="Build a catalog from synthetic data")
+    sample.add_argument("--generic-copies", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate-sample":
+        catalog = generate_sample_catalog(args.db, generic_copies=args.generic_copies)
+    else:
+        catalog = DrugCatalog(args.db)
+        if args.command == "import-ndc":
+            catalog.import_ndc_products(args.path)
+        else:
+            catalog.import_rxnorm_concepts(args.path)
+
+    print(f"Catalog {args.db} contains {catalog.count()} products")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
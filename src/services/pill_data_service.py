@@ -1,165 +1,490 @@
 """
 Service to fetch real pill data from external medical databases
 """
+import asyncio
 import httpx
 import logging
-from typing import Dict, List, Optional, Any
-from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Any, Awaitable, Callable
+
+from src.utils.config import settings
+from src.utils.helpers import extract_dosage
+from src.utils.fuzzy import relevance_scores
+from src.services.drug_catalog import DrugCatalog, looks_like_ndc
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.deadline import Deadline
+from src.services.response_cache import TieredCache
+from src.services.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# HTTP/2 support in httpx needs the optional h2 package
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class UpstreamLookupError(Exception):
+    """Raised when an external lookup fails; carries any partial results"""
+    
+    def __init__(self, message: str, partial_results: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.partial_results = partial_results or []
+
 class PillDataService:
     """
     Fetches real pill/medication data from FDA and other medical APIs
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[TieredCache] = None,
+        catalog: Optional[DrugCatalog] = None
+    ):
         self.fda_api_base = "https://api.fda.gov/drug"
         self.rxnorm_api_base = "https://rxnav.nlm.nih.gov/REST"
-        self.timeout = 10.0
+        self.timeout = settings.upstream_timeout_seconds
+        
+        # One pooled client per process; created in startup() (or on first use)
+        self._client = client
+        self._owns_client = client is None
+        self._client_http2 = False
+        self._request_stats = {"requests": 0, "responses": 0, "errors": 0}
+        
+        # Fail fast on upstreams that are erroring or slow
+        self._breakers = {
+            upstream: CircuitBreaker(
+                upstream,
+                failure_rate=settings.circuit_failure_rate,
+                slow_call_seconds=settings.circuit_slow_call_seconds,
+                window_size=settings.circuit_window_size,
+                min_calls=settings.circuit_min_calls,
+                open_seconds=settings.circuit_open_seconds
+            )
+            for upstream in ("rxnorm", "fda")
+        }
+        
+        # Bounds concurrent RxNorm detail lookups per process
+        self._rxnorm_semaphore = asyncio.Semaphore(settings.rxnorm_detail_concurrency)
+        
+        # Shares one upstream call between concurrent identical lookups
+        self._single_flight = SingleFlight()
+        
+        # Memory + disk cache for lookup results
+        if cache is None and settings.drug_cache_enabled:
+            cache = TieredCache(
+                db_path=settings.drug_cache_path,
+                max_entries=settings.drug_cache_memory_entries,
+                ttl=settings.drug_cache_ttl_seconds,
+                negative_ttl=settings.drug_cache_negative_ttl_seconds,
+                stale_ttl=settings.drug_cache_stale_seconds
+            )
+        self.cache = cache
+        
+        # Offline catalog searched before any external API
+        if catalog is None and settings.drug_catalog_enabled:
+            catalog = DrugCatalog(settings.drug_catalog_path)
+            if not catalog.exists:
+                logger.info(f"No offline drug catalog at {settings.drug_catalog_path}; using external APIs only")
+                catalog = None
+        self.catalog = catalog
+        self.remote_fallback = settings.remote_lookup_fallback
+    
+    async def startup(self):
+        """Open the shared HTTP client (called from the application lifespan)"""
+        if self._client is None:
+            self._client = self._create_client()
+            logger.info(f"Opened pooled HTTP client (http2={self._client_http2})")
+    
+    async def shutdown(self):
+        """Close the shared HTTP client and release pooled connections"""
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            logger.info("Closed pooled HTTP client")
+        if self._owns_client:
+            self._client = None
+        if self.cache is not None:
+            self.cache.close()
+        if self.catalog is not None:
+            self.catalog.close()
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the long-lived pooled client"""
+        self._client_http2 = settings.http2_enabled and HTTP2_AVAILABLE
+        if settings.http2_enabled and not HTTP2_AVAILABLE:
+            logger.warning("h2 package not installed - external API client will use HTTP/1.1")
+        
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            http2=self._client_http2,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry
+            ),
+            event_hooks={
+                "request": [self._on_request],
+                "response": [self._on_response]
+            }
+        )
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it if the lifespan has not run"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+    
+    async def _on_request(self, request: httpx.Request):
+        self._request_stats["requests"] += 1
+    
+    async def _on_response(self, response: httpx.Response):
+        self._request_stats["responses"] += 1
+        if response.status_code >= 400:
+            self._request_stats["errors"] += 1
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Report connection pool and request metrics for the shared client
+        
+        Returns:
+            Dictionary with pool limits, current connection counts and request counters
+        """
+        stats = {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self._client_http2,
+            "limits": {
+                "max_connections": settings.http_max_connections,
+                "max_keepalive_connections": settings.http_max_keepalive_connections,
+                "keepalive_expiry": settings.http_keepalive_expiry
+            },
+            **self._request_stats
+        }
+        
+        # httpcore does not expose pool state publicly; read it defensively
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        stats["connections"] = {
+            "total": len(connections),
+            "idle": sum(1 for conn in connections if conn.is_idle()),
+            "http2": sum(1 for conn in connections if "HTTP/2" in conn.info())
+        }
+        return stats
         
-    async def search_by_name(self, medication_name: str) -> List[Dict[str, Any]]:
+    async def search_by_name(
+        self,
+        medication_name: str,
+        deadline: Optional[Deadline] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Search for medications by name using FDA and RxNorm APIs
+        Search for medications by name, local catalog first, then FDA and RxNorm APIs
         
         Args:
             medication_name: Name of the medication to search for
+            deadline: Optional request budget; external lookups that overrun it return nothing
             
         Returns:
             List of matching medication records with standardized format
         """
-        results = []
+        # A weak local match (a typo or a different drug) must not hide the remote results
+        local_results = self._search_catalog(medication_name)
+        if self._is_confident(local_results) or not self.remote_fallback:
+            return local_results
         
-        # Try RxNorm first (free, no API key needed, comprehensive)
+        if deadline is not None:
+            remote_results = await deadline.run(
+                self._remote_search_by_name(medication_name),
+                default=[],
+                label=f"Name search for '{medication_name}'"
+            )
+        else:
+            remote_results = await self._remote_search_by_name(medication_name)
+        return remote_results or local_results
+    
+    async def _remote_search_by_name(self, medication_name: str) -> List[Dict[str, Any]]:
+        """Search the external APIs through the lookup cache"""
         try:
-            rxnorm_results = await self._search_rxnorm(medication_name)
+            return await self._lookup(
+                "name",
+                self._cache_key(medication_name),
+                lambda: self._fetch_by_name(medication_name)
+            )
+        except UpstreamLookupError as e:
+            # Incomplete results are returned but never cached
+            return e.partial_results
+    
+    async def _fetch_by_name(self, medication_name: str) -> List[Dict[str, Any]]:
+        """
+        Query the external APIs for a medication name
+        
+        Raises:
+            UpstreamLookupError: If any upstream failed (carries the partial results)
+        """
+        results = []
+        failed = False
+        
+        # Query RxNorm (free, comprehensive) and FDA OpenFDA concurrently;
+        # RxNorm results stay first so ranking ties keep the previous order
+        rxnorm_results, fda_results = await asyncio.gather(
+            self._search_rxnorm(medication_name),
+            self._search_fda(medication_name),
+            return_exceptions=True
+        )
+        
+        if isinstance(rxnorm_results, UpstreamLookupError):
+            logger.warning(f"RxNorm search incomplete: {rxnorm_results}")
+            results.extend(rxnorm_results.partial_results)
+            failed = True
+        elif isinstance(rxnorm_results, Exception):
+            logger.warning(f"RxNorm search failed: {rxnorm_results}")
+            failed = True
+        else:
             results.extend(rxnorm_results)
-        except Exception as e:
-            logger.warning(f"RxNorm search failed: {e}")
         
-        # Try FDA OpenFDA API
-        try:
-            fda_results = await self._search_fda(medication_name)
+        if isinstance(fda_results, Exception):
+            logger.warning(f"FDA search failed: {fda_results}")
+            failed = True
+        else:
             results.extend(fda_results)
-        except Exception as e:
-            logger.warning(f"FDA search failed: {e}")
         
         # Deduplicate and rank by relevance
-        results = self._deduplicate_and_rank(results, medication_name)
+        results = self._deduplicate_and_rank(results, medication_name)[:10]  # Top 10 results
         
-        return results[:10]  # Return top 10 results
+        if failed:
+            raise UpstreamLookupError("Name search incomplete", partial_results=results)
+        return results
     
-    async def search_by_imprint(self, imprint: str) -> List[Dict[str, Any]]:
+    async def search_by_imprint(
+        self,
+        imprint: str,
+        deadline: Optional[Deadline] = None
+    ) -> List[Dict[str, Any]]:
         """
         Search for pills by imprint code
         
         Args:
             imprint: Text/code on the pill
+            deadline: Optional request budget; external lookups that overrun it return nothing
             
         Returns:
             List of matching pills
         """
+        # Imprints are codes, not misspelled names: no typo-tolerant catalog
+        # matching, and only a confident local hit skips the remote search
+        local_results = self._search_catalog(imprint, typo_tolerant=False)
+        if self._is_confident(local_results) or not self.remote_fallback:
+            return local_results
+        
+        if deadline is not None:
+            remote_results = await deadline.run(
+                self._remote_search_by_imprint(imprint),
+                default=[],
+                label=f"Imprint search for '{imprint}'"
+            )
+        else:
+            remote_results = await self._remote_search_by_imprint(imprint)
+        return remote_results or local_results
+    
+    async def _remote_search_by_imprint(self, imprint: str) -> List[Dict[str, Any]]:
+        """Search FDA for an imprint through the lookup cache"""
         try:
-            # Use FDA's drug label API
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Clean imprint text
-                clean_imprint = imprint.strip().upper()
-                
-                # Search FDA NDC directory
-                url = f"{self.fda_api_base}/ndc.json"
-                params = {
-                    "search": f'openfda.brand_name:"{clean_imprint}" OR openfda.generic_name:"{clean_imprint}"',
-                    "limit": 10
-                }
-                
-                response = await client.get(url, params=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    return self._format_fda_ndc_results(data)
-                    
+            return await self._lookup(
+                "imprint",
+                self._cache_key(imprint),
+                lambda: self._fetch_by_imprint(imprint)
+            )
         except Exception as e:
             logger.error(f"Imprint search error: {e}")
         
         return []
     
+    async def _fetch_by_imprint(self, imprint: str) -> List[Dict[str, Any]]:
+        """Query FDA's NDC directory for an imprint (raises on upstream errors)"""
+        # Clean imprint text
+        clean_imprint = imprint.strip().upper()
+        
+        # Search FDA NDC directory
+        url = f"{self.fda_api_base}/ndc.json"
+        params = {
+            "search": f'openfda.brand_name:"{clean_imprint}" OR openfda.generic_name:"{clean_imprint}"',
+            "limit": 10
+        }
+        
+        response = await self._get("fda", url, params=params)
+        if response.status_code == 200:
+            data = response.json()
+            return self._format_fda_ndc_results(data)
+        
+        return []
+    
+    @staticmethod
+    def _is_confident(results: List[Dict[str, Any]]) -> bool:
+        """Whether the top result is an exact or high-scoring match"""
+        return bool(results) and results[0].get("relevance", 0.0) >= settings.local_match_confidence
+    
+    def _search_catalog(self, query: str, typo_tolerant: bool = True) -> List[Dict[str, Any]]:
+        """Search the offline catalog by NDC or name (empty if no catalog)"""
+        if self.catalog is None or not query.strip():
+            return []
+        
+        try:
+            if looks_like_ndc(query):
+                results = self.catalog.search_by_ndc(query)
+                if results:
+                    return results
+            return self.catalog.search_by_name(query, typo_tolerant=typo_tolerant)
+        except Exception as e:
+            logger.error(f"Offline catalog search error: {e}")
+            return []
+    
     async def _search_rxnorm(self, name: str) -> List[Dict[str, Any]]:
-        """Search RxNorm API"""
+        """
+        Search RxNorm API
+        
+        Raises:
+            UpstreamLookupError: If some candidate details could not be fetched
+        """
         results = []
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Approximate match search
-                url = f"{self.rxnorm_api_base}/approximateTerm.json"
-                params = {"term": name, "maxEntries": 10}
+        # Approximate match search
+        url = f"{self.rxnorm_api_base}/approximateTerm.json"
+        params = {"term": name, "maxEntries": 10}
+        
+        response = await self._get("rxnorm", url, params=params)
+        if response.status_code == 200:
+            data = response.json()
+            
+            if "approximateGroup" in data and "candidate" in data["approximateGroup"]:
+                # Candidates often repeat an rxcui; fetch each one once,
+                # preserving candidate order
+                rxcuis = list(dict.fromkeys(
+                    candidate.get("rxcui")
+                    for candidate in data["approximateGroup"]["candidate"]
+                    if candidate.get("rxcui")
+                ))
                 
-                response = await client.get(url, params=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if "approximateGroup" in data and "candidate" in data["approximateGroup"]:
-                        for candidate in data["approximateGroup"]["candidate"]:
-                            # Get detailed info for each candidate
-                            rxcui = candidate.get("rxcui")
-                            if rxcui:
-                                details = await self._get_rxnorm_details(rxcui)
-                                if details:
-                                    results.append(details)
-                                    
-        except Exception as e:
-            logger.error(f"RxNorm search error: {e}")
+                # Get detailed info for all candidates concurrently
+                details_list = await asyncio.gather(
+                    *(self._get_rxnorm_details_limited(rxcui) for rxcui in rxcuis),
+                    return_exceptions=True
+                )
+                results.extend(
+                    details for details in details_list
+                    if details and not isinstance(details, Exception)
+                )
+                
+                if any(isinstance(details, Exception) for details in details_list):
+                    raise UpstreamLookupError("RxNorm details incomplete", partial_results=results)
         
         return results
     
+    async def _get_rxnorm_details_limited(self, rxcui: str) -> Optional[Dict[str, Any]]:
+        """Fetch RxNorm details while holding a slot of the fan-out semaphore"""
+        async with self._rxnorm_semaphore:
+            return await self._lookup("rxcui", rxcui, lambda: self._get_rxnorm_details(rxcui))
+    
     async def _get_rxnorm_details(self, rxcui: str) -> Optional[Dict[str, Any]]:
-        """Get detailed information for an RxNorm concept"""
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                url = f"{self.rxnorm_api_base}/rxcui/{rxcui}/properties.json"
-                response = await client.get(url)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    props = data.get("properties", {})
-                    
-                    return {
-                        "name": props.get("name", "Unknown"),
-                        "dosage": self._extract_dosage(props.get("name", "")),
-                        "generic_name": props.get("name", ""),
-                        "rxcui": rxcui,
-                        "source": "RxNorm",
-                        "shape": "unknown",
-                        "color": "unknown",
-                        "manufacturer": "Various",
-                        "description": f"RxNorm ID: {rxcui}"
-                    }
-        except Exception as e:
-            logger.error(f"RxNorm details error: {e}")
+        """Get detailed information for an RxNorm concept (raises on upstream errors)"""
+        url = f"{self.rxnorm_api_base}/rxcui/{rxcui}/properties.json"
+        response = await self._get("rxnorm", url)
+        
+        if response.status_code == 200:
+            data = response.json()
+            props = data.get("properties", {})
+            
+            return {
+                "name": props.get("name", "Unknown"),
+                "dosage": self._extract_dosage(props.get("name", "")),
+                "generic_name": props.get("name", ""),
+                "rxcui": rxcui,
+                "source": "RxNorm",
+                "shape": "unknown",
+                "color": "unknown",
+                "manufacturer": "Various",
+                "description": f"RxNorm ID: {rxcui}"
+            }
         
         return None
     
     async def _search_fda(self, name: str) -> List[Dict[str, Any]]:
-        """Search FDA OpenFDA API"""
+        """Search FDA OpenFDA API (raises on upstream errors)"""
         results = []
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Try NDC directory first
-                url = f"{self.fda_api_base}/ndc.json"
-                params = {
-                    "search": f'(brand_name:"{name}" OR generic_name:"{name}")',
-                    "limit": 10
-                }
-                
-                response = await client.get(url, params=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    results.extend(self._format_fda_ndc_results(data))
-                    
-        except Exception as e:
-            logger.error(f"FDA search error: {e}")
+        # Try NDC directory first
+        url = f"{self.fda_api_base}/ndc.json"
+        params = {
+            "search": f'(brand_name:"{name}" OR generic_name:"{name}")',
+            "limit": 10
+        }
+        
+        response = await self._get("fda", url, params=params)
+        if response.status_code == 200:
+            data = response.json()
+            results.extend(self._format_fda_ndc_results(data))
         
         return results
     
+    async def _get(self, upstream: str, url: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """
+        GET from an upstream through its circuit breaker
+        
+        Raises:
+            CircuitOpenError: If the upstream's circuit is open
+            httpx.HTTPError: On transport errors, throttling or server errors
+        """
+        async def request():
+            response = await self._get_client().get(url, params=params)
+            self._raise_for_upstream_error(response)
+            return response
+        
+        return await self._breakers[upstream].call(request)
+    
+    def circuit_stats(self) -> Dict[str, Any]:
+        """Circuit state and rolling error/latency stats per upstream"""
+        return {upstream: breaker.stats() for upstream, breaker in self._breakers.items()}
+    
+    def _raise_for_upstream_error(self, response: httpx.Response):
+        """
+        Raise for responses that mean the upstream failed rather than found nothing
+        
+        openFDA answers 404 when nothing matches, so only throttling and
+        server errors count as failures.
+        """
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+    
+    async def _lookup(self, namespace: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Serve a lookup from cache, coalescing concurrent upstream fetches
+        
+        Identical in-flight fetches (misses and background refreshes alike)
+        share one upstream call per (namespace, key). The shared call stores
+        its own result, so it still fills the cache when every caller gave
+        up waiting on it (e.g. after a request deadline).
+        """
+        async def fetch_and_store():
+            value = await fetch()
+            if self.cache is not None:
+                self.cache.set(namespace, key, value)
+            return value
+        
+        def coalesced_fetch():
+            return self._single_flight.do((namespace, key), fetch_and_store)
+        
+        if self.cache is None:
+            return await coalesced_fetch()
+        return await self.cache.get_or_fetch(namespace, key, coalesced_fetch)
+    
+    def _cache_key(self, query: str) -> str:
+        """Normalize a query for cache lookups"""
+        return " ".join(query.lower().split())
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the lookup cache and request coalescing"""
+        if self.cache is None:
+            return {"enabled": False, "single_flight": self._single_flight.stats()}
+        return {"enabled": True, **self.cache.stats(), "single_flight": self._single_flight.stats()}
+    
     def _format_fda_ndc_results(self, data: Dict) -> List[Dict[str, Any]]:
         """Format FDA NDC API results to our schema"""
         results = []
@@ -183,12 +508,7 @@ class PillDataService:
     
     def _extract_dosage(self, name: str) -> str:
         """Extract dosage from medication name"""
-        import re
-        # Look for patterns like "10mg", "5 mg", "100MG"
-        match = re.search(r'(\d+\.?\d*)\s*(mg|mcg|g|ml|%)', name, re.IGNORECASE)
-        if match:
-            return match.group(0)
-        return ""
+        return extract_dosage(name)
     
     def _deduplicate_and_rank(self, results: List[Dict], query: str) -> List[Dict]:
         """Remove duplicates and rank by relevance to query"""
@@ -205,27 +525,13 @@ class PillDataService:
             
             if key not in seen:
                 seen.add(key)
-                # Add relevance score
-                result["relevance"] = self._calculate_relevance(result, query)
                 unique_results.append(result)
         
+        # Score all candidates against the query in one vectorized pass
+        for result, relevance in zip(unique_results, relevance_scores(query, unique_results)):
+            result["relevance"] = float(relevance)
+        
         # Sort by relevance
         unique_results.sort(key=lambda x: x.get("relevance", 0), reverse=True)
         
         return unique_results
-    
-    def _calculate_relevance(self, result: Dict, query: str) -> float:
-        """Calculate relevance score for ranking"""
-        query_lower = query.lower()
-        name = result.get("name", "").lower()
-        generic = result.get("generic_name", "").lower()
-        
-        # Exact match gets highest score
-        if query_lower == name or query_lower == generic:
-            return 1.0
-        
-        # Use sequence matching for partial matches
-        name_ratio = SequenceMatcher(None, query_lower, name).ratio()
-        generic_ratio = SequenceMatcher(None, query_lower, generic).ratio()
-        
-        return max(name_ratio, generic_ratio)
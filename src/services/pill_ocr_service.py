@@ -4,10 +4,12 @@ OCR service for extracting text from pill images
 import logging
 from PIL import Image
 import numpy as np
-import cv2
-from typing import Optional, List, Tuple
+from functools import cached_property
+from typing import Optional, List, Tuple, Union
 import os
 
+from src.vision.image_context import ImageContext
+
 logger = logging.getLogger(__name__)
 
 # Import and configure pytesseract
@@ -27,8 +29,10 @@ class PillOCRService:
     Extract text (imprint) from pill images using OCR
     """
     
-    def __init__(self):
-        self.tesseract_available = self._check_tesseract()
+    @cached_property
+    def tesseract_available(self) -> bool:
+        """Whether Tesseract OCR is available (checked on first OCR call, not at startup)"""
+        return self._check_tesseract()
         
     def _check_tesseract(self) -> bool:
         """Check if Tesseract OCR is available"""
@@ -42,12 +46,12 @@ class PillOCRService:
             logger.warning(f"Tesseract not available: {e}. OCR functionality will be limited.")
             return False
     
-    def extract_text(self, image: Image.Image) -> str:
+    def extract_text(self, image: Union[Image.Image, ImageContext]) -> str:
         """
         Extract text from pill image or packaging
         
         Args:
-            image: PIL Image object
+            image: PIL Image object or ImageContext for an already decoded upload
             
         Returns:
             Extracted text string (empty if no text found)
@@ -106,25 +110,32 @@ class PillOCRService:
             logger.error(f"OCR extraction error: {e}")
             return ""
     
-    def _preprocess_for_ocr(self, image: Image.Image) -> Image.Image:
+    def _preprocess_for_ocr(self, image: Union[Image.Image, ImageContext]) -> Image.Image:
         """
         Preprocess image to improve OCR accuracy
         
         Args:
-            image: Input PIL Image
+            image: Input PIL Image or ImageContext
             
         Returns:
             Preprocessed PIL Image
         """
         try:
-            # Convert PIL to numpy array
-            img_array = np.array(image)
+            # OpenCV is imported on first use to keep application startup light
+            import cv2
             
-            # Convert to grayscale if needed
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+            if isinstance(image, ImageContext):
+                # Reuse the context's memoized grayscale view
+                gray = image.gray
             else:
-                gray = img_array
+                # Convert PIL to numpy array
+                img_array = np.array(image)
+                
+                # Convert to grayscale if needed
+                if len(img_array.shape) == 3:
+                    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+                else:
+                    gray = img_array
             
             # Increase contrast
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
@@ -153,7 +164,7 @@ class PillOCRService:
             
         except Exception as e:
             logger.error(f"Image preprocessing error: {e}")
-            return image
+            return image.image if isinstance(image, ImageContext) else image
     
     def _clean_text(self, text: str) -> str:
         """
@@ -241,6 +252,8 @@ class PillOCRService:
             Cropped PIL Image containing the pill, or None if detection fails
         """
         try:
+            import cv2
+            
             # Convert to numpy array
             img_array = np.array(image)
             
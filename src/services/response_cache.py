@@ -0,0 +1,258 @@
+"""
+Two-tier (memory + SQLite) cache for external drug database lookups
+"""
+import asyncio
+import copy
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """A cached value with the time it was stored and how long it stays fresh"""
+
+    __slots__ = ("value", "stored_at", "ttl")
+
+    def __init__(self, value: Any, stored_at: float, ttl: float):
+        self.value = value
+        self.stored_at = stored_at
+        self.ttl = ttl
+
+    def age(self, now: float) -> float:
+        return now - self.stored_at
+
+    def is_fresh(self, now: float) -> bool:
+        return self.age(now) <= self.ttl
+
+
+class TieredCache:
+    """
+    In-process LRU with TTL backed by a persistent SQLite tier
+
+    Entries are fresh for their TTL, then servable as stale for a further
+    stale window while a background refresh runs (stale-while-revalidate).
+    Empty results are cached with a shorter negative TTL. Values must be
+    JSON-serializable. Values are copied on the way in and out, so callers
+    may modify what they get back (e.g. when ranking results).
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = "data/drug_lookup_cache.db",
+        max_entries: int = 2048,
+        ttl: float = 86400.0,
+        negative_ttl: float = 3600.0,
+        stale_ttl: float = 604800.0
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+
+        self._memory: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._refreshing: Set[Tuple[str, str]] = set()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0
+        }
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite tier on first use (None if disabled or unavailable)"""
+        if self._conn is None and self.db_path:
+            try:
+                Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS response_cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        stored_at REAL NOT NULL,
+                        ttl REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                    """
+                )
+                conn.commit()
+                self._conn = conn
+            except Exception as e:
+                logger.error(f"Disk cache unavailable, using memory only: {e}")
+                self.db_path = None
+        return self._conn
+
+    def _remember(self, cache_key: Tuple[str, str], entry: CacheEntry):
+        """Insert into the memory tier, evicting the least recently used entry"""
+        self._memory[cache_key] = entry
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _is_servable(self, entry: CacheEntry, now: float) -> bool:
+        return entry.age(now) <= entry.ttl + self.stale_ttl
+
+    def _lookup(self, namespace: str, key: str, now: float) -> Optional[CacheEntry]:
+        """Find a servable entry in memory, then on disk"""
+        cache_key = (namespace, key)
+
+        entry = self._memory.get(cache_key)
+        if entry is not None:
+            if self._is_servable(entry, now):
+                self._memory.move_to_end(cache_key)
+                self._stats["memory_hits"] += 1
+                return entry
+            del self._memory[cache_key]
+
+        conn = self._get_conn()
+        if conn is None:
+            return None
+
+        try:
+            row = conn.execute(
+                "SELECT value, stored_at, ttl FROM response_cache WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        except Exception as e:
+            logger.warning(f"Disk cache read failed: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        entry = CacheEntry(json.loads(row[0]), row[1], row[2])
+        if not self._is_servable(entry, now):
+            return None
+
+        self._stats["disk_hits"] += 1
+        self._remember(cache_key, entry)
+        return entry
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return a fresh cached value, or None"""
+        now = time.time()
+        entry = self._lookup(namespace, key, now)
+        if entry is not None and entry.is_fresh(now):
+            return copy.deepcopy(entry.value)
+        return None
+
+    def set(self, namespace: str, key: str, value: Any):
+        """Store a value in both tiers (empty values use the negative TTL)"""
+        ttl = self.ttl if value else self.negative_ttl
+        entry = CacheEntry(copy.deepcopy(value), time.time(), ttl)
+        self._remember((namespace, key), entry)
+
+        conn = self._get_conn()
+        if conn is None:
+            return
+
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (namespace, key, value, stored_at, ttl) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), entry.stored_at, entry.ttl)
+            )
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Disk cache write failed: {e}")
+
+    async def get_or_fetch(
+        self,
+        namespace: str,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return a cached value, fetching and storing it on a miss
+
+        Stale entries are returned immediately and refreshed in the
+        background. If fetch raises, a stale value is served when one
+        exists; otherwise the exception propagates and nothing is cached.
+
+        Args:
+            namespace: Lookup type (e.g. "name", "imprint", "rxcui")
+            key: Normalized lookup key
+            fetch: Coroutine factory producing the value on a miss
+
+        Returns:
+            Cached or freshly fetched value (the caller's own copy)
+        """
+        now = time.time()
+        entry = self._lookup(namespace, key, now)
+
+        if entry is not None:
+            if entry.is_fresh(now):
+                return copy.deepcopy(entry.value)
+
+            self._stats["stale_hits"] += 1
+            self._schedule_refresh(namespace, key, fetch)
+            return copy.deepcopy(entry.value)
+
+        self._stats["misses"] += 1
+        value = await fetch()
+
+        self._store_if_newer(namespace, key, value, now)
+        return value
+    
+    def _store_if_newer(self, namespace: str, key: str, value: Any, fetched_since: float):
+        """Store a fetched value unless the fetch (or a coalesced caller) already stored it"""
+        stored = self._memory.get((namespace, key))
+        if stored is None or stored.stored_at < fetched_since:
+            self.set(namespace, key, value)
+
+    def _schedule_refresh(self, namespace: str, key: str, fetch: Callable[[], Awaitable[Any]]):
+        """Refresh a stale entry in the background (at most once per key at a time)"""
+        cache_key = (namespace, key)
+        if cache_key in self._refreshing:
+            return
+
+        self._refreshing.add(cache_key)
+        task = asyncio.create_task(self._refresh(cache_key, fetch))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, cache_key: Tuple[str, str], fetch: Callable[[], Awaitable[Any]]):
+        try:
+            started = time.time()
+            value = await fetch()
+            self._store_if_newer(cache_key[0], cache_key[1], value, started)
+            self._stats["refreshes"] += 1
+        except Exception as e:
+            logger.warning(f"Background refresh failed for {cache_key}: {e}")
+        finally:
+            self._refreshing.discard(cache_key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        return {
+            **self._stats,
+            "memory_entries": len(self._memory),
+            "disk_enabled": self.db_path is not None
+        }
+
+    def clear(self):
+        """Drop all entries from both tiers"""
+        self._memory.clear()
+        conn = self._get_conn()
+        if conn is not None:
+            conn.execute("DELETE FROM response_cache")
+            conn.commit()
+
+    def close(self):
+        """Close the SQLite connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,98 @@
+"""
+Concurrent fan-out over local and external pill search sources
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.services.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# A source produces its results; a stop condition inspects (source, result)
+Source = Callable[[], Awaitable[Any]]
+StopCondition = Callable[[str, Any], bool]
+
+
+class SearchOrchestrator:
+    """
+    Runs search sources concurrently and collects results as they arrive
+
+    Every source starts at once. Collection ends when all sources have
+    finished, when the stop condition reports a conclusive result (e.g. a
+    high-confidence local match), or when the deadline runs out; sources
+    still running are then cancelled. A source that raises contributes its
+    default instead of failing the whole search.
+    """
+
+    def __init__(self):
+        self._stats = {"searches": 0, "early_stops": 0, "deadline_stops": 0, "source_errors": 0}
+
+    async def run(
+        self,
+        sources: Dict[str, Source],
+        stop_when: Optional[StopCondition] = None,
+        deadline: Optional[Deadline] = None,
+        default: Any = None
+    ) -> Dict[str, Any]:
+        """
+        Run sources concurrently
+
+        Args:
+            sources: Source name -> coroutine factory
+            stop_when: Called with (name, result) as each source finishes;
+                returning True stops the search early
+            deadline: Optional budget for the whole fan-out
+            default: Result recorded for sources that raised
+
+        Returns:
+            Source name -> result, in completion order, for sources that finished
+        """
+        self._stats["searches"] += 1
+        start = time.monotonic()
+        tasks = {asyncio.ensure_future(factory()): name for name, factory in sources.items()}
+        pending = set(tasks)
+        results: Dict[str, Any] = {}
+
+        try:
+            while pending:
+                timeout = deadline.remaining() if deadline is not None else None
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self._stats["deadline_stops"] += 1
+                    logger.info(f"Search deadline reached; skipping {sorted(tasks[t] for t in pending)}")
+                    break
+
+                conclusive = None
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        results[name] = task.result()
+                    except Exception as e:
+                        self._stats["source_errors"] += 1
+                        logger.warning(f"Search source '{name}' failed: {e}")
+                        results[name] = default
+                        continue
+
+                    if stop_when is not None and stop_when(name, results[name]):
+                        conclusive = name
+
+                if conclusive is not None and pending:
+                    self._stats["early_stops"] += 1
+                    logger.info(
+                        f"Conclusive result from '{conclusive}' after "
+                        f"{(time.monotonic() - start) * 1000:.0f} ms; "
+                        f"cancelling {sorted(tasks[t] for t in pending)}"
+                    )
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
@@ -0,0 +1,61 @@
+"""
+Request coalescing (single-flight) for concurrent identical async calls
+"""
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Runs at most one in-flight call per key; concurrent callers with the
+    same key await the shared result instead of starting their own call
+
+    Each caller receives its own deep copy of the result, so one caller
+    modifying it (e.g. annotating search results) never affects another.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn for key, or join the call already in flight for it
+
+        The shared call runs as its own task, so a caller being cancelled
+        does not cancel the work other callers are waiting on.
+
+        Args:
+            key: Identity of the call (e.g. a normalized query)
+            fn: Coroutine factory to run if no call is in flight
+
+        Returns:
+            Copy of the shared call's result (exceptions propagate to every caller)
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["calls"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._stats["coalesced"] += 1
+
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Mark the exception retrieved: every caller may have stopped waiting
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "in_flight": self.in_flight()}
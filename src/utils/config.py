@@ -15,14 +15,80 @@ class Settings(BaseSettings):
     api_title: str = "MedAdhere API"
     api_version: str = "1.0.0"
     api_description: str = "AI-Powered Medication Adherence System"
+    orjson_responses_enabled: bool = False  # Render JSON responses with orjson (when installed)
     
     # Machine Learning Models
-    pill_model_path: str = "data/models/pill_identifier.h5"
-    ingestion_model_path: str = "data/models/ingestion_detector.h5"
+    pill_model_path: str = "data/models/pill_identifier.onnx"
+    ingestion_model_path: str = "data/models/ingestion_detector.onnx"
+    model_intra_op_threads: int = 0  # 0 = one thread per physical core
+    model_inter_op_threads: int = 1
+    model_warmup_runs: int = 1  # Dummy inferences at startup
+    warmup_models_on_startup: bool = True  # Load and warm models in the background after startup
     
     # Image Processing
     max_image_size: int = 10 * 1024 * 1024  # 10MB
+    upload_chunk_size: int = 64 * 1024  # Bytes per read when streaming uploads
     allowed_image_types: list = ["image/jpeg", "image/png", "image/jpg"]
+    upload_decode_max_side: int = 1024  # Longest side kept when decoding uploads
+    max_decoded_pixels: int = 50_000_000  # Largest image (width x height) decoded; ~50MP covers phone cameras
+    
+    # External API HTTP client
+    http2_enabled: bool = True
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry: float = 30.0  # seconds
+    rxnorm_detail_concurrency: int = 5  # Parallel RxNorm detail lookups
+    upstream_timeout_seconds: float = 10.0
+    
+    # Upstream circuit breakers and request deadlines
+    circuit_failure_rate: float = 0.5  # Failure rate over the window that opens the circuit
+    circuit_slow_call_seconds: float = 2.0  # Slower calls count as failures
+    circuit_window_size: int = 20
+    circuit_min_calls: int = 5
+    circuit_open_seconds: float = 30.0
+    identify_deadline_seconds: float = 0.8  # Budget for external lookups in /pills/identify (starts after OCR)
+    local_match_confidence: float = 0.9  # Local results this confident end a search early
+    
+    # External lookup cache
+    drug_cache_enabled: bool = True
+    drug_cache_path: str = "data/drug_lookup_cache.db"
+    drug_cache_memory_entries: int = 2048
+    drug_cache_ttl_seconds: float = 86400.0  # 1 day
+    drug_cache_negative_ttl_seconds: float = 3600.0  # Empty results
+    drug_cache_stale_seconds: float = 604800.0  # Served stale while refreshing
+    
+    # Offline drug catalog (built with python -m src.services.drug_catalog)
+    drug_catalog_enabled: bool = True
+    drug_catalog_path: str = "data/drug_catalog.db"
+    remote_lookup_fallback: bool = True  # Query external APIs when the catalog has no match
+    
+    # Fuzzy name ranking (see src/utils/fuzzy.py for scorer names)
+    fuzzy_scorer: str = "ratio"
+    fuzzy_score_cutoff: float = 0.8  # Minimum relevance for typo-tolerant name matches (0.6 admits other drugs, e.g. norvasc/norvir)
+    
+    # Batched ingestion inference for concurrent /confirm-ingestion calls
+    ingestion_batching_enabled: bool = True
+    ingestion_batch_max_size: int = 16
+    ingestion_batch_max_wait_ms: float = 5.0
+    ingestion_batch_max_in_flight: int = 2  # Batches processing at once (the next is collected meanwhile)
+    
+    # Streaming ingestion detection (WebSocket)
+    ingestion_stream_window: int = 16  # Frames whose cues are combined per session
+    ingestion_stream_max_frames: int = 600  # Frames accepted per session
+    ingestion_motion_threshold: float = 0.02  # Mean frame difference counted as hand motion
+    
+    # Caregiver alerts (delivered by src/services/alert_dispatcher.py)
+    alert_channels: list = ["log"]  # Registered delivery channel names
+    alert_batch_window_ms: float = 500.0  # Alerts queued within the window go out together
+    alert_dedup_window_seconds: float = 300.0  # Repeats of (patient, caregiver, type, severity) are collapsed
+    alert_max_retries: int = 3  # Further delivery attempts before an alert is logged as failed
+    alert_retry_backoff_seconds: float = 5.0  # Delay before the first retry; doubles with each attempt
+    alert_log_path: str = "data/caregiver_alerts.jsonl"  # Append-only alert log
+    caregiver_cache_ttl_seconds: float = 60.0  # Per-patient caregiver contacts kept in memory
+    caregiver_db_path: str = "data/caregiver_contacts.db"  # SQLite file for caregiver contacts (not the tracked medadhere.db)
+    
+    # JSON data files (schedules, medications, dose logs, pill database)
+    persistence_commit_window_ms: float = 5.0  # Writers wait this long to share one fsync; 0 = commit every write alone
     
     # Security
     secret_key: str = "your-secret-key-change-in-production"
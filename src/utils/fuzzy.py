@@ -0,0 +1,106 @@
+"""
+Vectorized fuzzy ranking of medication records with RapidFuzz
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+
+from src.utils.config import settings
+
+# Scorers selectable by name in settings; all return similarity in [0, 100]
+SCORERS: Dict[str, Callable[..., float]] = {
+    "ratio": fuzz.ratio,
+    "partial_ratio": fuzz.partial_ratio,
+    "token_sort_ratio": fuzz.token_sort_ratio,
+    "token_set_ratio": fuzz.token_set_ratio,
+    "wratio": fuzz.WRatio,
+    "qratio": fuzz.QRatio,
+}
+
+DEFAULT_FIELDS = ("name", "generic_name")
+
+
+def get_scorer(name: Optional[str] = None) -> Callable[..., float]:
+    """
+    Look up a RapidFuzz scorer by name
+
+    Args:
+        name: Scorer name (defaults to settings.fuzzy_scorer)
+
+    Returns:
+        Scorer function
+    """
+    name = (name or settings.fuzzy_scorer).lower()
+    if name not in SCORERS:
+        raise ValueError(f"Unknown fuzzy scorer '{name}'. Choose from: {', '.join(SCORERS)}")
+    return SCORERS[name]
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, turn punctuation into spaces and trim (the scorers' preprocessing)"""
+    return utils.default_process(text or "")
+
+
+def relevance_scores(
+    query: str,
+    records: Sequence[Dict[str, Any]],
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    scorer: Optional[str] = None
+) -> np.ndarray:
+    """
+    Score every record against the query in one vectorized pass
+
+    Each record is scored on every field and keeps its best field score.
+
+    Args:
+        query: Search text
+        records: Medication records (dicts)
+        fields: Record fields compared against the query
+        scorer: Scorer name (defaults to settings.fuzzy_scorer)
+
+    Returns:
+        float32 array of relevance in [0, 1], one per record
+    """
+    if not records:
+        return np.zeros(0, dtype=np.float32)
+
+    # One flat choice list (field-major) so cdist runs once per query
+    choices = [str(record.get(field) or "") for field in fields for record in records]
+    scores = process.cdist(
+        [query],
+        choices,
+        scorer=get_scorer(scorer),
+        processor=utils.default_process,
+        dtype=np.float32
+    )
+    return scores.reshape(len(fields), len(records)).max(axis=0) / np.float32(100.0)
+
+
+def rank(
+    query: str,
+    records: Sequence[Dict[str, Any]],
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    scorer: Optional[str] = None,
+    score_cutoff: float = 0.0,
+    limit: Optional[int] = None
+) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Rank records by relevance to the query (stable for equal scores)
+
+    Args:
+        query: Search text
+        records: Medication records (dicts)
+        fields: Record fields compared against the query
+        scorer: Scorer name (defaults to settings.fuzzy_scorer)
+        score_cutoff: Minimum relevance in [0, 1] to keep a record
+        limit: Maximum number of results
+
+    Returns:
+        (record, relevance) pairs, best first
+    """
+    scores = relevance_scores(query, records, fields=fields, scorer=scorer)
+    order = np.argsort(-scores, kind="stable")
+    ranked = [(records[i], float(scores[i])) for i in order if scores[i] >= score_cutoff]
+    return ranked[:limit] if limit is not None else ranked
+
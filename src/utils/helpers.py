@@ -76,6 +76,13 @@ def get_next_scheduled_time(times: List[str], current_time: datetime) -> Optiona
     
     return next_time
 
+def extract_dosage(name: str) -> str:
+    """Extract dosage (e.g. "10mg", "5 mg", "100MG") from a medication name"""
+    match = re.search(r'(\d+\.?\d*)\s*(mg|mcg|g|ml|%)', name, re.IGNORECASE)
+    if match:
+        return match.group(0)
+    return ""
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe storage"""
     # Remove invalid characters
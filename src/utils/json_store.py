@@ -0,0 +1,289 @@
+"""
+JSON file stores shared safely between worker processes
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+from src.utils.config import settings
+from src.utils.persistence import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# fcntl is POSIX-only; without it stores are only safe within one process
+try:
+    import fcntl
+    FILE_LOCKS_AVAILABLE = True
+except ImportError:
+    fcntl = None
+    FILE_LOCKS_AVAILABLE = False
+
+T = TypeVar("T")
+
+# Stores holding the write lock with a commit pending
+_pending_stores = weakref.WeakSet()
+
+
+def flush_all():
+    """Commit every store's pending changes now (on shutdown)"""
+    for store in list(_pending_stores):
+        try:
+            store.flush()
+        except Exception:
+            pass  # already logged and reported to the waiting writers
+
+
+atexit.register(flush_all)
+
+
+def freeze(value: Any) -> Any:
+    """Read-only copy of parsed JSON (dicts become mapping proxies, lists tuples)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class StoreWriteError(Exception):
+    """Raised to every writer whose changes were in a commit that failed"""
+
+
+class _Commit:
+    """One group commit: the writers whose changes it covers wait on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+    def wait(self, path: Path):
+        self.done.wait()
+        if self.error is not None:
+            raise StoreWriteError(f"Error writing {path}: {self.error}") from self.error
+
+
+class JsonStore:
+    """
+    A JSON document on disk that several processes (e.g. gunicorn workers) share
+
+    - Reads return a read-only view that is reloaded only when the file
+      changes on disk (detected from its stat signature), so each worker
+      sees the other workers' writes without re-parsing on every request.
+    - Writes go through update(), a read-modify-write under an exclusive
+      lock on a sidecar ".lock" file: the latest on-disk state is reloaded
+      and the mutation applied before the lock is released, so no worker
+      overwrites another's changes with a stale view.
+    - The file is replaced atomically (temp file + fsync + os.replace), so
+      readers never need the lock and a crash never leaves a truncated file.
+    - update() returns only once the change is on disk (group commit): the
+      first writer of a commit waits commit_window_ms, so writers arriving
+      meanwhile join it, then writes them all with one fsync; every writer
+      in the commit is woken then, or gets StoreWriteError if it failed.
+      Reads keep serving the last committed state until then.
+    - Mutators run on a copy that replaces the contents only if they
+      return normally, so a failed mutation never reaches a commit.
+    - Reads never wait for the file lock or a write: writers in this
+      process take it under their own lock, and hold the read mutex only
+      to swap in new contents.
+
+    update() blocks on the file lock and the fsync: call it from a worker
+    thread (asyncio.to_thread), not on the event loop.
+    """
+
+    def __init__(self, path: str, default: Callable[[], Any] = dict, commit_window_ms: Optional[float] = None):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.default = default
+        self.commit_window = (
+            settings.persistence_commit_window_ms if commit_window_ms is None else commit_window_ms
+        ) / 1000.0
+
+        self._data: Any = default()
+        self._view: Any = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._loaded = False
+        # Guards the contents and view (held briefly, never across I/O waits)
+        self._mutex = threading.RLock()
+        # Serializes this process's writers: taking the file lock, mutating, committing
+        self._writer_lock = threading.Lock()
+
+        # Group commit state: lock held, changes not yet written, their writers
+        self._lock_file = None
+        self._dirty = False
+        self._commit: Optional[_Commit] = None
+        self._stats = {"updates": 0, "flushes": 0, "failed_flushes": 0}
+
+    def _acquire(self):
+        """Take the cross-process write lock (writer lock held, read mutex not)"""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            if FILE_LOCKS_AVAILABLE:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            lock_file.close()
+            raise
+        with self._mutex:
+            self._lock_file = lock_file
+        _pending_stores.add(self)
+
+    def _release(self):
+        """Drop the cross-process write lock (writer lock held)"""
+        with self._mutex:
+            lock_file, self._lock_file = self._lock_file, None
+        if lock_file is None:
+            return
+        if FILE_LOCKS_AVAILABLE:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        lock_file.close()
+        _pending_stores.discard(self)
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _reload_if_changed(self):
+        """Re-read the file if another writer changed it since the last load"""
+        signature = self._stat_signature()
+        if self._loaded and signature == self._signature:
+            return
+
+        if signature is None:
+            self._data = self.default()
+        else:
+            try:
+                with open(self.path, "r") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading {self.path}: {e}")
+                self._data = self.default()
+        self._view = None
+        self._signature = signature
+        self._loaded = True
+
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def data(self) -> Any:
+        """Read-only view of the committed contents, reloaded first if the file changed on disk"""
+        with self._mutex:
+            # While this process holds the write lock nobody else can commit,
+            # and the view still holds the state before the pending changes
+            if self._lock_file is None:
+                self._reload_if_changed()
+            if self._view is None:
+                self._view = freeze(self._data)
+            return self._view
+
+    def update(self, mutator: Callable[[Any], T]) -> T:
+        """
+        Apply a mutation to the latest contents and wait until it is on disk
+
+        Args:
+            mutator: Called with a copy of the freshly loaded data; modifies
+                it in place (the copy is discarded if the mutator raises)
+
+        Returns:
+            Whatever the mutator returns
+
+        Raises:
+            StoreWriteError: If the commit carrying the change failed
+        """
+        def apply(data):
+            working = copy.deepcopy(data)
+            return working, mutator(working)
+        return self._write(apply)
+
+    def reset(self, value: Any = None):
+        """Replace the whole document (the default value when none is given)"""
+        self._write(lambda _: (self.default() if value is None else value, None))
+
+    def _write(self, change: Callable[[Any], Tuple[Any, T]]) -> T:
+        """Compute new contents from the latest ones, join the pending commit and wait for it"""
+        with self._writer_lock:
+            if self._lock_file is None:
+                # Waits for other processes' commits; reads are still served
+                self._acquire()
+                try:
+                    with self._mutex:
+                        self._reload_if_changed()
+                except BaseException:
+                    self._release()
+                    raise
+
+            # Readers keep the committed state until this commit lands; only
+            # writers (serialized here) touch _data while the lock is held
+            with self._mutex:
+                if self._view is None:
+                    self._view = freeze(self._data)
+            try:
+                data, result = change(self._data)
+            except BaseException:
+                if self._commit is None:
+                    self._release()
+                raise
+
+            with self._mutex:
+                self._data = data
+            self._dirty = True
+            self._stats["updates"] += 1
+            commit = self._commit
+            leader = commit is None
+            if leader:
+                commit = self._commit = _Commit()
+
+        if leader:
+            if self.commit_window > 0:
+                # Let concurrent writers join this commit
+                time.sleep(self.commit_window)
+            try:
+                self.flush()
+            except Exception:
+                pass  # raised below, as for every writer in the commit
+        commit.wait(self.path)
+        return result
+
+    def flush(self):
+        """Commit pending changes (one atomic, fsynced replace), release the lock and wake their writers"""
+        with self._writer_lock:
+            commit, self._commit = self._commit, None
+            error = None
+            try:
+                if self._dirty:
+                    # Readers are served the committed view meanwhile
+                    atomic_write_json(self.path, self._data)
+                    with self._mutex:
+                        self._signature = self._stat_signature()
+                        self._view = None
+                    self._stats["flushes"] += 1
+            except Exception as e:
+                logger.error(f"Error writing {self.path}: {e}")
+                self._stats["failed_flushes"] += 1
+                # Drop the unwritten changes rather than serving them as saved
+                with self._mutex:
+                    self._loaded = False
+                error = e
+            finally:
+                self._dirty = False
+                self._release()
+                if commit is not None:
+                    commit.error = error
+                    commit.done.set()
+        if error is not None:
+            raise error
+
+    def stats(self) -> dict:
+        return dict(self._stats)
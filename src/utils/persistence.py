@@ -0,0 +1,63 @@
+"""
+Crash-safe file writes
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Union
+
+
+def fsync_directory(directory: Union[str, Path]):
+    """Flush a directory entry (makes a rename durable); no-op where unsupported"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path: Union[str, Path], text: str, fsync: bool = True):
+    """
+    Replace a file's contents atomically
+
+    The text is written to a temporary file in the same directory, flushed
+    to disk, then renamed over the target with os.replace. Readers and a
+    crash at any point see either the old or the new contents, never a
+    truncated file.
+
+    Args:
+        path: Target file
+        text: New contents
+        fsync: Flush file and directory to stable storage before returning
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync:
+        fsync_directory(path.parent)
+
+
+def atomic_write_json(path: Union[str, Path], data: Any, fsync: bool = True):
+    """Serialize data as indented JSON and write it with atomic_write_text"""
+    atomic_write_text(path, json.dumps(data, indent=2), fsync=fsync)
@@ -0,0 +1,68 @@
+"""
+Linear-time merging and de-duplication of medication search results
+"""
+import re
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from src.utils.fuzzy import normalize
+
+# "325 mg/1" (FDA strength per unit) and "325mg" describe the same dosage
+_PER_UNIT_SUFFIX = re.compile(r"/\s*1\b")
+_DOSAGE_NOISE = re.compile(r"[^0-9a-z.%]")
+
+
+def normalize_dosage(dosage: Optional[str]) -> str:
+    """Canonical dosage text for comparisons (e.g. "325 MG/1" -> "325mg")"""
+    text = _PER_UNIT_SUFFIX.sub("", (dosage or "").lower())
+    return _DOSAGE_NOISE.sub("", text)
+
+
+def normalize_ndc(ndc: Optional[str]) -> str:
+    """NDC digits only, so dashed and undashed codes compare equal"""
+    return re.sub(r"\D", "", ndc or "")
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Identity of a result: normalized (name, dosage, ndc)"""
+    return (
+        normalize(result.get("name")),
+        normalize_dosage(result.get("dosage")),
+        normalize_ndc(result.get("ndc_number"))
+    )
+
+
+def merge_results(
+    *result_lists: Iterable[Dict[str, Any]],
+    score_key: str = "relevance",
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists, dropping duplicates in one pass
+
+    Lists are given in priority order. Each distinct (name, dosage, ndc)
+    keeps the position where it first appeared, so the incoming ranking
+    order is preserved; when a duplicate has a higher score, its record
+    replaces the earlier one in that position.
+
+    Args:
+        *result_lists: Ranked lists of result dicts, highest priority first
+        score_key: Field compared when choosing between duplicates
+        limit: Maximum number of merged results
+
+    Returns:
+        Merged results
+    """
+    merged: Dict[Hashable, Dict[str, Any]] = {}
+
+    for results in result_lists:
+        for result in results:
+            key = result_key(result)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = result
+            elif (result.get(score_key) or 0.0) > (existing.get(score_key) or 0.0):
+                # Dict assignment keeps the key's original position
+                merged[key] = result
+
+    merged_results = list(merged.values())
+    return merged_results[:limit] if limit is not None else merged_results
@@ -0,0 +1,114 @@
+"""
+Single-decode image context shared by identification, OCR and ingestion
+"""
+import numpy as np
+from PIL import Image
+from functools import cached_property
+from typing import Any, Dict, Optional, Tuple, Union
+import logging
+
+from .image_loader import decode_upload
+from .normalization import to_model_input
+
+logger = logging.getLogger(__name__)
+
+
+class ImageContext:
+    """
+    Decoded image with lazily memoized derived views
+
+    Each view is computed on first access and reused afterwards, so the
+    stages of a request (OCR, visual identification, feature extraction)
+    can share one decode and one conversion per representation.
+    """
+
+    def __init__(
+        self,
+        image: Image.Image,
+        target_size: Tuple[int, int] = (224, 224),
+        processor: Optional[Any] = None
+    ):
+        self.image = image
+        self.target_size = target_size
+        self._processor = processor
+
+    @classmethod
+    def from_bytes(cls, image_data: Union[bytes, memoryview], **kwargs) -> "ImageContext":
+        """
+        Decode uploaded bytes once and wrap them in a context
+
+        Args:
+            image_data: Raw image file contents (bytes or memoryview)
+            **kwargs: Passed through to the ImageContext constructor
+
+        Returns:
+            ImageContext for the decoded image
+
+        Raises:
+            ImageTooLargeError: If the upload exceeds the configured limits
+        """
+        return cls(decode_upload(image_data), **kwargs)
+
+    @property
+    def processor(self):
+        """Image processor used for edge analysis (created on first use)"""
+        if self._processor is None:
+            from .image_processor import ImageProcessor
+            self._processor = ImageProcessor()
+        return self._processor
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) of the decoded image"""
+        return self.image.size
+
+    @cached_property
+    def rgb_image(self) -> Image.Image:
+        """Decoded image in RGB mode"""
+        if self.image.mode == 'RGB':
+            return self.image
+        return self.image.convert('RGB')
+
+    @cached_property
+    def rgb(self) -> np.ndarray:
+        """RGB pixels as a (H, W, 3) uint8 array"""
+        return np.asarray(self.rgb_image)
+
+    @cached_property
+    def gray_image(self) -> Image.Image:
+        """Grayscale (L mode) version of the image"""
+        return self.rgb_image.convert('L')
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        """Grayscale pixels as a (H, W) uint8 array"""
+        return np.asarray(self.gray_image)
+
+    @cached_property
+    def resized_uint8(self) -> np.ndarray:
+        """RGB image resized to target_size as a uint8 array"""
+        resized_image = self.rgb_image.resize(self.target_size, Image.Resampling.LANCZOS)
+        return np.asarray(resized_image)
+
+    @cached_property
+    def resized(self) -> np.ndarray:
+        """RGB image resized to target_size as a normalized float32 array"""
+        return to_model_input(self.resized_uint8)
+
+    @cached_property
+    def edge_analysis(self) -> Dict[str, Any]:
+        """Edge image, bounding box and edge density of the grayscale view"""
+        return self.processor.analyze_edges(self.gray_image)
+
+    @property
+    def edges(self) -> Image.Image:
+        """Edge-filtered grayscale image"""
+        return self.edge_analysis['edges']
+
+    @cached_property
+    def roi(self) -> Optional[Image.Image]:
+        """Crop of the detected pill region, or None if nothing was detected"""
+        return self.processor.detect_pill_region(
+            self.rgb_image,
+            edge_analysis=self.edge_analysis
+        )
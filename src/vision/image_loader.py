@@ -0,0 +1,207 @@
+"""
+Upload decoding utilities for pill identification
+"""
+import io
+import math
+from PIL import Image
+from typing import Optional, Tuple, Union
+import logging
+
+from src.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an uploaded image exceeds the configured size limits"""
+
+
+class MemoryViewReader(io.RawIOBase):
+    """
+    Seekable read-only stream over a memoryview
+
+    io.BytesIO copies bytearray and memoryview input; this reader lets the
+    decoder pull from the upload buffer directly.
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]):
+        super().__init__()
+        self._view = memoryview(data).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        remaining = len(self._view) - self._position
+        count = min(len(buffer), max(0, remaining))
+        buffer[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def tell(self) -> int:
+        return self._position
+
+
+async def read_upload(
+    upload,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> memoryview:
+    """
+    Read an uploaded file in chunks into a bounded buffer
+
+    Reading stops as soon as the upload exceeds max_bytes, so an oversized
+    file is never held in memory in full. When the upload size is known up
+    front, it is checked before reading and the buffer is allocated once.
+
+    Args:
+        upload: FastAPI/Starlette UploadFile
+        max_bytes: Size limit (defaults to settings.max_image_size)
+        chunk_size: Bytes per read (defaults to settings.upload_chunk_size)
+
+    Returns:
+        memoryview over the upload contents
+
+    Raises:
+        ImageTooLargeError: If the upload exceeds max_bytes
+    """
+    if max_bytes is None:
+        max_bytes = settings.max_image_size
+    if chunk_size is None:
+        chunk_size = settings.upload_chunk_size
+
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise ImageTooLargeError(
+            f"Upload is {declared_size} bytes, limit is {max_bytes} bytes"
+        )
+
+    buffer = bytearray(declared_size or 0)
+    view = memoryview(buffer)
+    received = 0
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        end = received + len(chunk)
+        if end > max_bytes:
+            raise ImageTooLargeError(f"Upload exceeds the limit of {max_bytes} bytes")
+        if end <= len(buffer):
+            view[received:end] = chunk
+        else:
+            # Size unknown (or understated): grow the buffer
+            view.release()
+            del buffer[received:]
+            buffer += chunk
+            view = memoryview(buffer)
+        received = end
+
+    return view[:received]
+
+
+def _draft_request_size(size: Tuple[int, int], max_side: int) -> Optional[Tuple[int, int]]:
+    """
+    Compute the size to request from the JPEG decoder so the longest side
+    still covers max_side after DCT scaling
+
+    Args:
+        size: Original (width, height) from the image header
+        max_side: Longest side needed by downstream processing
+
+    Returns:
+        Requested (width, height), or None if no reduction is possible
+    """
+    width, height = size
+    longest = max(width, height)
+    if longest <= max_side:
+        return None
+
+    scale = max_side / longest
+    return (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+
+
+def decode_upload(
+    image_data: Union[bytes, bytearray, memoryview],
+    max_side: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    max_pixels: Optional[int] = None
+) -> Image.Image:
+    """
+    Decode an uploaded image at the lowest resolution downstream stages need
+
+    JPEG uploads are decoded with Pillow's draft mode, which lets libjpeg scale
+    by 1/2, 1/4 or 1/8 during decoding instead of producing the full-resolution
+    bitmap first. Oversized uploads are rejected from the header dimensions
+    before any pixel data is decoded.
+
+    Args:
+        image_data: Raw uploaded file contents (bytes or a memoryview, not copied)
+        max_side: Longest side required downstream (defaults to settings)
+        max_bytes: Size limit for the uploaded file (defaults to settings)
+        max_pixels: Limit on width x height of the decoded bitmap (defaults to settings)
+
+    Returns:
+        Loaded PIL Image
+
+    Raises:
+        ImageTooLargeError: If the upload exceeds max_bytes or its decoded
+            bitmap exceeds max_pixels (or Pillow's decompression bomb limit)
+    """
+    if max_side is None:
+        max_side = settings.upload_decode_max_side
+    if max_bytes is None:
+        max_bytes = settings.max_image_size
+    if max_pixels is None:
+        max_pixels = settings.max_decoded_pixels
+
+    if len(image_data) > max_bytes:
+        raise ImageTooLargeError(
+            f"Upload is {len(image_data)} bytes, limit is {max_bytes} bytes"
+        )
+
+    # Image.open only parses the header; pixel data is decoded on load()
+    stream = io.BytesIO(image_data) if isinstance(image_data, bytes) else MemoryViewReader(image_data)
+    try:
+        image = Image.open(stream)
+        original_size = image.size
+
+        if image.format == "JPEG":
+            request_size = _draft_request_size(original_size, max_side)
+            if request_size:
+                image.draft("RGB", request_size)
+
+        # Reject on the size of the bitmap we are about to allocate
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ImageTooLargeError(
+                f"Image dimensions {width}x{height} exceed the decode limit of {max_pixels} pixels"
+            )
+
+        image.load()
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        # Pillow's own bomb check (Image.MAX_IMAGE_PIXELS) can fire in open()
+        # before ours; the warning only arrives here when filtered to an error
+        raise ImageTooLargeError(str(e)) from e
+
+    if image.size != original_size:
+        logger.info(f"Decoded upload at reduced scale: {original_size} -> {image.size}")
+
+    return image
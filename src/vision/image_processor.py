@@ -7,6 +7,8 @@ from PIL import Image, ImageEnhance, ImageFilter, ImageOps
 from typing import Tuple, Optional, List, Dict, Any
 import logging
 
+from .normalization import to_model_input
+
 logger = logging.getLogger(__name__)
 
 class ImageProcessor:
@@ -22,13 +24,23 @@ class ImageProcessor:
             'min_circularity': 0.3,
             'min_solidity': 0.7
         }
+        # 5 bits per channel: 32 histogram bins and 32768 color bins
+        self.color_quantization_shift = 3
+        self.edge_contrast_factor = 2.0
+        self.edge_threshold = 128
+        # One binarization LUT per possible edge-image mean (see analyze_edges)
+        self._edge_luts = [self._build_edge_lut(mean) for mean in range(256)]
         
-    def preprocess_for_identification(self, image: Image.Image) -> np.ndarray:
+    def preprocess_for_identification(self, image: Image.Image, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Preprocess image for pill identification model
         
+        Pixels stay uint8 through resizing and enhancement and are normalized
+        once at the end.
+        
         Args:
             image: PIL Image object
+            out: Optional preallocated float32 array (e.g. a slot of a batch tensor)
             
         Returns:
             Preprocessed numpy array ready for model input
@@ -50,8 +62,8 @@ class ImageProcessor:
             # Enhance image quality
             enhanced_image = self.enhance_image(new_image)
             
-            # Convert to numpy array and normalize
-            img_array = np.array(enhanced_image, dtype=np.float32) / 255.0
+            # Normalize once at model input
+            img_array = to_model_input(np.asarray(enhanced_image), out=out)
 
             # Do NOT add batch dimension here; tests expect (224,224,3)
             logger.info(f"Preprocessed image to shape: {img_array.shape}")
@@ -97,33 +109,77 @@ class ImageProcessor:
     def _enhance_image(self, image: Image.Image) -> Image.Image:
         return self.enhance_image(image)
     
-    def detect_pill_region(self, image: Image.Image) -> Optional[Image.Image]:
+    def _build_edge_lut(self, mean: int) -> List[int]:
+        """
+        Build a 256-entry LUT that applies contrast enhancement and thresholding
+
+        ImageEnhance.Contrast maps p to clip(mean + factor * (p - mean)), so the
+        enhancement and the binary threshold collapse into a single table.
+
+        Args:
+            mean: Mean intensity of the edge image (as used by ImageEnhance.Contrast)
+
+        Returns:
+            List of 256 output values (0 or 255)
+        """
+        lut = []
+        for p in range(256):
+            enhanced = min(max(mean + self.edge_contrast_factor * (p - mean), 0), 255)
+            lut.append(255 if enhanced > self.edge_threshold else 0)
+        return lut
+
+    def analyze_edges(self, gray: Image.Image) -> Dict[str, Any]:
+        """
+        Run edge detection, binarization and edge counting in one pass
+
+        Args:
+            gray: Grayscale PIL Image
+
+        Returns:
+            Dictionary with the edge image, bounding box of edge pixels,
+            edge pixel count and edge density
+        """
+        edges = gray.filter(ImageFilter.FIND_EDGES)
+
+        # The edge histogram gives both the contrast mean and the edge count
+        histogram = edges.histogram()
+        total_pixels = gray.width * gray.height
+        mean = 0
+        if total_pixels:
+            mean = int(sum(i * count for i, count in enumerate(histogram)) / total_pixels + 0.5)
+        lut = self._edge_luts[mean]
+
+        edge_pixels = sum(count for count, value in zip(histogram, lut) if value)
+        bbox = edges.point(lut).getbbox() if edge_pixels else None
+
+        return {
+            'edges': edges,
+            'bbox': bbox,
+            'edge_pixels': edge_pixels,
+            'edge_density': edge_pixels / total_pixels if total_pixels > 0 else 0
+        }
+
+    def detect_pill_region(
+        self,
+        image: Image.Image,
+        edge_analysis: Optional[Dict[str, Any]] = None
+    ) -> Optional[Image.Image]:
         """
         Detect and crop the pill region from the image using PIL-only methods
         
         Args:
             image: PIL Image object
+            edge_analysis: Precomputed result of analyze_edges for this image
             
         Returns:
             Cropped image containing pill region, or None if not detected
         """
         try:
-            # Convert to grayscale for edge detection
-            gray = image.convert('L')
+            if edge_analysis is None:
+                edge_analysis = self.analyze_edges(image.convert('L'))
             
-            # Apply edge detection using PIL filters
-            edges = gray.filter(ImageFilter.FIND_EDGES)
-            
-            # Enhance edges
-            enhancer = ImageEnhance.Contrast(edges)
-            edges = enhancer.enhance(2.0)
-            
-            # Convert to binary image
-            threshold = 128
-            binary = edges.point(lambda p: p > threshold and 255)
-            
-            # Find bounding box of non-zero pixels
-            bbox = binary.getbbox()
+            # Bounding box of pixels above the edge threshold
+            bbox = edge_analysis['bbox']
             
             if bbox:
                 # Add some padding around detected region
@@ -169,15 +225,10 @@ class ImageProcessor:
             mean_color = np.mean(img_array, axis=(0, 1))
             std_color = np.std(img_array, axis=(0, 1))
             
-            # Dominant color (most frequent color)
+            # Quantize once to 5 bits per channel; the quantized channels are
+            # both the 32-bin histogram indices and the packed color code
             pixels = img_array.reshape(-1, 3)
-            unique_colors, counts = np.unique(pixels, axis=0, return_counts=True)
-            dominant_color = unique_colors[np.argmax(counts)]
-            
-            # Color histogram
-            hist_r = np.histogram(img_array[:,:,0], bins=32, range=(0, 256))[0]
-            hist_g = np.histogram(img_array[:,:,1], bins=32, range=(0, 256))[0]
-            hist_b = np.histogram(img_array[:,:,2], bins=32, range=(0, 256))[0]
+            dominant_color, hist_r, hist_g, hist_b = self._quantized_color_histogram(pixels)
             
             return {
                 'mean_rgb': mean_color.tolist(),
@@ -203,42 +254,83 @@ class ImageProcessor:
                 }
             }
 
+    def _quantized_color_histogram(
+        self, pixels: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compute the dominant color and per-channel histograms in one pass
+
+        Each channel is reduced to its top 5 bits (32 levels) and the three
+        channels are packed into a 15-bit code, so np.bincount replaces the
+        row sort that np.unique(axis=0) would do.
+
+        Args:
+            pixels: (N, 3) uint8 array of RGB pixels
+
+        Returns:
+            Tuple of (dominant RGB, red histogram, green histogram, blue histogram)
+        """
+        quantized = pixels >> self.color_quantization_shift
+        levels = 256 >> self.color_quantization_shift
+        bits = 8 - self.color_quantization_shift
+
+        hist_r = np.bincount(quantized[:, 0], minlength=levels)
+        hist_g = np.bincount(quantized[:, 1], minlength=levels)
+        hist_b = np.bincount(quantized[:, 2], minlength=levels)
+
+        codes = (
+            (quantized[:, 0].astype(np.uint32) << (2 * bits))
+            | (quantized[:, 1].astype(np.uint32) << bits)
+            | quantized[:, 2]
+        )
+        counts = np.bincount(codes, minlength=levels ** 3)
+        best = np.argmax(counts)
+
+        # Report the average of the actual pixels in the winning bin rather
+        # than the bin corner, so the color stays close to the source
+        dominant_color = np.rint(pixels[codes == best].mean(axis=0)).astype(np.uint8)
+
+        return dominant_color, hist_r, hist_g, hist_b
+
     # Test-friendly API wrappers expected by unit tests
     def _get_dominant_color(self, image: Image.Image) -> Tuple[int, int, int]:
         return tuple(map(int, self.extract_color_features(image)['dominant_rgb']))
 
     def extract_pill_features(self, image: Image.Image) -> Dict[str, Any]:
         # Build a feature dict compatible with tests
-        color_features = self.extract_color_features(image)
-        shape = self.extract_shape_features(image)
+        # Grayscale and edges are computed once and shared by the extractors
+        rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        edge_analysis = self.analyze_edges(rgb.convert('L'))
+        color_features = self.extract_color_features(rgb)
+        shape = self.extract_shape_features(rgb, edge_analysis=edge_analysis)
         return {
             'dominant_color': tuple(map(int, color_features['dominant_rgb'])),
             'shape_metrics': shape,
-            'brightness': float(np.mean(np.array(image)))
+            'brightness': float(np.mean(color_features['mean_rgb']))
         }
 
     def preprocess_for_ingestion(self, image: Image.Image) -> np.ndarray:
         # Provide a stable API used by tests (same output shape as identification)
         return self.preprocess_for_identification(image)
     
-    def extract_shape_features(self, image: Image.Image) -> Dict[str, Any]:
+    def extract_shape_features(
+        self,
+        image: Image.Image,
+        edge_analysis: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Extract shape features from pill image using PIL methods
         
         Args:
             image: PIL Image object
+            edge_analysis: Precomputed result of analyze_edges for this image
             
         Returns:
             Dictionary containing shape features
         """
         try:
-            # Convert to grayscale and apply edge detection
-            gray = image.convert('L')
-            edges = gray.filter(ImageFilter.FIND_EDGES)
-            
-            # Enhance edges
-            enhancer = ImageEnhance.Contrast(edges)
-            edges = enhancer.enhance(2.0)
+            if edge_analysis is None:
+                edge_analysis = self.analyze_edges(image.convert('L'))
             
             # Get image dimensions
             width, height = image.size
@@ -246,10 +338,7 @@ class ImageProcessor:
             
             # Calculate basic shape metrics
             total_pixels = width * height
-            
-            # Convert edges to binary for area calculation
-            binary = edges.point(lambda p: p > 128 and 255)
-            edge_pixels = np.array(binary).sum() / 255
+            edge_density = edge_analysis['edge_density']
             
             # Estimate shape properties
             shape_features = {
@@ -257,8 +346,8 @@ class ImageProcessor:
                 'height': height,
                 'aspect_ratio': aspect_ratio,
                 'area': total_pixels,
-                'edge_density': edge_pixels / total_pixels if total_pixels > 0 else 0,
-                'estimated_shape': self._classify_shape(aspect_ratio, edge_pixels/total_pixels)
+                'edge_density': edge_density,
+                'estimated_shape': self._classify_shape(aspect_ratio, edge_density)
             }
             
             return shape_features
@@ -319,11 +408,8 @@ class ImageProcessor:
             # Slight sharpening
             sharpened = enhanced.filter(ImageFilter.UnsharpMask(radius=1.0, percent=120, threshold=3))
             
-            # Convert to numpy array and normalize
-            img_array = np.array(sharpened, dtype=np.float32) / 255.0
-            
-            # Add batch dimension
-            img_array = np.expand_dims(img_array, axis=0)
+            # Normalize once, straight into a batch of one
+            img_array = to_model_input(np.asarray(sharpened)[np.newaxis])
             
             return img_array
             
@@ -388,14 +474,8 @@ class ImageProcessor:
             if image.mode != 'RGB':
                 image = image.convert('RGB')
             
-            # Convert to numpy array
-            img_array = np.array(image, dtype=np.float32)
-            
-            # Normalize to [0, 1]
-            img_array = img_array / 255.0
-            
-            # Add batch dimension
-            img_array = np.expand_dims(img_array, axis=0)
+            # Normalize to [0, 1] with a batch dimension in one pass
+            img_array = to_model_input(np.asarray(image)[np.newaxis])
             
             return img_array
             
@@ -3,9 +3,12 @@ Simplified image processing utilities for pill identification
 """
 import numpy as np
 from PIL import Image, ImageEnhance
-from typing import Tuple, Optional, List, Dict, Any
+from typing import Tuple, Optional, List, Dict, Any, Union
 import logging
 
+from .image_context import ImageContext
+from .normalization import allocate_batch, to_model_input
+
 logger = logging.getLogger(__name__)
 
 class ImageProcessor:
@@ -17,51 +20,101 @@ class ImageProcessor:
         self.target_size = (224, 224)
         self.enhancement_factor = 1.2
     
-    def preprocess_for_identification(self, image: Image.Image) -> np.ndarray:
+    def resize_for_identification(self, image: Union[Image.Image, ImageContext]) -> np.ndarray:
+        """
+        Resize image to the identification input size, keeping uint8 pixels
+        
+        Args:
+            image: PIL Image object or ImageContext
+            
+        Returns:
+            uint8 numpy array of shape (height, width, 3)
+        """
+        if isinstance(image, ImageContext):
+            if image.target_size == self.target_size:
+                return image.resized_uint8
+            image = image.rgb_image
+        
+        # Convert to RGB if needed
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # Resize to target size
+        resized_image = image.resize(self.target_size, Image.Resampling.LANCZOS)
+        return np.asarray(resized_image)
+    
+    def preprocess_for_identification(
+        self,
+        image: Union[Image.Image, ImageContext],
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
         Preprocess image for pill identification
         
+        Pixels stay uint8 through resizing and are normalized once at the end.
+        
         Args:
-            image: PIL Image object
+            image: PIL Image object or ImageContext
+            out: Optional preallocated float32 array (e.g. a slot of a batch tensor)
             
         Returns:
             Preprocessed image as numpy array
         """
         try:
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            # The context memoizes its normalized view; reuse it unless the
+            # caller wants the result written into its own buffer
+            if out is None and isinstance(image, ImageContext) and image.target_size == self.target_size:
+                return image.resized
             
-            # Resize to target size
-            resized_image = image.resize(self.target_size, Image.Resampling.LANCZOS)
-            
-            # Convert to numpy array and normalize
-            image_array = np.array(resized_image, dtype=np.float32) / 255.0
-            
-            return image_array
+            # Normalize once at model input
+            return to_model_input(self.resize_for_identification(image), out=out)
             
         except Exception as e:
             logger.error(f"Error preprocessing image: {e}")
+            if out is not None:
+                out.fill(0)
+                return out
             return np.zeros((*self.target_size, 3), dtype=np.float32)
     
-    def preprocess_for_ingestion(self, image: Image.Image) -> np.ndarray:
+    def preprocess_batch(
+        self,
+        images: List[Union[Image.Image, ImageContext]],
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Preprocess several images into one model input batch
+        
+        Args:
+            images: PIL Images or ImageContexts
+            out: Optional preallocated float32 array of shape (N, 224, 224, 3)
+            
+        Returns:
+            Batch array of shape (N, 224, 224, 3)
+        """
+        if out is None:
+            out = allocate_batch(len(images), self.target_size)
+        for index, image in enumerate(images):
+            self.preprocess_for_identification(image, out=out[index])
+        return out
+    
+    def preprocess_for_ingestion(self, image: Union[Image.Image, ImageContext]) -> np.ndarray:
         """
         Preprocess image for ingestion detection
         
         Args:
-            image: PIL Image object
+            image: PIL Image object or ImageContext
             
         Returns:
             Preprocessed image as numpy array
         """
         return self.preprocess_for_identification(image)
     
-    def extract_pill_features(self, image: Image.Image) -> Dict[str, Any]:
+    def extract_pill_features(self, image: Union[Image.Image, ImageContext]) -> Dict[str, Any]:
         """
         Extract basic features from pill image
         
         Args:
-            image: PIL Image of the pill
+            image: PIL Image of the pill or ImageContext
             
         Returns:
             Dictionary containing extracted features
@@ -69,8 +122,12 @@ class ImageProcessor:
         try:
             features = {}
             
-            # Convert to numpy array
-            img_array = np.array(image)
+            # Convert to numpy array (reusing the context's RGB view if given)
+            if isinstance(image, ImageContext):
+                img_array = image.rgb
+                image = image.rgb_image
+            else:
+                img_array = np.array(image)
             
             # Basic features
             features.update({
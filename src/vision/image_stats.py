@@ -0,0 +1,95 @@
+"""
+Single-pass moment statistics for uint8 frames
+"""
+import numpy as np
+from typing import Dict, List
+
+# Pixel values and their squares, for moments computed from a histogram
+_LEVELS = np.arange(256, dtype=np.int64)
+_LEVELS_SQUARED = _LEVELS * _LEVELS
+
+
+def _moment_arrays(histograms: np.ndarray, count: int) -> Dict[str, np.ndarray]:
+    """Mean, variance and std arrays (normalized units) from (N, 256) histograms"""
+    totals = histograms @ _LEVELS
+    totals_squared = histograms @ _LEVELS_SQUARED
+
+    mean = totals / count
+    variance = np.maximum(0.0, totals_squared / count - mean * mean)
+    return {
+        "mean": mean / 255.0,
+        "var": variance / (255.0 * 255.0),
+        "std": np.sqrt(variance) / 255.0
+    }
+
+
+def _moments_from_histogram(histogram: np.ndarray, count: int) -> Dict[str, float]:
+    """Mean, variance and std (in normalized [0, 1] units) from a 256-bin histogram"""
+    total = int(histogram @ _LEVELS)
+    total_squared = int(histogram @ _LEVELS_SQUARED)
+
+    # Exact integer sums; scale to [0, 1] units only at the end
+    mean = total / count
+    variance = max(0.0, total_squared / count - mean * mean)
+    return {
+        "mean": mean / 255.0,
+        "var": variance / (255.0 * 255.0),
+        "std": float(np.sqrt(variance)) / 255.0
+    }
+
+
+def compute_moments(image: np.ndarray) -> Dict[str, float]:
+    """
+    Compute mean, variance and standard deviation in one pass
+
+    uint8 input is reduced to a 256-bin histogram with np.bincount (one pass
+    over the pixels, integer counts) and all moments are derived from it.
+    Float input (already normalized to [0, 1]) falls back to NumPy moments.
+
+    Args:
+        image: uint8 pixels, or float pixels in [0, 1]
+
+    Returns:
+        Dictionary with 'mean', 'var' and 'std' in normalized [0, 1] units
+    """
+    if image.dtype == np.uint8:
+        histogram = np.bincount(image.ravel(), minlength=256)
+        return _moments_from_histogram(histogram, image.size)
+
+    mean = float(np.mean(image))
+    variance = float(np.mean(np.square(image - mean)))
+    return {"mean": mean, "var": variance, "std": float(np.sqrt(variance))}
+
+
+def compute_batch_moments(batch: np.ndarray) -> List[Dict[str, float]]:
+    """
+    Compute per-image moments for a uint8 batch in one vectorized pass
+
+    Pixels of image i are offset into histogram bins [256 * i, 256 * i + 255]
+    so a single np.bincount builds every image's histogram at once.
+
+    Args:
+        batch: uint8 array of shape (N, ...)
+
+    Returns:
+        One moments dictionary per image (same keys as compute_moments)
+    """
+    if batch.dtype != np.uint8:
+        return [compute_moments(image) for image in batch]
+
+    count = len(batch)
+    if count == 0:
+        return []
+
+    pixels = batch.reshape(count, -1)
+    offsets = (np.arange(count, dtype=np.int32) * 256)[:, np.newaxis]
+    histograms = np.bincount(
+        (pixels + offsets).ravel(),
+        minlength=256 * count
+    ).reshape(count, 256)
+
+    moments = _moment_arrays(histograms, pixels.shape[1])
+    return [
+        {name: float(values[index]) for name, values in moments.items()}
+        for index in range(count)
+    ]
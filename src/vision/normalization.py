@@ -0,0 +1,79 @@
+"""
+Model input normalization for uint8 image buffers
+"""
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+# Multiplying by a float32 reciprocal keeps the whole pass in float32
+_INV_255 = np.float32(1.0 / 255.0)
+
+
+def allocate_batch(batch_size: int, image_size: Tuple[int, int] = (224, 224), channels: int = 3) -> np.ndarray:
+    """
+    Allocate a float32 batch tensor for model input
+
+    Args:
+        batch_size: Number of images in the batch
+        image_size: (width, height) of each image
+        channels: Number of color channels
+
+    Returns:
+        Uninitialized array of shape (batch_size, height, width, channels)
+    """
+    width, height = image_size
+    return np.empty((batch_size, height, width, channels), dtype=np.float32)
+
+
+def to_model_input(pixels: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Normalize uint8 pixels to float32 in [0, 1] in a single pass
+
+    Args:
+        pixels: uint8 array of any shape
+        out: Optional preallocated float32 array (or batch slot) of the same shape
+
+    Returns:
+        Normalized float32 array (out, if provided)
+    """
+    if pixels.dtype != np.uint8:
+        raise ValueError(f"Expected uint8 pixels, got {pixels.dtype}")
+
+    if out is None:
+        out = np.empty(pixels.shape, dtype=np.float32)
+    np.multiply(pixels, _INV_255, out=out)
+    return out
+
+
+def batch_to_model_input(images: Sequence[np.ndarray], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Normalize a sequence of equally sized uint8 images into one batch tensor
+
+    Args:
+        images: uint8 arrays of shape (H, W, C)
+        out: Optional preallocated float32 array of shape (N, H, W, C)
+
+    Returns:
+        Normalized float32 batch of shape (N, H, W, C)
+    """
+    if out is None:
+        out = np.empty((len(images), *images[0].shape), dtype=np.float32)
+    for index, image in enumerate(images):
+        to_model_input(image, out=out[index])
+    return out
+
+
+def to_uint8(image: np.ndarray) -> np.ndarray:
+    """
+    Convert an image array to uint8, rescaling normalized float input
+
+    Args:
+        image: uint8 array, or float array with values in [0, 1]
+
+    Returns:
+        uint8 array of the same shape
+    """
+    if image.dtype == np.uint8:
+        return image
+    if np.issubdtype(image.dtype, np.floating):
+        return np.clip(np.rint(image * 255.0), 0, 255).astype(np.uint8)
+    return np.clip(image, 0, 255).astype(np.uint8)
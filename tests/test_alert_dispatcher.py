@@ -0,0 +1,226 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from src.api.schemas.adherence_schemas import CaregiverAlert
+from src.services.alert_dispatcher import AlertChannel, AlertDispatcher
+
+
+class RecordingChannel(AlertChannel):
+    name = "recording"
+
+    def __init__(self, failures=None, name="recording"):
+        # contact -> number of sends to it that raise before one succeeds
+        self.failures = dict(failures or {})
+        self.name = name
+        self.sends = []
+        self.times = []
+
+    async def send(self, caregiver_contact, alerts):
+        self.sends.append((caregiver_contact, [alert["alert_id"] for alert in alerts]))
+        self.times.append(time.monotonic())
+        if self.failures.get(caregiver_contact, 0) > 0:
+            self.failures[caregiver_contact] -= 1
+            raise ConnectionError("gateway down")
+
+
+class StaticDirectory:
+    def __init__(self, recipients):
+        self._recipients = recipients
+
+    def recipients(self, patient_id, alert_type, severity):
+        return self._recipients.get(patient_id, [])
+
+
+def make_alert(patient_id="p1", contact="carer@example.com", alert_type="missed_dose", severity="high"):
+    return CaregiverAlert(
+        patient_id=patient_id,
+        caregiver_contact=contact,
+        alert_type=alert_type,
+        message="Dose missed",
+        severity=severity
+    )
+
+
+def make_dispatcher(tmp_path, *channels, **kwargs):
+    kwargs.setdefault("batch_window_ms", 20)
+    kwargs.setdefault("dedup_window_seconds", 60)
+    kwargs.setdefault("max_retries", 2)
+    kwargs.setdefault("retry_backoff_seconds", 0.01)
+    return AlertDispatcher(channels=list(channels), log_path=str(tmp_path / "alerts.jsonl"), **kwargs)
+
+
+async def wait_for_stat(dispatcher, name, value, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while dispatcher.stats()[name] < value:
+        assert time.monotonic() < deadline, f"{name} never reached {value}"
+        await asyncio.sleep(0.01)
+
+
+def read_log(tmp_path):
+    with open(tmp_path / "alerts.jsonl") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_channels_must_implement_send():
+    with pytest.raises(TypeError):
+        AlertChannel()
+
+
+@pytest.mark.asyncio
+async def test_repeats_are_collapsed_per_caregiver(tmp_path):
+    channel = RecordingChannel()
+    dispatcher = make_dispatcher(tmp_path, channel)
+
+    first = dispatcher.enqueue(make_alert())
+    repeat = dispatcher.enqueue(make_alert())
+    other_caregiver = dispatcher.enqueue(make_alert(contact="nurse@example.com"))
+    await dispatcher.close()
+
+    assert repeat == {"alert_id": first["alert_id"], "duplicate": True}
+    assert other_caregiver["duplicate"] is False
+    assert sorted(contact for contact, _ in channel.sends) == ["carer@example.com", "nurse@example.com"]
+    stats = dispatcher.stats()
+    assert (stats["queued"], stats["collapsed"], stats["delivered"]) == (2, 1, 2)
+
+    log = read_log(tmp_path)
+    assert len(log) == 3
+    assert [record["duplicate_of"] for record in log if "duplicate_of" in record] == [first["alert_id"]]
+
+
+@pytest.mark.asyncio
+async def test_alerts_are_batched_per_caregiver(tmp_path):
+    channel = RecordingChannel()
+    directory = StaticDirectory({"p1": ["family@example.com"], "p2": ["family@example.com"]})
+    dispatcher = make_dispatcher(tmp_path, channel, directory=directory)
+
+    dispatcher.enqueue(make_alert(patient_id="p1"))
+    dispatcher.enqueue(make_alert(patient_id="p2"))
+    await dispatcher.close()
+
+    sends = dict(channel.sends)
+    assert len(channel.sends) == 2
+    assert len(sends["carer@example.com"]) == 2
+    assert len(sends["family@example.com"]) == 2
+    assert dispatcher.stats()["batches"] == 1
+    assert all(record["sent"] for record in read_log(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_failed_caregiver_is_retried_alone(tmp_path):
+    channel = RecordingChannel(failures={"nurse@example.com": 1})
+    directory = StaticDirectory({"p1": ["nurse@example.com"]})
+    dispatcher = make_dispatcher(tmp_path, channel, directory=directory)
+
+    dispatcher.enqueue(make_alert())
+    await dispatcher.close()
+
+    assert [contact for contact, _ in channel.sends] == [
+        "carer@example.com", "nurse@example.com", "nurse@example.com"
+    ]
+    (record,) = read_log(tmp_path)
+    assert record["sent"] is True
+    assert record["attempts"] == 2
+    assert sorted(record["delivered_to"]) == ["carer@example.com", "nurse@example.com"]
+    assert "failed_recipients" not in record
+    assert dispatcher.stats()["retried"] == 1
+
+
+@pytest.mark.asyncio
+async def test_undelivered_alert_is_logged_and_released(tmp_path):
+    channel = RecordingChannel(failures={"carer@example.com": 3})
+    dispatcher = make_dispatcher(tmp_path, channel)
+
+    first = dispatcher.enqueue(make_alert())
+    await wait_for_stat(dispatcher, "failed", 1)
+
+    assert len(channel.sends) == 3  # first attempt plus max_retries
+    stats = dispatcher.stats()
+    assert (stats["retried"], stats["failed"], stats["delivered"]) == (2, 1, 0)
+    (record,) = read_log(tmp_path)
+    assert record["sent"] is False
+    assert record["failed_recipients"] == ["carer@example.com"]
+
+    # The failed alert no longer suppresses a repeat
+    second = dispatcher.enqueue(make_alert())
+    await dispatcher.close()
+
+    assert second["duplicate"] is False
+    assert second["alert_id"] != first["alert_id"]
+    assert dispatcher.stats()["delivered"] == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_skips_channels_that_already_delivered(tmp_path):
+    sms = RecordingChannel(name="sms")
+    email = RecordingChannel(failures={"carer@example.com": 1}, name="email")
+    dispatcher = make_dispatcher(tmp_path, sms, email)
+
+    dispatcher.enqueue(make_alert())
+    await wait_for_stat(dispatcher, "delivered", 1)
+    await dispatcher.close()
+
+    assert len(sms.sends) == 1
+    assert len(email.sends) == 2
+    (record,) = read_log(tmp_path)
+    assert record["channels_sent"] == {"carer@example.com": ["sms", "email"]}
+
+
+@pytest.mark.asyncio
+async def test_retry_delay_grows_with_attempts(tmp_path):
+    channel = RecordingChannel(failures={"carer@example.com": 2})
+    dispatcher = make_dispatcher(tmp_path, channel, batch_window_ms=0, retry_backoff_seconds=0.05)
+
+    dispatcher.enqueue(make_alert())
+    await wait_for_stat(dispatcher, "delivered", 1)
+    await dispatcher.close()
+
+    first_gap, second_gap = (b - a for a, b in zip(channel.times, channel.times[1:]))
+    assert first_gap >= 0.05
+    assert second_gap >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_dispatch_error_does_not_drop_later_alerts(tmp_path, monkeypatch):
+    channel = RecordingChannel()
+    dispatcher = make_dispatcher(tmp_path, channel)
+    append_log = dispatcher._append_log
+    calls = []
+
+    def flaky_append_log(records):
+        calls.append(records)
+        if len(calls) == 1:
+            raise RuntimeError("log volume gone")
+        append_log(records)
+
+    monkeypatch.setattr(dispatcher, "_append_log", flaky_append_log)
+
+    dispatcher.enqueue(make_alert(patient_id="p1"))
+    await wait_for_stat(dispatcher, "batches", 1)
+    await asyncio.sleep(0.05)  # the failed log write has been handled
+    worker = dispatcher._worker
+    assert not worker.done()
+
+    dispatcher.enqueue(make_alert(patient_id="p2"))
+    assert dispatcher._worker is worker
+    await dispatcher.close()
+
+    assert dispatcher.stats()["delivered"] == 2
+    assert [record["patient_id"] for record in read_log(tmp_path)] == ["p2"]
+
+
+@pytest.mark.asyncio
+async def test_close_gives_pending_retries_a_final_attempt(tmp_path):
+    channel = RecordingChannel(failures={"carer@example.com": 1})
+    dispatcher = make_dispatcher(tmp_path, channel, retry_backoff_seconds=60)
+
+    dispatcher.enqueue(make_alert())
+    await wait_for_stat(dispatcher, "retried", 1)
+    assert dispatcher.stats()["awaiting_retry"] == 1
+    await dispatcher.close()
+
+    assert len(channel.sends) == 2
+    (record,) = read_log(tmp_path)
+    assert record["sent"] is True
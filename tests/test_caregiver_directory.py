@@ -0,0 +1,87 @@
+import json
+import multiprocessing
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from src.database.models import CaregiverContact
+from src.services.caregiver_directory import CaregiverDirectory
+
+LEGACY = {
+    f"patient_{i}": {"name": f"Carer {i}", "email": f"carer{i}@example.com", "relationship": "child"}
+    for i in range(20)
+}
+
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'contacts.db'}")
+
+
+def count_contacts(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(CaregiverContact.__table__)).scalar()
+
+
+@pytest.fixture
+def legacy_path(tmp_path):
+    path = tmp_path / "caregiver_contacts.json"
+    path.write_text(json.dumps(LEGACY))
+    return path
+
+
+def test_legacy_contacts_are_imported_once(tmp_path, legacy_path):
+    engine = make_engine(tmp_path)
+    directory = CaregiverDirectory(engine=engine, legacy_path=str(legacy_path))
+
+    assert count_contacts(engine) == len(LEGACY)
+    assert directory.import_legacy_contacts() == 0
+    assert directory.recipients("patient_3", "missed_dose", "high") == ["carer3@example.com"]
+
+
+def _start_directory(db_path, legacy_path, start):
+    start.wait()
+    CaregiverDirectory(engine=create_engine(f"sqlite:///{db_path}"), legacy_path=legacy_path)
+
+
+def test_workers_starting_together_import_once(tmp_path, legacy_path):
+    engine = make_engine(tmp_path)
+    CaregiverDirectory(engine=engine, legacy_path=str(tmp_path / "missing.json"))  # schema only
+
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    workers = [
+        context.Process(target=_start_directory, args=(tmp_path / "contacts.db", str(legacy_path), start))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(30)
+
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    assert count_contacts(engine) == len(LEGACY)
+
+
+def test_added_contact_receives_matching_alerts(tmp_path):
+    directory = CaregiverDirectory(engine=make_engine(tmp_path), legacy_path=str(tmp_path / "missing.json"))
+    directory.add_contact("p1", "Primary", email="primary@example.com", is_primary=True)
+    directory.add_contact(
+        "p1", "Nurse", phone="+15550100", email="nurse@example.com",
+        alert_preferences={"min_severity": "high", "method": "sms"}
+    )
+
+    assert directory.recipients("p1", "missed_dose", "high") == ["primary@example.com", "+15550100"]
+    assert directory.recipients("p1", "missed_dose", "low") == ["primary@example.com"]
+
+
+def test_contacts_are_copies_of_the_cache(tmp_path):
+    directory = CaregiverDirectory(engine=make_engine(tmp_path), legacy_path=str(tmp_path / "missing.json"))
+    directory.add_contact("p1", "Primary", email="primary@example.com", alert_preferences={"method": "email"})
+
+    contacts = directory.contacts_for("p1")
+    contacts[0]["email"] = "changed@example.com"
+    contacts[0]["preferences"]["method"] = "sms"
+    contacts.clear()
+
+    assert directory.recipients("p1", "missed_dose", "high") == ["primary@example.com"]
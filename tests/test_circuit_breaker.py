@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from src.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise RuntimeError("upstream error")
+
+
+def _breaker(**kwargs):
+    options = dict(failure_rate=0.5, slow_call_seconds=1.0, window_size=4, min_calls=4, open_seconds=0.05)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+@pytest.mark.asyncio
+async def test_opens_at_failure_rate_and_rejects():
+    breaker = _breaker()
+    for fn in (_ok, _ok, _fail):
+        try:
+            await breaker.call(fn)
+        except RuntimeError:
+            pass
+    assert breaker.state == CLOSED
+
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_ok)
+    assert breaker.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_or_reopens():
+    breaker = _breaker(min_calls=1, window_size=1)
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    await asyncio.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    assert breaker.state == OPEN
+
+    await asyncio.sleep(0.06)
+    assert await breaker.call(_ok) == "ok"
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_only_one_half_open_probe_at_a_time():
+    breaker = _breaker(min_calls=1, window_size=1)
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    await asyncio.sleep(0.06)
+
+    release = asyncio.Event()
+
+    async def slow_ok():
+        await release.wait()
+        return "ok"
+
+    probe = asyncio.create_task(breaker.call(slow_ok))
+    await asyncio.sleep(0)
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_ok)
+    release.set()
+    assert await probe == "ok"
+
+
+@pytest.mark.asyncio
+async def test_slow_calls_count_as_failures():
+    breaker = _breaker(slow_call_seconds=0.0, min_calls=1, window_size=1)
+    await breaker.call(_ok)
+    assert breaker.state == OPEN
+    assert breaker.stats()["slow_calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancellation_is_not_a_failure():
+    breaker = _breaker(min_calls=1, window_size=1)
+    task = asyncio.create_task(breaker.call(lambda: asyncio.sleep(1)))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker.state == CLOSED
+    assert breaker.stats()["calls"] == 0
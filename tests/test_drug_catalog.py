@@ -0,0 +1,41 @@
+import pytest
+
+from src.services.drug_catalog import _ndc_candidates, generate_sample_catalog
+
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    catalog = generate_sample_catalog(str(tmp_path_factory.mktemp("catalog") / "catalog.db"), generic_copies=1)
+    yield catalog
+    catalog.close()
+
+
+def test_ndc_candidates_cover_product_and_package_forms():
+    assert _ndc_candidates("10000-0100") == ["100000100"]
+    assert "100000100" in _ndc_candidates("10000-0100-01")
+    # 11-digit billing form of the 5-4-1 package code 10000-0100-1
+    assert "100000100" in _ndc_candidates("10000010001")
+    assert _ndc_candidates("") == []
+    assert _ndc_candidates("--") == []
+
+
+def test_search_by_ndc_matches_exact_and_package_codes(catalog):
+    for query in ("10000-0100", "100000100", "10000-0100-01", "10000010001"):
+        results = catalog.search_by_ndc(query)
+        assert [result["ndc_number"] for result in results] == ["10000-0100"], query
+        assert results[0]["relevance"] == 1.0
+
+
+def test_search_by_ndc_without_digits_matches_nothing(catalog):
+    assert catalog.search_by_ndc("abc") == []
+
+
+def test_typo_fallback_can_be_disabled(catalog):
+    assert catalog.search_by_name("lipitr")
+    assert catalog.search_by_name("lipitr", typo_tolerant=False) == []
+
+
+def test_typo_fallback_does_not_return_another_drug(catalog):
+    # "norvir" (ritonavir) must not match Norvasc (amlodipine)
+    assert catalog.search_by_name("norvir") == []
+    assert catalog.search_by_name("norvir", min_score=0.5)
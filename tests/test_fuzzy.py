@@ -0,0 +1,27 @@
+from src.utils.config import settings
+from src.utils.fuzzy import normalize, rank, relevance_scores
+
+
+def test_rank_orders_best_first_and_applies_cutoff():
+    records = [{"name": "Ibuprofen"}, {"name": "Aspirin"}, {"name": "Acetaminophen"}]
+    ranked = rank("aspirn", records, score_cutoff=0.5)
+    assert [record["name"] for record, _ in ranked] == ["Aspirin"]
+
+
+def test_scores_use_best_field():
+    records = [{"name": "Advil", "generic_name": "Ibuprofen"}]
+    assert relevance_scores("ibuprofen", records)[0] == 1.0
+
+
+def test_cutoff_accepts_typos_but_not_other_drugs():
+    def score(query, name):
+        return float(relevance_scores(query, [{"name": name}], fields=("name",))[0])
+
+    assert score("ibuprofin", "Ibuprofen") >= settings.fuzzy_score_cutoff
+    assert score("norvasc", "Norvir") < settings.fuzzy_score_cutoff
+    assert score("lisinopril", "Lipitor") < settings.fuzzy_score_cutoff
+
+
+def test_normalize():
+    assert normalize(" Tylenol-Extra ") == "tylenol extra"
+    assert normalize(None) == ""
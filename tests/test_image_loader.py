@@ -0,0 +1,45 @@
+import io
+import warnings
+
+import pytest
+from PIL import Image
+
+from src.vision.image_loader import ImageTooLargeError, decode_upload
+
+
+def _png(size, mode="RGB") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("size,mode", [((2000, 2000), "RGB"), ((1170, 2532), "RGBA")])
+def test_decodes_camera_and_screenshot_resolutions(size, mode):
+    assert decode_upload(_png(size, mode)).size == size
+
+
+def test_rejects_bitmap_over_pixel_limit():
+    with pytest.raises(ImageTooLargeError):
+        decode_upload(_png((200, 200)), max_pixels=100 * 100)
+
+
+def test_rejects_upload_over_byte_limit():
+    data = _png((50, 50))
+    with pytest.raises(ImageTooLargeError):
+        decode_upload(data, max_bytes=len(data) - 1)
+
+
+def test_pillow_decompression_bomb_is_too_large(monkeypatch):
+    data = _png((200, 200))
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100 * 100)  # bomb error above 2x this
+    with pytest.raises(ImageTooLargeError):
+        decode_upload(data, max_pixels=10_000_000)
+
+
+def test_decompression_bomb_warning_as_error_is_too_large(monkeypatch):
+    data = _png((150, 150))
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100 * 100)  # warning between 1x and 2x
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+        with pytest.raises(ImageTooLargeError):
+            decode_upload(data, max_pixels=10_000_000)
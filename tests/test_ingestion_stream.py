@@ -0,0 +1,68 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.models.ingestion_detector import IngestionDetector
+from src.models.ingestion_stream import IngestionStreamSession
+from src.models.runtime import ModelRuntime
+
+
+class ScriptedRuntime(ModelRuntime):
+    """Returns P(ingested) from a fixed script, one value per frame"""
+
+    name = "scripted"
+
+    def __init__(self, scores):
+        super().__init__()
+        self.scores = list(scores)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return np.array([[self.scores.pop(0)] for _ in batch], dtype=np.float32)
+
+
+def _frame(value: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (value, value, value)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_model_runtime_requires_predict():
+    with pytest.raises(TypeError):
+        ModelRuntime()
+
+
+def test_stream_uses_model_scores_when_a_model_is_loaded():
+    detector = IngestionDetector()
+    detector.model = ScriptedRuntime([0.2, 0.9, 0.1])
+    session = IngestionStreamSession(detector, window=4)
+
+    first = session.add_frame(_frame(10))
+    assert not first["ingested"]
+
+    second = session.add_frame(_frame(200))
+    assert second["ingested"]
+    assert second["confidence"] == pytest.approx(0.9)
+    assert second["actions"] == ["model_ingestion"]
+
+    # The confident frame is still in the window
+    assert session.add_frame(_frame(10))["ingested"]
+
+
+def test_stream_window_is_bounded():
+    detector = IngestionDetector()
+    detector.model = ScriptedRuntime([0.9, 0.1, 0.1])
+    session = IngestionStreamSession(detector, window=2)
+
+    for value in (200, 10, 10):
+        result = session.add_frame(_frame(value))
+    assert session.frame_count == 3
+    assert not result["ingested"]
+
+
+def test_motion_is_measured_against_the_previous_frame():
+    session = IngestionStreamSession(IngestionDetector(), window=4)
+    assert session.add_frame(_frame(0))["motion"] == 0.0
+    assert session.add_frame(_frame(255))["motion"] == pytest.approx(1.0)
+    assert session.add_frame(_frame(255))["motion"] == 0.0
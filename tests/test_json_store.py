@@ -0,0 +1,202 @@
+import json
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from src.utils import json_store
+from src.utils.json_store import JsonStore, StoreWriteError
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JsonStore(str(tmp_path / "store.json"), commit_window_ms=0)
+
+
+def test_update_persists_and_returns_mutator_result(store):
+    assert store.update(lambda data: data.setdefault("p1", []).append({"n": 1}) or "ok") == "ok"
+    assert json.loads(store.path.read_text()) == {"p1": [{"n": 1}]}
+    assert store.data["p1"][0]["n"] == 1
+
+
+def test_data_is_read_only(store):
+    store.update(lambda data: data.update({"p1": [{"n": 1}]}))
+    view = store.data
+    with pytest.raises(TypeError):
+        view["p2"] = []
+    with pytest.raises(TypeError):
+        view["p1"][0]["n"] = 2
+    with pytest.raises(AttributeError):
+        view["p1"].append({})
+
+
+def test_view_reflects_later_updates(store):
+    store.update(lambda data: data.update({"a": 1}))
+    before = store.data
+    store.update(lambda data: data.update({"b": 2}))
+    assert dict(store.data) == {"a": 1, "b": 2}
+    assert dict(before) == {"a": 1}
+
+
+def test_other_writers_are_picked_up(store, tmp_path):
+    other = JsonStore(str(store.path), commit_window_ms=0)
+    store.update(lambda data: data.update({"a": 1}))
+    other.update(lambda data: data.update({"b": 2}))
+    assert dict(store.data) == {"a": 1, "b": 2}
+
+
+def test_reset(store):
+    store.update(lambda data: data.update({"a": 1}))
+    store.reset()
+    assert dict(store.data) == {}
+
+
+def _on_disk(store):
+    return json.loads(store.path.read_text())
+
+
+def test_update_returns_only_after_its_commit_is_on_disk(tmp_path):
+    store = JsonStore(str(tmp_path / "store.json"), commit_window_ms=50)
+    store.update(lambda data: data.update({"a": 1}))
+    assert _on_disk(store) == {"a": 1}
+    assert store.stats()["flushes"] == 1
+
+
+def test_concurrent_writers_share_one_commit(tmp_path):
+    store = JsonStore(str(tmp_path / "store.json"), commit_window_ms=100)
+    start = threading.Barrier(8)
+    seen_on_return = []
+
+    def write(i):
+        start.wait()
+        store.update(lambda data: data.update({str(i): i}))
+        seen_on_return.append(str(i) in _on_disk(store))
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(seen_on_return)
+    assert len(_on_disk(store)) == 8
+    assert store.stats() == {"updates": 8, "flushes": 1, "failed_flushes": 0}
+
+
+def test_readers_see_committed_state_only(tmp_path):
+    store = JsonStore(str(tmp_path / "store.json"), commit_window_ms=100)
+    store.update(lambda data: data.update({"a": 1}))
+    writer = threading.Thread(target=store.update, args=(lambda data: data.update({"b": 2}),))
+    writer.start()
+    time.sleep(0.03)
+    assert dict(store.data) == {"a": 1}
+    writer.join()
+    assert dict(store.data) == {"a": 1, "b": 2}
+
+
+def test_failed_commit_is_raised_to_every_writer(tmp_path, monkeypatch):
+    store = JsonStore(str(tmp_path / "store.json"), commit_window_ms=100)
+    store.update(lambda data: data.update({"a": 1}))
+
+    def fail(path, data, fsync=True):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json_store, "atomic_write_json", fail)
+    start = threading.Barrier(4)
+    errors = []
+
+    def write(i):
+        start.wait()
+        try:
+            store.update(lambda data: data.update({str(i): i}))
+        except StoreWriteError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 4
+    assert store.stats()["failed_flushes"] == 1
+    # The unwritten changes are dropped, and the lock is free for the next writer
+    assert dict(store.data) == {"a": 1}
+    monkeypatch.undo()
+    store.update(lambda data: data.update({"b": 2}))
+    assert _on_disk(store) == {"a": 1, "b": 2}
+
+
+def test_failing_mutator_leaves_store_unchanged(store):
+    store.update(lambda data: data.update({"a": 1}))
+
+    def broken(data):
+        data["b"] = 2
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        store.update(broken)
+    assert dict(store.data) == {"a": 1}
+    store.update(lambda data: data.update({"c": 3}))
+    assert _on_disk(store) == {"a": 1, "c": 3}
+
+
+def _append_many(path, worker, count):
+    store = JsonStore(path, commit_window_ms=2)
+    for i in range(count):
+        store.update(lambda data: data.setdefault("log", []).append(f"{worker}-{i}"))
+
+
+def test_writers_in_several_processes_lose_nothing(tmp_path):
+    path = str(tmp_path / "shared.json")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_many, args=(path, worker, 25)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    entries = json.loads(open(path).read())["log"]
+    assert len(entries) == 100
+    assert len(set(entries)) == 100
+
+
+def test_failing_mutator_does_not_leak_into_pending_commit(tmp_path):
+    store = JsonStore(str(tmp_path / "store.json"), commit_window_ms=100)
+    writer = threading.Thread(target=store.update, args=(lambda data: data.update({"a": 1}),))
+    writer.start()
+    time.sleep(0.03)  # the first writer's commit is pending
+
+    def broken(data):
+        data["partial"] = True
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        store.update(broken)
+    writer.join()
+    assert _on_disk(store) == {"a": 1}
+
+
+def test_reads_do_not_wait_for_another_writers_lock(tmp_path):
+    path = str(tmp_path / "store.json")
+    store = JsonStore(path, commit_window_ms=0)
+    store.update(lambda data: data.update({"a": 1}))
+
+    holder = JsonStore(path, commit_window_ms=0)
+    holder._acquire()  # another worker is committing
+    try:
+        writer = threading.Thread(target=store.update, args=(lambda data: data.update({"b": 2}),))
+        writer.start()
+        time.sleep(0.03)  # the writer is now waiting for the file lock
+
+        result = []
+        reader = threading.Thread(target=lambda: result.append(dict(store.data)))
+        reader.start()
+        reader.join(1)
+        assert result == [{"a": 1}]
+    finally:
+        holder._release()
+    writer.join()
+    assert dict(store.data) == {"a": 1, "b": 2}
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.models.micro_batcher import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_share_a_batch_in_order():
+    sizes = []
+
+    def double(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=20)
+    try:
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+    finally:
+        await batcher.close()
+
+    assert results == [0, 2, 4, 6, 8]
+    assert sizes == [5]
+
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_at_max_size():
+    sizes = []
+
+    def identity(items):
+        sizes.append(len(items))
+        return list(items)
+
+    batcher = MicroBatcher(identity, max_batch_size=3, max_wait_ms=20)
+    try:
+        assert await asyncio.gather(*(batcher.submit(i) for i in range(7))) == list(range(7))
+    finally:
+        await batcher.close()
+
+    assert max(sizes) <= 3
+    assert sum(sizes) == 7
+
+
+@pytest.mark.asyncio
+async def test_batch_error_reaches_every_caller():
+    def fail(items):
+        raise ValueError("model error")
+
+    batcher = MicroBatcher(fail, max_batch_size=4, max_wait_ms=10)
+    try:
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+    finally:
+        await batcher.close()
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert batcher.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_next_batch_is_collected_and_processed_while_one_runs():
+    release = threading.Event()
+    running = []
+
+    def process(items):
+        running.append(items)
+        if items == [0]:
+            # The first batch blocks until the second has been processed
+            release.wait(2)
+        else:
+            release.set()
+        return list(items)
+
+    batcher = MicroBatcher(process, max_batch_size=1, max_wait_ms=1, max_in_flight=2)
+    try:
+        first = asyncio.create_task(batcher.submit(0))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        assert await batcher.submit(1) == 1
+        assert await first == 0
+    finally:
+        await batcher.close()
+
+    assert time.monotonic() - started < 1.0
+
+
+@pytest.mark.asyncio
+async def test_in_flight_batches_are_bounded():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def process(items):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        return list(items)
+
+    batcher = MicroBatcher(process, max_batch_size=1, max_wait_ms=1, max_in_flight=2)
+    try:
+        await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+    finally:
+        await batcher.close()
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_close_finishes_half_collected_and_queued_items():
+    batcher = MicroBatcher(lambda items: [item * 10 for item in items], max_batch_size=2, max_wait_ms=5000)
+    tasks = [asyncio.create_task(batcher.submit(i)) for i in range(5)]
+    await asyncio.sleep(0.01)  # first batch is full and processing; the rest wait
+
+    await batcher.close()
+
+    assert await asyncio.wait_for(asyncio.gather(*tasks), 1) == [0, 10, 20, 30, 40]
+
+
+@pytest.mark.asyncio
+async def test_restarted_worker_keeps_queued_items():
+    release = threading.Event()
+
+    def process(items):
+        release.wait(2)
+        return list(items)
+
+    batcher = MicroBatcher(process, max_batch_size=1, max_wait_ms=1, max_in_flight=1)
+    try:
+        tasks = [asyncio.create_task(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0.01)  # item 0 processing, 1 and 2 queued
+        batcher._worker.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.wait_for(batcher.submit(3), 1) == 3
+        assert await asyncio.wait_for(asyncio.gather(*tasks), 1) == [0, 1, 2]
+    finally:
+        await batcher.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from src.services.drug_catalog import generate_sample_catalog
+from src.services.pill_data_service import PillDataService
+
+NORVIR = {"name": "Norvir", "generic_name": "ritonavir", "source": "RxNorm", "relevance": 1.0}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    catalog = generate_sample_catalog(str(tmp_path / "catalog.db"), generic_copies=1)
+    service = PillDataService(catalog=catalog)
+    service.remote_fallback = True
+    remote_queries = []
+
+    async def remote_search(name):
+        remote_queries.append(name)
+        return [dict(NORVIR)] if name.lower() == "norvir" else []
+
+    monkeypatch.setattr(service, "_remote_search_by_name", remote_search)
+    service.remote_queries = remote_queries
+    yield service
+    catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_unknown_name_goes_remote_instead_of_near_miss(service):
+    results = await service.search_by_name("Norvir")
+
+    assert [result["name"] for result in results] == ["Norvir"]
+    assert service.remote_queries == ["Norvir"]
+
+
+@pytest.mark.asyncio
+async def test_confident_local_match_skips_remote(service):
+    results = await service.search_by_name("Lipitor")
+
+    assert results and results[0]["name"] == "Lipitor"
+    assert service.remote_queries == []
+
+
+@pytest.mark.asyncio
+async def test_weak_local_match_is_kept_when_remote_finds_nothing(service):
+    results = await service.search_by_name("amlodipine 5")
+
+    assert results
+    assert service.remote_queries == ["amlodipine 5"]
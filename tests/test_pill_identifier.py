@@ -0,0 +1,37 @@
+import json
+
+from src.models.pill_identifier import PillIdentifier
+
+VALID = {"name": "Metformin", "dosage": "500mg", "shape": "round", "color": "white"}
+
+
+def test_sample_database_is_seeded_and_valid(tmp_path):
+    identifier = PillIdentifier(database_path=str(tmp_path / "pills.json"))
+
+    pills = identifier.get_pill_infos()
+    assert {pill.name for pill in pills} == {"Aspirin", "Ibuprofen", "Acetaminophen"}
+
+
+def test_invalid_entries_are_skipped(tmp_path):
+    path = tmp_path / "pills.json"
+    path.write_text(json.dumps({
+        "metformin_500mg": VALID,
+        "missing_dosage": {"name": "Broken", "shape": "round", "color": "blue"},
+        "not_a_record": "aspirin"
+    }))
+    identifier = PillIdentifier(database_path=str(path))
+
+    assert [pill.name for pill in identifier.get_pill_infos()] == ["Metformin"]
+
+
+def test_entries_are_validated_once_per_version(tmp_path):
+    identifier = PillIdentifier(database_path=str(tmp_path / "pills.json"))
+
+    first = identifier.get_pill_infos()
+    again = identifier.get_pill_infos()
+    assert [a is b for a, b in zip(first, again)] == [True] * len(first)
+
+    identifier.add_pill(dict(VALID))
+    updated = identifier.get_pill_infos()
+    assert len(updated) == len(first) + 1
+    assert "Metformin" in {pill.name for pill in updated}
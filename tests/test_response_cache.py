@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from src.services.response_cache import TieredCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = TieredCache(db_path=str(tmp_path / "cache.db"), max_entries=2, ttl=60, negative_ttl=1, stale_ttl=60)
+    yield cache
+    cache.close()
+
+
+def test_set_and_get_round_trip(cache):
+    cache.set("name", "aspirin", [{"name": "Aspirin"}])
+    assert cache.get("name", "aspirin") == [{"name": "Aspirin"}]
+    assert cache.get("name", "missing") is None
+
+
+def test_returned_values_are_copies(cache):
+    value = [{"name": "Aspirin"}]
+    cache.set("name", "aspirin", value)
+    value[0]["relevance"] = 1.0
+
+    first = cache.get("name", "aspirin")
+    first[0]["relevance"] = 0.5
+    assert cache.get("name", "aspirin") == [{"name": "Aspirin"}]
+
+
+def test_lru_evicts_to_disk_tier(cache):
+    for key in ("a", "b", "c"):
+        cache.set("name", key, [key])
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("name", "a") == ["a"]
+    assert cache.stats()["disk_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_fetch_fetches_once(cache):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return [{"name": "Ibuprofen"}]
+
+    first = await cache.get_or_fetch("name", "ibuprofen", fetch)
+    first[0]["relevance"] = 0.9
+    second = await cache.get_or_fetch("name", "ibuprofen", fetch)
+
+    assert len(calls) == 1
+    assert second == [{"name": "Ibuprofen"}]
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_and_refreshed(cache):
+    cache.set("name", "old", ["old"])
+    cache._memory[("name", "old")].stored_at = time.time() - 90
+
+    async def fetch():
+        return ["new"]
+
+    assert await cache.get_or_fetch("name", "old", fetch) == ["old"]
+    for task in list(cache._refresh_tasks):
+        await task
+    assert cache.get("name", "old") == ["new"]
+    assert cache.stats()["stale_hits"] == 1
@@ -0,0 +1,32 @@
+from src.utils.result_merge import merge_results, normalize_dosage, result_key
+
+
+def test_duplicates_collapse_across_formatting():
+    fda = {"name": "ASPIRIN", "dosage": "325 MG/1", "ndc_number": "10000-0100", "relevance": 0.7}
+    rxnorm = {"name": "Aspirin", "dosage": "325mg", "ndc_number": "100000100", "relevance": 0.9}
+    assert result_key(fda) == result_key(rxnorm)
+    assert merge_results([fda], [rxnorm]) == [rxnorm]
+
+
+def test_first_position_kept_and_lower_scores_ignored():
+    imprint = [{"name": "Advil", "dosage": "200 mg", "relevance": 0.8}, {"name": "Motrin", "relevance": 0.6}]
+    name = [{"name": "Motrin", "relevance": 0.95}, {"name": "Advil", "dosage": "200mg", "relevance": 0.5}]
+
+    merged = merge_results(imprint, name)
+    assert [(result["name"], result["relevance"]) for result in merged] == [("Advil", 0.8), ("Motrin", 0.95)]
+
+
+def test_distinct_dosages_stay_separate_and_limit_applies():
+    results = [{"name": "Tylenol", "dosage": dosage} for dosage in ("325 mg", "500 mg", "650 mg")]
+    assert len(merge_results(results)) == 3
+    assert len(merge_results(results, limit=2)) == 2
+
+
+def test_missing_scores_count_as_zero():
+    merged = merge_results([{"name": "A"}], [{"name": "a", "relevance": 0.1}])
+    assert merged[0]["relevance"] == 0.1
+
+
+def test_normalize_dosage():
+    assert normalize_dosage("325 MG/1") == "325mg"
+    assert normalize_dosage(None) == ""
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from src.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+
+    async def fetch():
+        calls.append(1)
+        await release.wait()
+        return [{"name": "Aspirin"}]
+
+    waiters = [asyncio.create_task(flight.do("aspirin", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flight.in_flight() == 1
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+    assert all(result == [{"name": "Aspirin"}] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_each_caller_gets_its_own_copy():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return [{"name": "Aspirin"}]
+
+    first = asyncio.create_task(flight.do("aspirin", fetch))
+    second = asyncio.create_task(flight.do("aspirin", fetch))
+    await asyncio.sleep(0)
+    release.set()
+    a, b = await asyncio.gather(first, second)
+
+    a[0]["relevance"] = 1.0
+    assert "relevance" not in b[0]
+
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_caller():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        flight.do("x", fail), flight.do("x", fail), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    cancelled = asyncio.create_task(flight.do("k", fetch))
+    survivor = asyncio.create_task(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await survivor == "done"